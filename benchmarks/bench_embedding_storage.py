@@ -0,0 +1,109 @@
+"""
+    Embedding storage benchmark: memory, clustering speed and change in cluster
+    assignments of float16 / int8 storage and PCA projections against float32.
+
+    float16 / int8 options pass QuantizedEmbeddings to the concate_* methods (brute backend),
+    which dequantize one block at a time; *_peak_mb is the peak numpy allocation (tracemalloc).
+
+    usage: python benchmarks/bench_embedding_storage.py --n 2000 --dim 384 [--output result.json]
+"""
+# ======================= [built-in modules] =======================
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# ====================== [third-party modules] =====================
+import numpy as np
+from sklearn.metrics import adjusted_rand_score
+
+# ======================= [custom modules] =========================
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.concat_functions import concate_knn, concate_clustering, concate_hierarchical_clustering
+from utils.embedding_store import PCAProjection, transform_embeddings
+from utils.similarity import normalize_rows
+
+
+def synthetic_embeddings(n: int, dim: int, n_topics: int, noise: float, seed: int) -> np.ndarray:
+    """
+    normalized embeddings drawn around n_topics random topic directions (topics fixed, samples vary with seed)
+    """
+    topics = normalize_rows(np.random.default_rng(0).normal(size=(n_topics, dim)))
+    rng = np.random.default_rng(seed)
+    labels = rng.integers(0, n_topics, size=n)
+    return normalize_rows(topics[labels] + noise * rng.normal(size=(n, dim)) / np.sqrt(dim))
+
+
+def groups_to_labels(groups: list, n: int) -> np.ndarray:
+    labels = np.full(n, -1)
+    for label, group in enumerate(groups):
+        for index in group:
+            if index >= 0:
+                labels[index] = label
+    return labels
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--n", type=int, default=2000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--topics", type=int, default=20)
+    parser.add_argument("--noise", type=float, default=1.0)
+    parser.add_argument("--pca", type=int, nargs="*", default=[32, 64, 128])
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    embeddings = synthetic_embeddings(args.n, args.dim, args.topics, args.noise, seed=2)
+    fit_sample = synthetic_embeddings(args.n, args.dim, args.topics, args.noise, seed=1)  # stands in for the dataset sample
+    segments = [""] * args.n
+
+    methods = {
+        'concate_knn': lambda e: concate_knn(segments, k=20, threshold=0.6, backend='brute', embeddings=e),
+        'concate_clustering': lambda e: concate_clustering(segments, eps=0.6, min_samples=3, backend='brute', embeddings=e),
+        'concate_hierarchical_clustering': lambda e: concate_hierarchical_clustering(segments, threshold=0.7, method='average', embeddings=e),
+    }
+
+    options = [('float32', None), ('float16', None), ('int8', None)]
+    tmp_dir = tempfile.mkdtemp()
+    for n_components in args.pca:
+        path = os.path.join(tmp_dir, f"pca{n_components}.npz")
+        PCAProjection().fit(fit_sample, n_components).save(path)
+        options.append(('float32', path))
+        options.append(('int8', path))
+
+    baseline = {}
+    results = []
+    for dtype, pca_path in options:
+        name = dtype + (f"+pca{os.path.basename(pca_path)[3:-4]}" if pca_path else "")
+
+        s = time.perf_counter()
+        transformed = transform_embeddings(embeddings, dtype=dtype, pca_path=pca_path)
+        transform_sec = time.perf_counter() - s
+
+        result = {'option': name, 'bytes': int(transformed.nbytes), 'transform_sec': transform_sec}
+        for method_name, method in methods.items():
+            tracemalloc.start()
+            s = time.perf_counter()
+            groups = method(transformed)
+            result[f'{method_name}_sec'] = time.perf_counter() - s
+            result[f'{method_name}_peak_mb'] = tracemalloc.get_traced_memory()[1] / 2**20
+            tracemalloc.stop()
+
+            labels = groups_to_labels(groups, args.n)
+            if name == 'float32':
+                baseline[method_name] = labels
+            result[f'{method_name}_ari'] = float(adjusted_rand_score(baseline[method_name], labels))
+            result[f'{method_name}_n_groups'] = len(groups)
+        results.append(result)
+        print(json.dumps(result))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
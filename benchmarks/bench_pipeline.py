@@ -0,0 +1,156 @@
+"""
+    Offline pipeline benchmark: microbenchmarks of every stage plus an end-to-end run on
+    synthetic documents (benchmarks/synthetic.py) with tiny random local models
+    (benchmarks/tiny_models.py). No network access and no dataset needed.
+
+    Compare two result files with benchmarks/compare.py.
+
+    usage: python benchmarks/bench_pipeline.py [--quick] [--only knn] [--output result.json]
+"""
+# ======================= [built-in modules] =======================
+import argparse
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import time
+import traceback
+
+# ====================== [third-party modules] =====================
+import numpy as np
+
+# ======================= [custom modules] =========================
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+from synthetic import make_document, make_corpus
+from tiny_models import DEFAULT_MODEL_DIR, N_LAYERS, use_offline_models
+
+
+def time_call(fn, repeat: int, warmup: int = 1) -> dict:
+    """
+    median / min / max wall time of fn() after warmup calls (model loading happens in warmup)
+    """
+    for _ in range(warmup):
+        fn()
+    times = []
+    for _ in range(repeat):
+        s = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - s)
+    return {'median_sec': statistics.median(times), 'min_sec': min(times), 'max_sec': max(times), 'repeat': repeat}
+
+
+def git_commit() -> str:
+    proc = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True)
+    return proc.stdout.strip() if proc.returncode == 0 else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--words", type=int, default=10000, help="words per synthetic document")
+    parser.add_argument("--topics", type=int, default=8)
+    parser.add_argument("--n-word", type=int, default=150, help="segment size")
+    parser.add_argument("--docs", type=int, default=5, help="documents of the end-to-end run")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--quick", action="store_true", help="small sizes for a smoke run")
+    parser.add_argument("--only", default=None, help="regex, run matching benchmarks only")
+    parser.add_argument("--model-dir", default=DEFAULT_MODEL_DIR)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+    if args.quick:
+        args.words, args.docs, args.repeat = 2000, 2, 2
+
+    # the tiny models must be the defaults before utils is imported
+    paths = use_offline_models(args.model_dir)
+    from utils.segment_embedding import segmentate_sentence, encode_segments
+    from utils import concat_functions
+    from utils.summarizer import summarizer
+    from utils.eval_similarity import calculate_rouge_scores, calculate_bert_score
+    from utils.registry import get_metric
+
+    # ========================== [Fixtures] ============================
+    document = make_document(args.words, args.topics, seed=0)
+    reference = make_document(max(50, args.words // 20), args.topics, seed=1)
+    segments = segmentate_sentence(document, n_word=args.n_word)
+    token_segments = segmentate_sentence(document, n_word=args.n_word, unit='token')  # ids reused by encode_segments
+    embeddings = encode_segments(segments)
+    clusters = [" ".join(segments[i] for i in group)
+                for group in concat_functions.concate_knn(segments, k=20, threshold=0.6, embeddings=embeddings)[:4]]
+    summary_args = dict(model=paths['seq2seq'], max_length=128, min_length=0, num_beams=2)
+
+    benchmarks = {
+        'segmentate_sentence/word': lambda: segmentate_sentence(document, n_word=args.n_word),
+        'segmentate_sentence/sentence': lambda: segmentate_sentence(document, n_word=args.n_word, unit='sentence'),
+        'segmentate_sentence/token': lambda: segmentate_sentence(document, n_word=args.n_word, unit='token'),
+        'encode_segments': lambda: encode_segments(segments),
+        'encode_segments/reuse_token_ids': lambda: encode_segments(token_segments),
+        'concate_time_based': lambda: concat_functions.concate_time_based(segments, threshold=0.6, embeddings=embeddings),
+        'concate_clustering/sklearn': lambda: concat_functions.concate_clustering(
+            segments, eps=0.3, min_samples=3, backend='sklearn', embeddings=embeddings),
+        'concate_clustering/brute': lambda: concat_functions.concate_clustering(
+            segments, eps=0.3, min_samples=3, backend='brute', embeddings=embeddings),
+        'concate_knn/brute': lambda: concat_functions.concate_knn(
+            segments, k=20, threshold=0.6, backend='brute', embeddings=embeddings),
+        'concate_knn/ivf': lambda: concat_functions.concate_knn(
+            segments, k=20, threshold=0.6, backend='ivf', embeddings=embeddings),
+        'concate_time_clustering': lambda: concat_functions.concate_time_clustering(
+            segments, threshold=0.6, eps=0.3, min_samples=2, embeddings=embeddings),
+        'top_down_splitting': lambda: concat_functions.top_down_splitting(segments, threshold=0.7),
+        'concate_hierarchical_clustering/ward': lambda: concat_functions.concate_hierarchical_clustering(
+            segments, threshold=0.7, method='ward', embeddings=embeddings),
+        'concate_hierarchical_clustering/average': lambda: concat_functions.concate_hierarchical_clustering(
+            segments, threshold=0.7, method='average', embeddings=embeddings),
+        'summarizer': lambda: summarizer(clusters, **summary_args),
+        'eval/rouge': lambda: calculate_rouge_scores(document, reference),
+        'eval/semantic_similarity': lambda: get_metric('semantic_similarity')(document, reference),
+        'eval/bert_score': lambda: calculate_bert_score(document, reference, model=paths['encoder'], num_layers=N_LAYERS),
+    }
+
+    def end_to_end():
+        for text in corpus:
+            doc_segments = segmentate_sentence(text, n_word=args.n_word)
+            groups = concat_functions.concate_knn(doc_segments, k=20, threshold=0.6)
+            batch = [" ".join(doc_segments[i] for i in group) for group in groups]
+            summaries = [summarizer(batch[i:i + 4], **summary_args) for i in range(0, len(batch), 4)]
+            calculate_rouge_scores(text, " ".join(summaries))
+
+    corpus = make_corpus(args.docs, args.words, args.topics, seed=100)
+    benchmarks['end_to_end'] = end_to_end
+
+    # ========================== [Run] =================================
+    results = {}
+    for name, fn in benchmarks.items():
+        if args.only and not re.search(args.only, name):
+            continue
+        repeat = max(1, args.repeat // 2) if name == 'end_to_end' else args.repeat
+        try:
+            result = time_call(fn, repeat)
+        except Exception as e:  # missing optional dependency (rouge_score, bert_score, ...)
+            result = {'error': f"{type(e).__name__}: {e}"}
+            traceback.print_exc(limit=1)
+        results[name] = result
+        print(f"{name:<45} " + (f"{result['median_sec']*1000:10.2f} ms" if 'error' not in result else result['error']))
+
+    output = {
+        'meta': {
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'numpy': np.__version__,
+            'n_segments': len(segments),
+            'args': vars(args),
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(output, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
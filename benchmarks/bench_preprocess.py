@@ -0,0 +1,184 @@
+"""
+    Transcript preprocessing throughput (MB/s of raw transcripts) on a synthetic raw corpus.
+
+    Measures the original readlines / str.replace implementation and the regex line-streaming
+    preprocessor (data/collect_script/preprocess.py) in one process and in a process pool.
+    Single-process throughput is about the same (the work is I/O bound), the pool only helps
+    with more than one core.
+
+    The full outputs of every file are compared with the original. Lines that differ must be
+    one of the known, intended differences (KNOWN_DIFFERENCES); anything else is reported
+    as unexplained.
+
+    usage: python benchmarks/bench_preprocess.py [--files 400] [--lines 2000] [--workers 4] [--output result.json]
+"""
+# ======================= [built-in modules] =======================
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+# ======================= [custom modules] =========================
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'data', 'collect_script'))
+from preprocess import clean_line, preprocess_youtube_dataset
+
+WORDS = "so today we are going to talk about the gradient of the loss function and how it changes".split()
+TAGS = ['[Music]', '[Applause]', '[Laughter]', '[Speaker1]']
+
+KNOWN_DIFFERENCES = {
+    'trailing_tag': "a [tag] at the end of a line is removed (the original kept it, its last word ended with '\\n')",
+    'empty_line': "lines that are empty after cleaning are dropped (the original joined them, leaving a double space)",
+    'no_space': "lines without a space become empty (the original raised ValueError on the whole file)",
+}
+
+
+def make_raw_corpus(path: str, n_playlists: int, n_files: int, n_lines: int, seed: int = 0) -> int:
+    """
+    <path>/<playlist>/<video>.txt.txt raw transcripts, returns total bytes
+    """
+    rng = random.Random(seed)
+    total = 0
+    for f in range(n_files):
+        playlist_dir = os.path.join(path, f"playlist_{f % n_playlists}")
+        os.makedirs(playlist_dir, exist_ok=True)
+        lines = []
+        for i in range(n_lines):
+            words = [rng.choice(WORDS) for _ in range(rng.randint(4, 14))]
+            if rng.random() < 0.1:
+                words.insert(rng.randrange(len(words) + 1), rng.choice(TAGS))  # also at the end of the line
+            if rng.random() < 0.02:
+                words = [rng.choice(TAGS)]  # tag-only line
+            if rng.random() < 0.05:
+                words.insert(rng.randrange(len(words)), " " * rng.randint(2, 40))  # runs of spaces
+            lines.append(f"{time.strftime('%H:%M:%S', time.gmtime(2 * i))} {' '.join(words)}")
+        text = "\n".join(lines)
+        with open(os.path.join(playlist_dir, f"video_{f}.txt.txt"), 'w') as fp:
+            fp.write(text)
+        total += len(text.encode())
+    return total
+
+
+def legacy_clean_line(line):
+    # the original per-line processing, kept as the baseline
+    _, text = line.split(' ', 1)
+    if '[' in line or ']' in line:
+        for word in text.split(' '):
+            if word.startswith('[') and word.endswith(']'):
+                text = text.replace(word, '')
+    while '  ' in text:
+        text = text.replace('  ', ' ')
+    return text.strip()
+
+
+def legacy_preprocess(unprocessed_path, processed_path):
+    # the original implementation, kept as the baseline
+    for playlist_name in os.listdir(unprocessed_path):
+        playlist_path = os.path.join(unprocessed_path, playlist_name)
+        os.makedirs(os.path.join(processed_path, playlist_name), exist_ok=True)
+        for file_name in os.listdir(playlist_path):
+            with open(os.path.join(playlist_path, file_name), 'r') as f:
+                transcript = f.readlines()
+            converted_transcript = [legacy_clean_line(line) for line in transcript]
+            with open(os.path.join(processed_path, playlist_name, file_name), 'w') as f:
+                f.write(' '.join(converted_transcript))
+
+
+def classify_difference(line):
+    """
+    KNOWN_DIFFERENCES key of a raw line whose cleaned text differs, None if identical, 'unexplained' otherwise
+    """
+    try:
+        legacy = legacy_clean_line(line)
+    except ValueError:
+        return 'no_space'
+    text = clean_line(line)
+    if not legacy:
+        return 'empty_line'
+    if legacy == text:
+        return None
+    rest, _, last = legacy.rpartition(' ')
+    if last.startswith('[') and last.endswith(']') and text == rest.strip():
+        return 'trailing_tag'
+    return 'unexplained'
+
+
+def compare_outputs(raw_dir, legacy_dir, new_dir):
+    """
+    compare every output file and classify the differing raw lines
+
+    Returns:
+    - dict: files, identical_files, line_differences {KNOWN_DIFFERENCES key or 'unexplained': count}
+    """
+    result = {'files': 0, 'identical_files': 0, 'line_differences': dict.fromkeys([*KNOWN_DIFFERENCES, 'unexplained'], 0)}
+    for playlist_name in sorted(os.listdir(raw_dir)):
+        for file_name in sorted(os.listdir(os.path.join(raw_dir, playlist_name))):
+            outputs = []
+            for out_dir in (legacy_dir, new_dir):
+                with open(os.path.join(out_dir, playlist_name, file_name)) as f:
+                    outputs.append(f.read())
+            result['files'] += 1
+            if outputs[0] == outputs[1]:
+                result['identical_files'] += 1
+                continue
+            with open(os.path.join(raw_dir, playlist_name, file_name)) as f:
+                for line in f:
+                    kind = classify_difference(line)
+                    if kind is not None:
+                        result['line_differences'][kind] += 1
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--playlists", type=int, default=8)
+    parser.add_argument("--files", type=int, default=400)
+    parser.add_argument("--lines", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        raw = os.path.join(tmp, 'raw')
+        n_bytes = make_raw_corpus(raw, args.playlists, args.files, args.lines)
+        print(f"corpus: {args.files} files, {n_bytes / 2**20:.1f} MB")
+
+        runs = {
+            'legacy': lambda out: legacy_preprocess(raw, out),
+            'regex_stream': lambda out: preprocess_youtube_dataset(raw, out, workers=1),
+            f'regex_stream_pool{args.workers}': lambda out: preprocess_youtube_dataset(raw, out, workers=args.workers),
+        }
+        stdout = sys.stdout
+        for name, run in runs.items():
+            out = os.path.join(tmp, name)
+            sys.stdout = open(os.devnull, 'w')  # per-playlist progress lines
+            try:
+                s = time.perf_counter()
+                run(out)
+                elapsed = time.perf_counter() - s
+            finally:
+                sys.stdout.close()
+                sys.stdout = stdout
+            results[name] = {'sec': elapsed, 'mb_per_sec': n_bytes / 2**20 / elapsed}
+            print(f"{name:<22} {elapsed:8.2f} sec {results[name]['mb_per_sec']:8.1f} MB/s")
+
+        # full outputs of every file against the original
+        comparison = compare_outputs(raw, os.path.join(tmp, 'legacy'), os.path.join(tmp, 'regex_stream'))
+        results['comparison'] = comparison
+        results['matches_legacy'] = comparison['line_differences']['unexplained'] == 0
+        print(f"identical files: {comparison['identical_files']}/{comparison['files']}")
+        for kind, count in comparison['line_differences'].items():
+            print(f"  {kind:<14} {count:8d} lines  {KNOWN_DIFFERENCES.get(kind, 'not a known difference')}")
+        print("only known differences from the original:", results['matches_legacy'])
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'n_bytes': n_bytes, 'args': vars(args), 'results': results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+    Startup-time benchmark: wall time of a fresh interpreter importing each entry point.
+
+    Lightweight tools (config validation, registry, post-processing) must not pull in
+    torch / transformers / sklearn / bert_score; --budget fails the run if one of them
+    is slower than the given number of seconds.
+
+    usage: python benchmarks/bench_startup.py [--repeat 5] [--budget 1.0] [--output result.json]
+"""
+# ======================= [built-in modules] =======================
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# name -> (python statement, lightweight)
+TARGETS = {
+    'python': ('pass', True),
+    'utils.config': ('import utils.config', True),
+    'validate config.yaml': ('from utils.config import load_config, validate_config; validate_config(load_config("config.yaml"))', True),
+    'utils.registry': ('import utils.registry', True),
+    'utils.post_process': ('import utils.post_process', True),
+    'utils.concat_functions': ('import utils.concat_functions', True),
+    'experiment imports': (
+        'from utils.registry import get_metric; '
+        'from utils.pipeline import Pipeline; '
+        'from utils.dataset_cache import load_documents; '
+        'from utils.instrumentation import RunRecorder; '
+        'from utils.profiling import StageProfiler', True),
+    'serve imports': ('import serve', True),
+    'resolve concate_clustering': ('from utils.registry import get_concat_method; get_concat_method("concate_clustering")', False),
+    'load encoder deps': ('import torch, transformers', False),
+}
+
+
+def time_statement(statement: str, repeat: int) -> dict:
+    """
+    wall time of `python -c statement` in fresh interpreters
+    """
+    code = f"import time; s = time.perf_counter(); {statement}; print(time.perf_counter() - s)"
+    times, error = [], None
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True)
+        if proc.returncode != 0:
+            error = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f"exit {proc.returncode}"
+            break
+        times.append(float(proc.stdout.strip().splitlines()[-1]))
+    if error:
+        return {'error': error}
+    return {'median_sec': statistics.median(times), 'min_sec': min(times), 'max_sec': max(times)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=1.0, help="max seconds for lightweight targets")
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    results, over_budget = {}, []
+    for name, (statement, lightweight) in TARGETS.items():
+        result = time_statement(statement, args.repeat)
+        result['lightweight'] = lightweight
+        results[name] = result
+        print(f"{name:<30} " + (f"{result['median_sec']:.3f} sec" if 'error' not in result else f"error: {result['error']}"))
+        if lightweight and result.get('median_sec', float('inf')) > args.budget:
+            over_budget.append(name)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if over_budget:
+        print(f"Over the {args.budget:.2f} sec budget: {', '.join(over_budget)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
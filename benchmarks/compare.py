@@ -0,0 +1,82 @@
+"""
+    Regression comparator for benchmark results (bench_pipeline.py --output ...).
+
+    Flags a benchmark when its median got slower than the baseline by more than
+    --tolerance (relative) and --min-delta (absolute seconds, ignores timer noise of
+    very fast benchmarks). Exits with status 1 if any regression is found.
+
+    usage: python benchmarks/compare.py baseline.json new.json [--tolerance 0.10] [--min-delta 0.001]
+"""
+# ======================= [built-in modules] =======================
+import argparse
+import json
+import sys
+
+
+def compare(baseline: dict, new: dict, tolerance: float = 0.10, min_delta: float = 0.001) -> list:
+    """
+    per-benchmark comparison rows
+
+    Args:
+    - baseline, new: 'results' of two benchmark files
+    - tolerance: allowed relative slowdown
+    - min_delta: allowed absolute slowdown in seconds
+
+    Returns:
+    - list[dict]: {'name', 'baseline', 'new', 'ratio', 'status'}, status in
+                  'ok' | 'faster' | 'REGRESSION' | 'error' | 'new' | 'missing'
+    """
+    rows = []
+    for name in list(baseline) + [n for n in new if n not in baseline]:
+        old_result, new_result = baseline.get(name), new.get(name)
+        row = {'name': name, 'baseline': None, 'new': None, 'ratio': None}
+        if new_result is None:
+            row['status'] = 'missing'
+        elif old_result is None:
+            row['status'] = 'new'
+        elif 'median_sec' not in old_result or 'median_sec' not in new_result:
+            row['status'] = 'error'
+        else:
+            old, cur = old_result['median_sec'], new_result['median_sec']
+            row.update(baseline=old, new=cur, ratio=cur / old if old > 0 else float('inf'))
+            if cur > old * (1 + tolerance) and cur - old > min_delta:
+                row['status'] = 'REGRESSION'
+            elif cur < old / (1 + tolerance) and old - cur > min_delta:
+                row['status'] = 'faster'
+            else:
+                row['status'] = 'ok'
+        rows.append(row)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("new")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    parser.add_argument("--min-delta", type=float, default=0.001)
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+
+    print(f"baseline: {baseline['meta'].get('commit')}  new: {new['meta'].get('commit')}")
+    print(f"{'benchmark':<45}{'baseline':>12}{'new':>12}{'ratio':>8}  status")
+    rows = compare(baseline['results'], new['results'], args.tolerance, args.min_delta)
+    for row in rows:
+        if row['ratio'] is None:
+            print(f"{row['name']:<45}{'-':>12}{'-':>12}{'-':>8}  {row['status']}")
+        else:
+            print(f"{row['name']:<45}{row['baseline']*1000:>10.2f}ms{row['new']*1000:>10.2f}ms"
+                  f"{row['ratio']:>8.2f}  {row['status']}")
+
+    regressions = [row['name'] for row in rows if row['status'] == 'REGRESSION']
+    if regressions:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+    Localhost smoke test of serve.py with the tiny offline models (benchmarks/tiny_models.py):
+    starts the service on a free port, sends concurrent /summarize requests and checks that
+    every one of them succeeds with one summary per cluster and that no generation batch
+    exceeded --max-texts (batch sizes are the ones actually generated).
+
+    usage: python benchmarks/smoke_serve.py [--requests 16] [--threads 8] [--words 3000] [--adaptive]
+"""
+# ======================= [built-in modules] =======================
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+# ======================= [custom modules] =========================
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+from synthetic import make_corpus
+from tiny_models import DEFAULT_MODEL_DIR, use_offline_models
+
+
+def post(url: str, payload: dict) -> dict:
+    request = urllib.request.Request(url, data=json.dumps(payload).encode('utf-8'),
+                                     headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=600) as response:
+        return json.loads(response.read())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=16)
+    parser.add_argument("--threads", type=int, default=8, help="concurrent clients")
+    parser.add_argument("--words", type=int, default=3000, help="words per request")
+    parser.add_argument("--max-texts", type=int, default=8)
+    parser.add_argument("--adaptive", action="store_true", help="adaptive token budgets instead of mini_batch.size")
+    parser.add_argument("--model-dir", default=DEFAULT_MODEL_DIR)
+    args = parser.parse_args()
+
+    # the tiny models must be the defaults before utils is imported
+    paths = use_offline_models(args.model_dir)
+    import yaml
+    from serve import serve
+
+    with open(os.path.join(ROOT, 'config.yaml')) as f:
+        config = yaml.safe_load(f)
+    config['summary']['args'] = {**(config['summary'].get('args') or {}), 'model': paths['seq2seq'],
+                                 'max_length': 32, 'min_length': 0, 'num_beams': 1}
+    config['segment']['args'].update(n_word=100, unit='word')
+    config['segment']['args'].pop('tokenizer', None)
+    config['concat'] = {'method': 'concate_knn', 'args': {'k': 10, 'threshold': 0.5}}
+    config['adaptive_batch'] = {'enabled': args.adaptive, 'args': {'initial_tokens': 2048, 'path': None}}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config_path = os.path.join(tmp, 'config.yaml')
+        with open(config_path, 'w') as f:
+            yaml.safe_dump(config, f)
+        server = serve(config_path, port=0, window_ms=20, max_texts=args.max_texts)
+
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        documents = make_corpus(args.requests, n_words=args.words)
+        with ThreadPoolExecutor(args.threads) as pool:
+            responses = list(pool.map(lambda i: post(f"{url}/summarize", {'id': i, 'text': documents[i]}),
+                                      range(args.requests)))
+        with urllib.request.urlopen(f"{url}/metrics") as response:
+            metrics = json.loads(response.read())
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert [r['id'] for r in responses] == list(range(args.requests))
+    assert all(len(r['summaries']) == r['n_clusters'] for r in responses), "summaries / clusters mismatch"
+    assert metrics['requests_failed'] == 0, metrics
+    assert metrics['batch_texts']['max'] <= args.max_texts, metrics['batch_texts']
+    # batch metrics count the generated batches, so they add up to the summarized texts
+    assert metrics['batched_texts_total'] == sum(r['n_clusters'] for r in responses), metrics
+
+    print(f"{args.requests} requests OK, p50 latency {metrics['latency_sec']['request']['p50']:.2f} sec, "
+          f"batch texts max {metrics['batch_texts']['max']:.0f}, "
+          f"requests per batch max {metrics['batch_requests']['max']:.0f}")
+
+
+if __name__ == "__main__":
+    main()
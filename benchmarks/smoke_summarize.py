@@ -0,0 +1,67 @@
+"""
+    Smoke test of summarize.py with several workers and the tiny offline models
+    (benchmarks/tiny_models.py): runs the script on a synthetic JSONL corpus and checks
+    that every document got a summary and none failed.
+
+    usage: python benchmarks/smoke_summarize.py [--docs 12] [--workers 4] [--words 3000]
+"""
+# ======================= [built-in modules] =======================
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+# ======================= [custom modules] =========================
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+from synthetic import make_corpus
+from tiny_models import DEFAULT_MODEL_DIR, use_offline_models
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=12)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--words", type=int, default=3000, help="words per document")
+    parser.add_argument("--model-dir", default=DEFAULT_MODEL_DIR)
+    args = parser.parse_args()
+
+    # the environment of the tiny models is inherited by summarize.py
+    paths = use_offline_models(args.model_dir)
+    import yaml
+
+    with open(os.path.join(ROOT, 'config.yaml')) as f:
+        config = yaml.safe_load(f)
+    config['summary']['args'] = {**(config['summary'].get('args') or {}), 'model': paths['seq2seq'],
+                                 'max_length': 32, 'min_length': 0, 'num_beams': 1}
+    config['segment']['args'].update(n_word=100, unit='word')
+    config['segment']['args'].pop('tokenizer', None)
+    config['concat'] = {'method': 'concate_knn', 'args': {'k': 10, 'threshold': 0.5}}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config_path, input_path = os.path.join(tmp, 'config.yaml'), os.path.join(tmp, 'input.jsonl')
+        with open(config_path, 'w') as f:
+            yaml.safe_dump(config, f)
+        with open(input_path, 'w') as f:
+            for i, document in enumerate(make_corpus(args.docs, n_words=args.words)):
+                f.write(json.dumps({'id': i, 'content': document}) + '\n')
+
+        completed = subprocess.run([sys.executable, os.path.join(ROOT, 'summarize.py'), input_path,
+                                    '--config', config_path, '--workers', str(args.workers)],
+                                   cwd=ROOT, capture_output=True, text=True, check=True)
+
+    results = [json.loads(line) for line in completed.stdout.splitlines() if line.strip()]
+    failed = [r for r in results if 'error' in r]
+    assert [r['id'] for r in results] == list(range(args.docs)), "missing or reordered documents"
+    assert not failed, f"{len(failed)} failed, first: {failed[0]['error']}"
+    assert all(r['summary'] for r in results), "empty summary"
+
+    print(f"{args.docs} documents OK with {args.workers} workers, "
+          f"max latency {max(r['latency_sec'] for r in results):.2f} sec")
+
+
+if __name__ == "__main__":
+    main()
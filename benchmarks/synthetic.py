@@ -0,0 +1,100 @@
+"""
+    Synthetic transcripts for offline benchmarks.
+
+    A document is a sequence of topic blocks. Each block draws its words from a topic
+    vocabulary mixed with shared filler words, so segment embeddings cluster by topic and
+    topics recur (like a lecture returning to an earlier subject).
+
+    usage: python benchmarks/synthetic.py --words 5000 --topics 8 > doc.txt
+"""
+# ======================= [built-in modules] =======================
+import argparse
+from typing import List
+
+# ====================== [third-party modules] =====================
+import numpy as np
+
+FILLER_WORDS = (
+    "the a of and to in is that it for on with as this we so you are be at or "
+    "can will now here then there what which when about just like very really"
+).split()
+
+_SYLLABLES = ['ka', 'lo', 'mi', 'ne', 'ru', 'ta', 'shi', 'po', 'de', 'vi', 'zu', 'ga', 'be', 'fo', 'ri', 'xa']
+
+
+def topic_vocabulary(topic: int, size: int = 40) -> List[str]:
+    """
+    deterministic pseudo-words of one topic
+    """
+    rng = np.random.default_rng(10_000 + topic)
+    words = []
+    while len(words) < size:
+        word = "".join(rng.choice(_SYLLABLES, size=rng.integers(2, 4)))
+        if word not in words:
+            words.append(word)
+    return words
+
+
+def vocabulary(n_topics: int, topic_size: int = 40) -> List[str]:
+    """
+    every word a document with n_topics can contain (for the tiny tokenizer)
+    """
+    words = list(FILLER_WORDS)
+    for topic in range(n_topics):
+        words.extend(w for w in topic_vocabulary(topic, topic_size) if w not in words)
+    return words
+
+
+def make_document(n_words: int = 5000, n_topics: int = 8, block_words: int = 400, topic_ratio: float = 0.6,
+                  seed: int = 0) -> str:
+    """
+    synthetic transcript with topic structure
+
+    Args:
+    - n_words: document length in words
+    - n_topics: number of distinct topics
+    - block_words: mean words per topic block (blocks are exponential around it)
+    - topic_ratio: share of topic words (the rest are filler words)
+    - seed: random seed
+
+    Returns:
+    - str: sentences of 8-20 words separated by ". "
+    """
+    rng = np.random.default_rng(seed)
+    topics = [topic_vocabulary(t) for t in range(n_topics)]
+
+    words, sentence_left = [], rng.integers(8, 21)
+    topic = rng.integers(n_topics)
+    block_left = max(1, int(rng.exponential(block_words)))
+    for _ in range(n_words):
+        if block_left == 0:
+            topic = rng.integers(n_topics)
+            block_left = max(1, int(rng.exponential(block_words)))
+        source = topics[topic] if rng.random() < topic_ratio else FILLER_WORDS
+        word = source[rng.integers(len(source))]
+
+        sentence_left -= 1
+        if sentence_left == 0:
+            word += "."
+            sentence_left = rng.integers(8, 21)
+        words.append(word)
+        block_left -= 1
+
+    return " ".join(words)
+
+
+def make_corpus(n_docs: int, n_words: int = 5000, n_topics: int = 8, seed: int = 0, **kwargs) -> List[str]:
+    """
+    n_docs documents with consecutive seeds
+    """
+    return [make_document(n_words, n_topics, seed=seed + i, **kwargs) for i in range(n_docs)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--words", type=int, default=5000)
+    parser.add_argument("--topics", type=int, default=8)
+    parser.add_argument("--block-words", type=int, default=400)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    print(make_document(args.words, args.topics, args.block_words, seed=args.seed))
@@ -0,0 +1,105 @@
+"""
+    Tiny randomly initialized local models for offline benchmarks.
+
+    Builds, once per directory, a word-level tokenizer over the synthetic vocabulary and
+        - encoder/  : 2-layer BERT (encode_segments, encode_sent2vec, BERTScore)
+        - seq2seq/  : 2-layer BART (summarizer)
+    The outputs are meaningless but the code paths (tokenization, padding, batching,
+    generation) and their scaling are the real ones.
+
+    usage: python benchmarks/tiny_models.py [--dir benchmarks/.models]
+"""
+# ======================= [built-in modules] =======================
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from synthetic import vocabulary
+
+DEFAULT_MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.models')
+SPECIAL_TOKENS = ['<s>', '<pad>', '</s>', '<unk>', '<mask>']
+HIDDEN_SIZE = 64
+N_LAYERS = 2
+MAX_POSITIONS = 1024
+
+
+def build_tokenizer(n_topics: int = 64):
+    """
+    word-level fast tokenizer: <s> words </s>, splits punctuation
+    """
+    from tokenizers import Tokenizer, models, pre_tokenizers, processors
+    from transformers import PreTrainedTokenizerFast
+
+    vocab = {token: i for i, token in enumerate(SPECIAL_TOKENS)}
+    for word in vocabulary(n_topics) + list('.,?!'):
+        vocab.setdefault(word, len(vocab))
+
+    tokenizer = Tokenizer(models.WordLevel(vocab, unk_token='<unk>'))
+    tokenizer.pre_tokenizer = pre_tokenizers.Whitespace()
+    tokenizer.post_processor = processors.TemplateProcessing(
+        single="<s> $A </s>", pair="<s> $A </s> </s> $B </s>",
+        special_tokens=[('<s>', vocab['<s>']), ('</s>', vocab['</s>'])],
+    )
+    return PreTrainedTokenizerFast(
+        tokenizer_object=tokenizer, model_max_length=MAX_POSITIONS,
+        bos_token='<s>', eos_token='</s>', pad_token='<pad>', unk_token='<unk>', mask_token='<mask>',
+        cls_token='<s>', sep_token='</s>',
+    )
+
+
+def build_models(model_dir: str = DEFAULT_MODEL_DIR, seed: int = 0) -> dict:
+    """
+    create (if missing) and return the local model paths
+
+    Returns:
+    - dict: {'encoder': path, 'seq2seq': path}
+    """
+    paths = {'encoder': os.path.join(model_dir, 'encoder'), 'seq2seq': os.path.join(model_dir, 'seq2seq')}
+    if all(os.path.exists(os.path.join(path, 'config.json')) for path in paths.values()):
+        return paths
+
+    import torch
+    from transformers import BertConfig, BertModel, BartConfig, BartForConditionalGeneration
+
+    torch.manual_seed(seed)
+    tokenizer = build_tokenizer()
+    special = {name: tokenizer.convert_tokens_to_ids(token) for name, token in
+               (('bos', '<s>'), ('pad', '<pad>'), ('eos', '</s>'))}
+
+    encoder = BertModel(BertConfig(
+        vocab_size=len(tokenizer), hidden_size=HIDDEN_SIZE, num_hidden_layers=N_LAYERS, num_attention_heads=2,
+        intermediate_size=HIDDEN_SIZE * 2, max_position_embeddings=MAX_POSITIONS, pad_token_id=special['pad'],
+    ))
+    seq2seq = BartForConditionalGeneration(BartConfig(
+        vocab_size=len(tokenizer), d_model=HIDDEN_SIZE, encoder_layers=N_LAYERS, decoder_layers=N_LAYERS,
+        encoder_attention_heads=2, decoder_attention_heads=2, encoder_ffn_dim=HIDDEN_SIZE * 2,
+        decoder_ffn_dim=HIDDEN_SIZE * 2, max_position_embeddings=MAX_POSITIONS,
+        bos_token_id=special['bos'], pad_token_id=special['pad'], eos_token_id=special['eos'],
+        decoder_start_token_id=special['eos'], forced_bos_token_id=None, forced_eos_token_id=special['eos'],
+    ))
+
+    for name, model in (('encoder', encoder), ('seq2seq', seq2seq)):
+        model.save_pretrained(paths[name])
+        tokenizer.save_pretrained(paths[name])
+    return paths
+
+
+def use_offline_models(model_dir: str = DEFAULT_MODEL_DIR) -> dict:
+    """
+    build the tiny models and make them the pipeline defaults (call before importing utils)
+    """
+    paths = build_models(model_dir)
+    os.environ['WHITEBOARD_ENCODER'] = paths['encoder']
+    os.environ['WHITEBOARD_SENT2VEC'] = paths['encoder']
+    os.environ.setdefault('HF_HUB_OFFLINE', '1')
+    os.environ.setdefault('TRANSFORMERS_OFFLINE', '1')
+    return paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dir", default=DEFAULT_MODEL_DIR)
+    args = parser.parse_args()
+    for name, path in build_models(args.dir).items():
+        print(f"{name}: {path}")
@@ -1,7 +1,13 @@
 import os
 import json
 
-def convert_preprocessed_to_jsonl(preprocessed_path, output_jsonl_path):
+def convert_preprocessed_to_jsonl(preprocessed_path, output_jsonl_path, dedup_manifest_path=None):
+    # dedup_transcripts.py의 manifest가 주어지면 중복으로 판정된 transcript 제외
+    dropped = set()
+    if dedup_manifest_path is not None:
+        from dedup_transcripts import load_dropped
+        dropped = load_dropped(dedup_manifest_path)
+
     # JSONL 파일 생성
     with open(output_jsonl_path, 'w') as jsonl_file:
         for playlist_name in os.listdir(preprocessed_path):
@@ -11,6 +17,10 @@ def convert_preprocessed_to_jsonl(preprocessed_path, output_jsonl_path):
                 continue  # 디렉토리가 아닌 경우 건너뜀
             
             for file_name in os.listdir(playlist_path):
+                if file_name.startswith('_') or not file_name.endswith('.txt'):
+                    continue  # _manifest.json, _fetch_report.json, 임시 파일
+                if (playlist_name, file_name) in dropped:
+                    continue
                 file_path = os.path.join(playlist_path, file_name)
                 
                 with open(file_path, 'r') as f:
@@ -27,7 +37,16 @@ def convert_preprocessed_to_jsonl(preprocessed_path, output_jsonl_path):
                 jsonl_file.write(json.dumps(json_object) + '\n')
 
 if __name__ == '__main__':
+    from corpus import build_corpus
+    from dedup_transcripts import DEFAULT_MANIFEST, keep_filter
+
     preprocessed_path = '../preprocessed_dataset/youtube_dataset'
-    output_jsonl_path = '../preprocessed_dataset/youtube_dataset.jsonl'
+    corpus_dir = '../preprocessed_dataset/youtube_corpus'
+
+    # near duplicates dropped when dedup_transcripts.py has been run
+    keep = keep_filter(DEFAULT_MANIFEST) if os.path.exists(DEFAULT_MANIFEST) else None
 
-    convert_preprocessed_to_jsonl(preprocessed_path, output_jsonl_path)
+    # sharded gzip corpus with an offset index (see corpus.py), the single file is still available with
+    # convert_preprocessed_to_jsonl(preprocessed_path, '../preprocessed_dataset/youtube_dataset.jsonl', DEFAULT_MANIFEST)
+    meta = build_corpus(preprocessed_path, corpus_dir, compression='gzip', workers=os.cpu_count(), keep=keep)
+    print(f"{meta['n_records']} transcripts -> {len(meta['shards'])} shards in {corpus_dir}")
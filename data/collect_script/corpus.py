@@ -0,0 +1,345 @@
+import gzip
+import json
+import os
+from collections import OrderedDict
+from multiprocessing import Pool
+
+"""
+    sharded, compressed JSONL corpus of preprocessed transcripts (replaces the single youtube_dataset.jsonl)
+
+    <corpus>/
+        shard-00000.jsonl[.gz|.zst]   {"playlist", "file_name", "content"} per line, at most shard_size bytes (uncompressed)
+        index.jsonl                   {"playlist", "file_name", "shard", "block", "block_size", "offset", "length"} per record
+        corpus.json                   compression, block size, shard and record counts (written last)
+
+    - compressed shards are a sequence of independent gzip members / zstd frames of ~block_size bytes,
+      so a shard is still a valid .gz / .zst file (zcat shard-00000.jsonl.gz | python summarize.py)
+      and a single record is read by decompressing only its block
+    - uncompressed shards: block = byte offset of the record, block_size = record size
+
+    usage: python corpus.py <preprocessed dir> <corpus dir> [--compression gzip] [--workers 4]
+"""
+
+INDEX_NAME = 'index.jsonl'
+META_NAME = 'corpus.json'
+COMPRESSIONS = {None: '', 'gzip': '.gz', 'zstd': '.zst'}
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError as e:
+        raise ImportError("zstd compression requires the zstandard package (pip install zstandard)") from e
+    return zstandard
+
+
+def _compressor(compression, level=None):
+    if compression is None:
+        return lambda data: data
+    if compression == 'gzip':
+        return lambda data: gzip.compress(data, compresslevel=6 if level is None else level, mtime=0)
+    if compression == 'zstd':
+        return _zstd().ZstdCompressor(level=3 if level is None else level).compress
+    raise ValueError(f"unknown compression {compression!r}, choose one of {list(COMPRESSIONS)}")
+
+
+def _decompressor(compression):
+    if compression is None:
+        return lambda data: data
+    if compression == 'gzip':
+        return gzip.decompress
+    if compression == 'zstd':
+        zstandard = _zstd()
+        # frames written by ZstdCompressor.compress carry their content size
+        return lambda data: zstandard.ZstdDecompressor().decompress(data)
+    raise ValueError(f"unknown compression {compression!r}")
+
+
+def list_transcripts(preprocessed_path, keep=None):
+    """
+    (playlist, file_name, path) 목록, 플레이리스트 / 파일 이름 순 (manifest, report, 임시 파일 제외)
+
+    Args:
+        preprocessed_path (str): <playlist>/<video>.txt 폴더
+        keep (callable): keep(playlist, file_name) -> bool, False인 transcript 제외 (None이면 전부)
+    """
+    entries = []
+    for playlist_name in sorted(os.listdir(preprocessed_path)):
+        playlist_path = os.path.join(preprocessed_path, playlist_name)
+        if not os.path.isdir(playlist_path):
+            continue
+        for file_name in sorted(os.listdir(playlist_path)):
+            if file_name.startswith('_') or not file_name.endswith('.txt'):
+                continue
+            if keep is not None and not keep(playlist_name, file_name):
+                continue
+            entries.append((playlist_name, file_name, os.path.join(playlist_path, file_name)))
+    return entries
+
+
+def _encode_record(entry):
+    playlist_name, file_name, path = entry
+    with open(path, 'r') as f:
+        content = f.read().strip()
+    record = {"playlist": playlist_name, "file_name": file_name, "content": content}
+    return playlist_name, file_name, (json.dumps(record) + '\n').encode()
+
+
+class _ShardWriter:
+    """
+    레코드를 block 단위로 압축하여 shard 파일에 기록, index 항목 생성
+    """
+
+    def __init__(self, output_dir, compression, shard_size, block_size, level=None):
+        self.output_dir = output_dir
+        self.compression = compression
+        self.shard_size = shard_size
+        self.block_size = block_size
+        self.compress = _compressor(compression, level)
+        self.n_shards = 0
+        self.n_records = 0
+        self._file = None
+        self._shard_bytes = 0  # uncompressed
+        self._block = []  # (playlist, file_name, data) waiting to be compressed
+        self._block_bytes = 0
+
+    def shard_name(self, shard):
+        return f"shard-{shard:05d}.jsonl{COMPRESSIONS[self.compression]}"
+
+    def _open_shard(self):
+        self._file = open(os.path.join(self.output_dir, self.shard_name(self.n_shards)), 'wb')
+        self.n_shards += 1
+        self._shard_bytes = 0
+
+    def _flush_block(self):
+        if not self._block:
+            return []
+        shard, block = self.n_shards - 1, self._file.tell()
+        data = self.compress(b''.join(data for _, _, data in self._block))
+        self._file.write(data)
+        entries, offset = [], 0
+        for playlist_name, file_name, record in self._block:
+            entries.append({"playlist": playlist_name, "file_name": file_name, "shard": shard,
+                            "block": block, "block_size": len(data), "offset": offset, "length": len(record)})
+            offset += len(record)
+        self._block, self._block_bytes = [], 0
+        return entries
+
+    def add(self, playlist_name, file_name, data):
+        """
+        Returns:
+            entries (list[dict]): 이번 호출로 확정된 index 항목들
+        """
+        entries = []
+        if self._file is None or (self._shard_bytes and self._shard_bytes + len(data) > self.shard_size):
+            entries += self._flush_block()
+            if self._file is not None:
+                self._file.close()
+            self._open_shard()
+
+        if self.compression is None:
+            entries.append({"playlist": playlist_name, "file_name": file_name, "shard": self.n_shards - 1,
+                            "block": self._file.tell(), "block_size": len(data), "offset": 0, "length": len(data)})
+            self._file.write(data)
+        else:
+            self._block.append((playlist_name, file_name, data))
+            self._block_bytes += len(data)
+            if self._block_bytes >= self.block_size:
+                entries += self._flush_block()
+
+        self._shard_bytes += len(data)
+        self.n_records += 1
+        return entries
+
+    def close(self):
+        entries = self._flush_block()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        return entries
+
+
+def build_corpus(preprocessed_path, output_dir, compression=None, shard_size=256 << 20, block_size=1 << 20,
+                 workers=1, level=None, keep=None):
+    """
+    전처리된 transcript 폴더를 shard + offset index corpus로 변환
+
+    Args:
+        preprocessed_path (str): <playlist>/<video>.txt 폴더
+        output_dir (str): corpus 폴더 (기존 shard / index는 덮어씀)
+        compression (str): None, 'gzip', 'zstd'
+        shard_size (int): shard 당 최대 (압축 전) 바이트, 레코드 하나가 더 크면 그 레코드만 담은 shard
+        block_size (int): 압축 block 크기 (작을수록 random access가 빠르고 압축률은 낮음)
+        workers (int): 파일을 읽고 JSON으로 변환하는 프로세스 수
+        level (int): 압축 레벨 (default: gzip 6, zstd 3)
+        keep (callable): keep(playlist, file_name) -> bool, False인 transcript 제외
+
+    Returns:
+        meta (dict): corpus.json 내용
+    """
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"unknown compression {compression!r}, choose one of {list(COMPRESSIONS)}")
+    os.makedirs(output_dir, exist_ok=True)
+    meta_path = os.path.join(output_dir, META_NAME)
+    if os.path.exists(meta_path):
+        os.remove(meta_path)  # an interrupted rebuild must not look complete
+    for file_name in os.listdir(output_dir):
+        if file_name.startswith('shard-'):
+            os.remove(os.path.join(output_dir, file_name))
+
+    entries = list_transcripts(preprocessed_path, keep)
+
+    writer = _ShardWriter(output_dir, compression, shard_size, block_size, level)
+    pool = Pool(processes=workers) if workers > 1 else None
+    index_tmp = os.path.join(output_dir, INDEX_NAME + '.tmp')
+    try:
+        # ordered imap: shards and index follow the playlist / file order whatever the number of workers
+        records = pool.imap(_encode_record, entries, chunksize=16) if pool else map(_encode_record, entries)
+        with open(index_tmp, 'w') as index_file:
+            for playlist_name, file_name, data in records:
+                for entry in writer.add(playlist_name, file_name, data):
+                    index_file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            for entry in writer.close():
+                index_file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+    finally:
+        writer.close()
+        if pool is not None:
+            pool.close()
+            pool.join()
+    os.replace(index_tmp, os.path.join(output_dir, INDEX_NAME))
+
+    meta = {
+        "compression": compression,
+        "block_size": block_size,
+        "shard_size": shard_size,
+        "shards": [writer.shard_name(shard) for shard in range(writer.n_shards)],
+        "n_records": writer.n_records,
+    }
+    with open(meta_path, 'w') as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+class CorpusReader:
+    """
+    build_corpus로 만든 corpus 읽기: (playlist, file_name)으로 random access, 또는 shard 순서대로 streaming
+
+    Args:
+        corpus_dir (str): corpus 폴더
+        cache_blocks (int): 압축 해제한 block을 보관할 개수 (같은 block의 레코드를 연속으로 읽을 때)
+    """
+
+    def __init__(self, corpus_dir, cache_blocks=4):
+        meta_path = os.path.join(corpus_dir, META_NAME)
+        if not os.path.exists(meta_path):
+            raise FileNotFoundError(f"{meta_path} not found (corpus not built or build interrupted)")
+        with open(meta_path) as f:
+            self.meta = json.load(f)
+        self.corpus_dir = corpus_dir
+        self.compression = self.meta['compression']
+        self.decompress = _decompressor(self.compression)
+        self.cache_blocks = cache_blocks
+        self._index = None
+        self._blocks = OrderedDict()
+        self._files = {}
+
+    @property
+    def index(self):
+        """
+        {(playlist, file_name): index 항목}, 처음 접근할 때 로드
+        """
+        if self._index is None:
+            self._index = {}
+            with open(os.path.join(self.corpus_dir, INDEX_NAME)) as f:
+                for line in f:
+                    entry = json.loads(line)
+                    self._index[(entry['playlist'], entry['file_name'])] = entry
+        return self._index
+
+    def __len__(self):
+        return self.meta['n_records']
+
+    def __contains__(self, key):
+        return tuple(key) in self.index
+
+    def keys(self):
+        return self.index.keys()
+
+    def _read_block(self, shard, block, block_size):
+        key = (shard, block)
+        if key in self._blocks:
+            self._blocks.move_to_end(key)
+            return self._blocks[key]
+        if shard not in self._files:
+            self._files[shard] = open(os.path.join(self.corpus_dir, self.meta['shards'][shard]), 'rb')
+        f = self._files[shard]
+        f.seek(block)
+        data = self.decompress(f.read(block_size))
+        if self.compression is not None:  # uncompressed "blocks" are single records, nothing to reuse
+            self._blocks[key] = data
+            if len(self._blocks) > self.cache_blocks:
+                self._blocks.popitem(last=False)
+        return data
+
+    def get(self, playlist, file_name):
+        """
+        레코드 하나 (dict), 없으면 KeyError
+        """
+        entry = self.index[(playlist, file_name)]
+        data = self._read_block(entry['shard'], entry['block'], entry['block_size'])
+        return json.loads(data[entry['offset']:entry['offset'] + entry['length']])
+
+    def _open_stream(self, shard):
+        path = os.path.join(self.corpus_dir, self.meta['shards'][shard])
+        if self.compression == 'gzip':
+            return gzip.open(path, 'rb')
+        if self.compression == 'zstd':
+            # read_across_frames: the shard is a sequence of frames
+            return _zstd().ZstdDecompressor().stream_reader(open(path, 'rb'), read_across_frames=True, closefd=True)
+        return open(path, 'rb')
+
+    def __iter__(self):
+        """
+        모든 레코드를 shard 순서대로 streaming (index 로드 없음)
+        """
+        for shard in range(len(self.meta['shards'])):
+            with self._open_stream(shard) as stream:
+                buffer = b''
+                for chunk in iter(lambda: stream.read(1 << 20), b''):
+                    buffer += chunk
+                    lines = buffer.split(b'\n')
+                    buffer = lines.pop()
+                    for line in lines:
+                        if line:
+                            yield json.loads(line)
+                if buffer.strip():
+                    yield json.loads(buffer)
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+        self._files = {}
+        self._blocks.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("preprocessed_path", nargs='?', default='../preprocessed_dataset/youtube_dataset')
+    parser.add_argument("output_dir", nargs='?', default='../preprocessed_dataset/youtube_corpus')
+    parser.add_argument("--compression", choices=['gzip', 'zstd'], default=None)
+    parser.add_argument("--shard-mb", type=int, default=256)
+    parser.add_argument("--block-kb", type=int, default=1024)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    meta = build_corpus(args.preprocessed_path, args.output_dir, args.compression, args.shard_mb << 20,
+                        args.block_kb << 10, args.workers)
+    print(f"{meta['n_records']} transcripts -> {len(meta['shards'])} shards in {args.output_dir}")
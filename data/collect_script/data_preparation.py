@@ -1,8 +1,9 @@
 import os
 from multiprocessing import Pool
+from multiprocessing.util import Finalize
 # Assume these are your custom functions for handling YouTube playlists
-from transcript_extractor import get_videos_from_playlist, get_video_id_from_url, get_playlist_transcript, sanitize_filename
-from preprocess import preprocess_youtube_dataset
+from transcript_extractor import get_videos_from_playlist, get_video_id_from_url, get_playlist_transcript, sanitize_filename, get_playlist_backend
+from preprocess import preprocess_playlist
 
 def process_single_playlist(filepath, raw_transcript_dir, processed_transcript_dir):
     """
@@ -22,16 +23,29 @@ def process_single_playlist(filepath, raw_transcript_dir, processed_transcript_d
                 pl_name, video_names, video_urls = get_videos_from_playlist(playlist_url)
                 video_ids = get_video_id_from_url(video_urls)
                 get_playlist_transcript(pl_name, video_names, video_ids, raw_transcript_dir)
+
+                # 이 플레이리스트의 새로 추가/변경된 transcript만 전처리 (다른 worker의 플레이리스트는 건드리지 않음)
+                pl_dir = sanitize_filename(pl_name, False)
+                n_processed, n_skipped = preprocess_playlist(os.path.join(raw_transcript_dir, pl_dir),
+                                                             os.path.join(processed_transcript_dir, pl_dir))
+                print(f"Preprocessed {pl_dir}: {n_processed} new or changed, {n_skipped} unchanged")
             except Exception as e:
                 print(f"Error processing playlist {playlist_url}: {e}")
 
-        # 전처리
-        preprocess_youtube_dataset(raw_transcript_dir, processed_transcript_dir)
         print(f"Preprocessing completed for: {playlist_name}")
     except Exception as e:
         print(f"Error processing file {filepath}: {e}")
 
 
+def _init_worker():
+    """
+    worker 당 Selenium 드라이버 pool 1개를 전체 실행 동안 재사용 (worker 종료 시 정리)
+    """
+    # Pool workers exit without atexit handlers, a multiprocessing finalizer quits the browsers
+    backend = get_playlist_backend()
+    Finalize(backend, backend.close, exitpriority=10)
+
+
 def process_all_playlists_in_parallel(input_dir, raw_transcript_dir, processed_transcript_dir, num_workers=4):
     """
     멀티 프로세스를 사용하여 모든 _playlist.txt 파일 처리.
@@ -47,13 +61,18 @@ def process_all_playlists_in_parallel(input_dir, raw_transcript_dir, processed_t
         if filename.endswith('_playlist.txt')
     ]
 
-    # 멀티 프로세스 풀 생성
-    with Pool(processes=num_workers) as pool:
+    # 멀티 프로세스 풀 생성 (실행 전체에서 1회, worker마다 드라이버 pool 유지)
+    pool = Pool(processes=num_workers, initializer=_init_worker)
+    try:
         # 각 파일을 독립적으로 처리
         pool.starmap(
             process_single_playlist,
             [(filepath, raw_transcript_dir, processed_transcript_dir) for filepath in playlist_files]
         )
+    finally:
+        # close + join (terminate would skip the worker finalizers and leave browsers running)
+        pool.close()
+        pool.join()
 
 if __name__ == '__main__':
     # Directories
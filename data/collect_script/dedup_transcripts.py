@@ -0,0 +1,142 @@
+import json
+import os
+import sys
+from multiprocessing import Pool
+
+import numpy as np
+
+from corpus import list_transcripts
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from utils.dedup import minhash_signatures, near_duplicate_clusters
+
+"""
+    corpus-level near-duplicate detection of preprocessed transcripts
+
+    the youtube categories overlap (cs / ai / mit ...), so the same lecture is collected
+    under several playlists; every transcript gets a MinHash signature (word shingles,
+    process pool), LSH banding finds candidate pairs without comparing all pairs, and
+    verified pairs are merged into clusters. the longest transcript of a cluster is kept.
+
+    manifest (JSONL, one line per transcript):
+        {"playlist", "file_name", "keep", "cluster", "duplicate_of": [playlist, file_name] | null}
+
+    consumers: combine_jsonl / corpus.build_corpus (keep=keep_filter(path)) and the
+    index set sampler (utils/index_sampler.py)
+
+    usage: python dedup_transcripts.py [preprocessed dir] [manifest path] [--threshold 0.8] [--workers 8]
+"""
+
+DEFAULT_MANIFEST = '../preprocessed_dataset/youtube_dedup.jsonl'
+
+
+def _signature(args):
+    path, num_perm, shingle_size, seed = args
+    with open(path, 'r') as f:
+        text = f.read()
+    return len(text.split()), minhash_signatures([text], num_perm, shingle_size, seed)[0]
+
+
+def find_duplicates(preprocessed_path, manifest_path=DEFAULT_MANIFEST, threshold=0.8, num_perm=128, bands=32,
+                    shingle_size=5, seed=0, workers=1):
+    """
+    전처리된 transcript 전체의 near-duplicate cluster를 찾아 keep / drop manifest 작성
+
+    Args:
+        preprocessed_path (str): <playlist>/<video>.txt 폴더
+        manifest_path (str): 출력 manifest (JSONL)
+        threshold (float): 중복으로 볼 Jaccard 유사도 추정값
+        num_perm (int): MinHash signature 길이
+        bands (int): LSH band 수 (rows = num_perm / bands, threshold ~ (1 / bands) ** (1 / rows) 근처에서 후보가 됨)
+        shingle_size (int): shingle 당 단어 수
+        seed (int): MinHash seed
+        workers (int): signature 계산 프로세스 수
+
+    Returns:
+        summary (dict): n_transcripts, n_clusters (2개 이상), n_dropped
+    """
+    entries = list_transcripts(preprocessed_path)
+    jobs = [(path, num_perm, shingle_size, seed) for _, _, path in entries]
+
+    n_words = np.zeros(len(entries), dtype=np.int64)
+    signatures = np.empty((len(entries), num_perm), dtype=np.int64)
+    pool = Pool(processes=workers) if workers > 1 else None
+    try:
+        results = pool.imap(_signature, jobs, chunksize=16) if pool else map(_signature, jobs)
+        for i, (count, signature) in enumerate(results):
+            n_words[i], signatures[i] = count, signature
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    labels, _ = (near_duplicate_clusters(signatures, threshold, bands) if entries
+                 else (np.empty(0, dtype=np.int64), None))
+
+    # representative: the longest transcript of each cluster (first in playlist / file order on ties)
+    representative = {}
+    for i in np.lexsort((np.arange(len(entries)), -n_words)):
+        representative.setdefault(labels[i], i)
+    cluster_sizes = np.bincount(labels) if len(labels) else np.empty(0, dtype=np.int64)
+
+    os.makedirs(os.path.dirname(os.path.abspath(manifest_path)), exist_ok=True)
+    n_dropped = 0
+    with open(manifest_path + '.tmp', 'w') as f:
+        for i, (playlist_name, file_name, _) in enumerate(entries):
+            rep = representative[labels[i]]
+            keep = rep == i
+            n_dropped += not keep
+            f.write(json.dumps({
+                "playlist": playlist_name,
+                "file_name": file_name,
+                "keep": bool(keep),
+                "cluster": int(labels[i]),
+                "duplicate_of": None if keep else [entries[rep][0], entries[rep][1]],
+            }, ensure_ascii=False) + '\n')
+    os.replace(manifest_path + '.tmp', manifest_path)
+
+    return {
+        "n_transcripts": len(entries),
+        "n_clusters": int((cluster_sizes > 1).sum()),
+        "n_dropped": n_dropped,
+    }
+
+
+def load_dropped(manifest_path):
+    """
+    manifest에서 제외할 (playlist, file_name) 집합
+    """
+    dropped = set()
+    with open(manifest_path) as f:
+        for line in f:
+            entry = json.loads(line)
+            if not entry['keep']:
+                dropped.add((entry['playlist'], entry['file_name']))
+    return dropped
+
+
+def keep_filter(manifest_path):
+    """
+    keep(playlist, file_name) -> bool (manifest에 없는 새 transcript는 유지)
+    """
+    dropped = load_dropped(manifest_path)
+    return lambda playlist_name, file_name: (playlist_name, file_name) not in dropped
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("preprocessed_path", nargs='?', default='../preprocessed_dataset/youtube_dataset')
+    parser.add_argument("manifest_path", nargs='?', default=DEFAULT_MANIFEST)
+    parser.add_argument("--threshold", type=float, default=0.8)
+    parser.add_argument("--num-perm", type=int, default=128)
+    parser.add_argument("--bands", type=int, default=32)
+    parser.add_argument("--shingle-size", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    summary = find_duplicates(args.preprocessed_path, args.manifest_path, args.threshold, args.num_perm, args.bands,
+                              args.shingle_size, workers=args.workers)
+    print(f"{summary['n_transcripts']} transcripts, {summary['n_clusters']} duplicate clusters, "
+          f"{summary['n_dropped']} dropped -> {args.manifest_path}")
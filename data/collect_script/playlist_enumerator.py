@@ -0,0 +1,335 @@
+# built-in modules
+import json
+import os
+import queue
+import re
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+from html import unescape
+from urllib.parse import parse_qs, urlparse
+
+"""
+    playlist enumeration used by transcript_extractor.get_videos_from_playlist
+
+    backends: get_videos(playlist_url) -> (playlist_name, video_names, video_urls)
+    - SeleniumPlaylistBackend: pool of long-lived headless Chrome drivers, explicit waits,
+      scrolls until every video of the playlist is rendered
+    - HtmlPlaylistBackend: parses saved playlist pages (ytInitialData in the HTML, the
+      ytInitialData JSON itself, or a rendered DOM dump), no browser or network needed
+
+    usage (offline): python playlist_enumerator.py <saved page.html | ytInitialData.json> ...
+"""
+
+WATCH_URL = "https://www.youtube.com/watch?v={}"
+_INITIAL_DATA_PATTERN = re.compile(r'(?:var\s+ytInitialData|window\["ytInitialData"\])\s*=\s*')
+_RENDERED_VIDEO_PATTERN = re.compile(r'<a[^>]*id="video-title"[^>]*>', re.S)
+_VIDEO_COUNT_PATTERN = re.compile(r'([\d,]+)\s+videos?')
+
+
+def playlist_id(playlist_url):
+    """
+    playlist url의 list= 값 (url이 아니면 그대로 반환)
+    """
+    query = parse_qs(urlparse(playlist_url).query)
+    return query['list'][0] if 'list' in query else playlist_url
+
+
+def _dedup(video_names, video_urls):
+    seen, names, urls = set(), [], []
+    for name, url in zip(video_names, video_urls):
+        video_id = parse_qs(urlparse(url).query).get('v', [url])[0]
+        if video_id not in seen:
+            seen.add(video_id)
+            names.append(name)
+            urls.append(url)
+    return names, urls
+
+
+# ************************* ytInitialData parsing *************************
+def extract_initial_data(html):
+    """
+    HTML의 ytInitialData JSON 객체 (없으면 None)
+    """
+    match = _INITIAL_DATA_PATTERN.search(html)
+    if match is None:
+        return None
+    data, _ = json.JSONDecoder().raw_decode(html, match.end())
+    return data
+
+
+def _text(node):
+    if not isinstance(node, dict):
+        return None
+    if 'simpleText' in node:
+        return node['simpleText']
+    if 'runs' in node:
+        return "".join(run.get('text', '') for run in node['runs'])
+    if 'content' in node:  # view models
+        return node['content']
+    return None
+
+
+def _walk(node, key):
+    # every value stored under `key` anywhere in the JSON tree
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            for k, v in node.items():
+                if k == key:
+                    yield v
+                stack.append(v)
+        elif isinstance(node, list):
+            stack.extend(reversed(node))
+
+
+def parse_initial_data(data):
+    """
+    ytInitialData (또는 continuation 응답)에서 플레이리스트 정보 추출
+
+    Returns:
+        playlist_name (str): 플레이리스트 이름 (없으면 None)
+        video_names (list): 비디오 이름 리스트
+        video_urls (list): 비디오 url 리스트
+    """
+    playlist_name = None
+    for metadata in _walk(data, 'playlistMetadataRenderer'):
+        playlist_name = metadata.get('title')
+        break
+    if playlist_name is None:
+        for header in _walk(data, 'playlistHeaderRenderer'):
+            playlist_name = _text(header.get('title'))
+            break
+
+    video_names, video_urls = [], []
+    for renderer in _walk(data, 'playlistVideoRenderer'):
+        if 'videoId' not in renderer:
+            continue
+        video_names.append(_text(renderer.get('title')) or renderer['videoId'])
+        video_urls.append(WATCH_URL.format(renderer['videoId']))
+    return playlist_name, video_names, video_urls
+
+
+def parse_rendered_html(html):
+    """
+    브라우저가 렌더링한 DOM (a#video-title 요소)에서 비디오 정보 추출
+    """
+    video_names, video_urls = [], []
+    for tag in _RENDERED_VIDEO_PATTERN.findall(html):
+        href = re.search(r'href="([^"]+)"', tag)
+        title = re.search(r'title="([^"]*)"', tag)
+        if href is None:
+            continue
+        url = unescape(href.group(1))
+        video_urls.append(url if url.startswith('http') else "https://www.youtube.com" + url)
+        video_names.append(unescape(title.group(1)) if title else url)
+    return video_names, video_urls
+
+
+def parse_playlist_page(content):
+    """
+    저장된 플레이리스트 페이지 (HTML 또는 JSON 문자열) 파싱
+
+    Returns:
+        playlist_name (str), video_names (list), video_urls (list)
+    """
+    stripped = content.lstrip()
+    data = json.loads(stripped) if stripped.startswith(('{', '[')) else extract_initial_data(content)
+
+    playlist_name, video_names, video_urls = (None, [], []) if data is None else parse_initial_data(data)
+    if not video_urls:
+        video_names, video_urls = parse_rendered_html(content)
+    if playlist_name is None:
+        title = re.search(r'<title>(.*?)(?: - YouTube)?</title>', content, re.S)
+        playlist_name = unescape(title.group(1)).strip() if title else "Unknown_Playlist"
+
+    video_names, video_urls = _dedup(video_names, video_urls)
+    return playlist_name, video_names, video_urls
+
+
+# ************************* Backends *************************
+class HtmlPlaylistBackend:
+    """
+    저장된 페이지를 읽는 오프라인 backend
+
+    Args:
+        pages (dict | str): {playlist url 또는 list id: 파일 경로} 또는 <list id>.html / .json 파일이 있는 폴더
+    """
+
+    def __init__(self, pages):
+        self.pages = pages
+
+    def _path(self, playlist_url):
+        if isinstance(self.pages, dict):
+            return self.pages.get(playlist_url) or self.pages[playlist_id(playlist_url)]
+        for extension in ('.html', '.json'):
+            path = os.path.join(self.pages, playlist_id(playlist_url) + extension)
+            if os.path.exists(path):
+                return path
+        raise FileNotFoundError(f"no saved page for {playlist_url} in {self.pages}")
+
+    def get_videos(self, playlist_url):
+        with open(self._path(playlist_url), 'r', encoding='utf-8') as f:
+            return parse_playlist_page(f.read())
+
+    def close(self):
+        pass
+
+
+@lru_cache(maxsize=None)
+def chromedriver_path():
+    """
+    ChromeDriverManager().install()는 프로세스 당 1회
+    """
+    from webdriver_manager.chrome import ChromeDriverManager
+    return ChromeDriverManager().install()
+
+
+def init_selenium():
+    """
+    Selenium 드라이버 초기화
+
+    Returns:
+        driver (webdriver.Chrome): 초기화된 드라이버
+    """
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service
+
+    chrome_path = '/usr/bin/google-chrome-stable'
+
+    options = webdriver.ChromeOptions()
+    options.binary_location = chrome_path
+    options.add_argument("--headless")  # background without opening browser
+    options.add_argument('--no-sandbox')  # Sandbox 옵션 비활성화
+    options.add_argument('--disable-dev-shm-usage')  # 메모리 공유 비활성화
+
+    driver = webdriver.Chrome(service=Service(chromedriver_path()), options=options)
+    return driver
+
+
+class SeleniumPlaylistBackend:
+    """
+    오래 유지되는 headless Chrome 드라이버 pool
+
+    Args:
+        pool_size (int): 최대 드라이버 수 (필요할 때 생성)
+        timeout (float): 첫 비디오가 렌더링될 때까지 기다리는 시간 (초)
+        scroll_timeout (float): 스크롤 후 새 비디오가 로드되기를 기다리는 시간 (초)
+        max_scrolls (int): 스크롤 횟수 상한
+    """
+
+    def __init__(self, pool_size=2, timeout=15.0, scroll_timeout=5.0, max_scrolls=200):
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.scroll_timeout = scroll_timeout
+        self.max_scrolls = max_scrolls
+        self._idle = queue.Queue()
+        self._created = 0
+        self._drivers = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def driver(self):
+        """
+        pool에서 드라이버를 빌려 사용 후 반환 (오류가 난 드라이버는 폐기)
+        """
+        try:
+            driver = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                create = self._created < self.pool_size
+                if create:
+                    self._created += 1
+            if create:
+                driver = init_selenium()
+                with self._lock:
+                    self._drivers.append(driver)
+            else:
+                driver = self._idle.get()
+        try:
+            yield driver
+        except Exception:
+            self._discard(driver)
+            raise
+        else:
+            self._idle.put(driver)
+
+    def _discard(self, driver):
+        with self._lock:
+            self._created -= 1
+            if driver in self._drivers:
+                self._drivers.remove(driver)
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    def get_videos(self, playlist_url):
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.common.exceptions import TimeoutException
+
+        with self.driver() as driver:
+            driver.get(playlist_url)
+            WebDriverWait(driver, self.timeout).until(
+                EC.presence_of_element_located((By.XPATH, '//a[@id="video-title"]'))
+            )
+
+            # expected video count from the page header, to stop scrolling early
+            expected = None
+            counts = _VIDEO_COUNT_PATTERN.findall(driver.find_element(By.TAG_NAME, 'body').text)
+            if counts:
+                expected = int(counts[0].replace(',', ''))
+
+            count_videos = lambda d: len(d.find_elements(By.XPATH, '//a[@id="video-title"]'))
+            n_videos = count_videos(driver)
+            for _ in range(self.max_scrolls):
+                if expected is not None and n_videos >= expected:
+                    break
+                driver.execute_script("window.scrollTo(0, document.documentElement.scrollHeight);")
+                try:
+                    WebDriverWait(driver, self.scroll_timeout).until(lambda d: count_videos(d) > n_videos)
+                except TimeoutException:
+                    break  # nothing more to load
+                n_videos = count_videos(driver)
+
+            video_elements = driver.find_elements(By.XPATH, '//a[@id="video-title"]')
+            video_urls = [video.get_attribute('href') for video in video_elements]
+            video_names = [video.get_attribute('title') for video in video_elements]
+
+            # Try first XPath for playlist name, then the one used for youtube learning playlists
+            playlist_name = "Unknown_Playlist"
+            for xpath in ('//span[@class="yt-core-attributed-string yt-core-attributed-string--white-space-pre-wrap"]',
+                          '//yt-formatted-string[@id="text" and @disable-attributed-string]'):
+                elements = driver.find_elements(By.XPATH, xpath)
+                if elements and elements[0].text:
+                    playlist_name = elements[0].text
+                    break
+
+        video_names, video_urls = _dedup(video_names, video_urls)
+        return playlist_name, video_names, video_urls
+
+    def close(self):
+        with self._lock:
+            drivers, self._drivers = self._drivers, []
+            self._created = 0
+        for driver in drivers:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+        self._idle = queue.Queue()
+
+
+# Parse saved playlist pages
+if __name__ == '__main__':
+    import sys
+
+    for path in sys.argv[1:]:
+        with open(path, 'r', encoding='utf-8') as f:
+            name, names, urls = parse_playlist_page(f.read())
+        print(f"{path}: {name} ({len(urls)} videos)")
+        for video_name, url in zip(names, urls):
+            print(f"  {url}  {video_name}")
@@ -1,86 +1,219 @@
+import hashlib
+import json
 import os
+import re
+from multiprocessing import Pool
 
-def preprocess_youtube_dataset(unprocessed_path, processed_path):
-    if not os.path.exists(processed_path):
-        os.makedirs(processed_path)
-
-    for playlist_name in os.listdir(unprocessed_path):
-        print(f"Processing {playlist_name}... ", end='', flush=True)
-        
-        playlist_path = os.path.join(unprocessed_path, playlist_name)
-        
-        if not os.path.exists(os.path.join(processed_path, playlist_name)):
-            os.makedirs(os.path.join(processed_path, playlist_name))
-
-        transcript_file_names = os.listdir(playlist_path)
-
-        for file_name in transcript_file_names:
-            with open(os.path.join(playlist_path, file_name), 'r') as f:
-                transcript = f.readlines()
-
-            converted_transcript = []
-            for line in transcript:
-                _, text = line.split(' ', 1) # do not use start time
-                
-                # remove speaker tags
-                if '[' in line or ']' in line:
-                    splitted = text.split(' ')
-                    for word in splitted:
-                        if word.startswith('[') and word.endswith(']'):
-                            text = text.replace(word, '')
-                # remove multiple spaces
-                while '  ' in text:
-                    text = text.replace('  ', ' ')
-                
-                converted_transcript.append(text.strip())
-
-            with open(os.path.join(processed_path, playlist_name, file_name), 'w') as f:
-                f.write(' '.join(converted_transcript))
-        
-        print("Done.")
-
-def preprocess_youtube_dataset_light(unprocessed_path, processed_path):
-    if not os.path.exists(processed_path):
-        os.makedirs(processed_path)
-
-    for playlist_name in os.listdir(unprocessed_path):
-        print(f"Processing {playlist_name}... ", end='', flush=True)
-        
-        playlist_path = os.path.join(unprocessed_path, playlist_name)
-        
-        if not os.path.exists(os.path.join(processed_path, playlist_name)):
-            os.makedirs(os.path.join(processed_path, playlist_name))
+"""
+    raw transcript ("hh:mm:ss text" lines) -> one line of text per video
+
+    - single pass per line with compiled regexes, files are streamed line by line
+    - preprocessing is incremental per playlist: <processed playlist>/_manifest.json keeps
+      size / mtime / sha1 of every raw file, only new or changed transcripts are processed
+      and every output is written atomically (tmp file + os.replace)
+    - changed files are processed by a process pool (workers=N)
+
+    throughput benchmark: python benchmarks/bench_preprocess.py
+"""
+
+MANIFEST_NAME = '_manifest.json'
+
+# [Music], [Speaker1], ... as whole space separated words
+_SPEAKER_TAG = re.compile(r'(?<![^ ])\[[^ \n]*\](?![^ \n])')
+_SPACES = re.compile(r' {2,}')
 
-        transcript_file_names = os.listdir(playlist_path)
 
-        for file_name in transcript_file_names:
+def clean_line(line, light=False):
+    """
+    타임라인 제거 (첫 공백까지), light가 아니면 [speaker] 태그와 중복 공백 제거
+    """
+    text = line.partition(' ')[2]  # do not use start time
+    if not light:
+        # most lines have neither, skip the regex calls for them
+        if '[' in text:
+            text = _SPEAKER_TAG.sub('', text)
+        if '  ' in text:
+            text = _SPACES.sub(' ', text)
+    return text.strip()
+
+
+def iter_clean_lines(transcript, light=False):
+    """
+    비어 있지 않은 전처리 결과 line (transcript: line iterable, 파일 객체 가능)
+    """
+    for line in transcript:
+        text = clean_line(line, light)
+        if text:
+            yield text
+
+
+def preprocess_transcript(transcript):
+    """
+    타임라인 제거, [speaker] 태그 제거, 중복 공백 제거 후 한 줄로 합침
+    """
+    return ' '.join(iter_clean_lines(transcript))
+
+
+def preprocess_transcript_light(transcript):
+    """
+    타임라인만 제거 후 한 줄로 합침
+    """
+    return ' '.join(iter_clean_lines(transcript, light=True))
+
+
+def preprocess_file(raw_path, output_path, light=False):
+    """
+    파일 하나를 line 단위로 읽으며 전처리, 결과는 임시 파일에 한 번에 쓴 뒤 원자적으로 교체
+
+    Returns:
+        n_bytes (int): 읽은 raw 파일 크기
+    """
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    with open(raw_path, 'r') as src:
+        text = ' '.join(iter_clean_lines(src, light))
+    with open(tmp_path, 'w') as dst:
+        dst.write(text)
+    os.replace(tmp_path, output_path)
+    return os.path.getsize(raw_path)
+
+
+def _preprocess_file_args(args):
+    return preprocess_file(*args)
+
+
+def preprocess_files(jobs, pool=None):
+    """
+    (raw_path, output_path, light) 작업들을 처리 (pool이 주어지면 process pool에서)
+
+    Returns:
+        n_bytes (int): 읽은 raw 바이트 수
+    """
+    if pool is None or len(jobs) <= 1:
+        return sum(preprocess_file(*job) for job in jobs)
+    return sum(pool.imap_unordered(_preprocess_file_args, jobs, chunksize=8))
+
+
+def _write_atomic(path, text):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def _file_sha1(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def transcript_files(playlist_path):
+    """
+    playlist 폴더의 raw transcript 파일 (report / manifest / 임시 파일 제외)
+    """
+    return sorted(
+        file_name for file_name in os.listdir(playlist_path)
+        if file_name.endswith('.txt') and not file_name.startswith('_')
+        and os.path.isfile(os.path.join(playlist_path, file_name))
+    )
+
+
+def preprocess_playlist(raw_playlist_path, processed_playlist_path, light=False, pool=None):
+    """
+    플레이리스트 하나를 증분 전처리 (새로 추가되었거나 변경된 transcript만)
+
+    Args:
+        raw_playlist_path (str): raw transcript 폴더
+        processed_playlist_path (str): 출력 폴더
+        light (bool): preprocess_transcript_light 사용 (출력 파일명의 .txt.txt -> .txt)
+        pool (multiprocessing.Pool): 변경된 파일을 처리할 process pool (default: 현재 프로세스)
+
+    Returns:
+        n_processed (int), n_skipped (int)
+    """
+    os.makedirs(processed_playlist_path, exist_ok=True)
+    variant = 'light' if light else 'full'
+
+    manifest_path = os.path.join(processed_playlist_path, MANIFEST_NAME)
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    if manifest.get('variant') != variant:
+        manifest = {'variant': variant, 'files': {}}
+
+    n_skipped, jobs, updates = 0, [], {}
+    try:
+        for file_name in transcript_files(raw_playlist_path):
+            raw_path = os.path.join(raw_playlist_path, file_name)
             # Normalize file name to avoid `.txt.txt`
-            if file_name.endswith('.txt.txt'):
-                normalized_file_name = file_name.replace('.txt.txt', '.txt')
+            output_name = file_name.replace('.txt.txt', '.txt') if light else file_name
+            output_path = os.path.join(processed_playlist_path, output_name)
+
+            stat = os.stat(raw_path)
+            entry = manifest['files'].get(file_name)
+            if entry is not None and os.path.exists(output_path):
+                if entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+                    n_skipped += 1
+                    continue
+                sha1 = _file_sha1(raw_path)
+                if entry['sha1'] == sha1:  # touched but not changed
+                    entry['mtime_ns'] = stat.st_mtime_ns
+                    n_skipped += 1
+                    continue
             else:
-                normalized_file_name = file_name
+                sha1 = _file_sha1(raw_path)
 
-            with open(os.path.join(playlist_path, file_name), 'r') as f:
-                transcript = f.readlines()
+            jobs.append((raw_path, output_path, light))
+            updates[file_name] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha1': sha1}
 
-            processed_transcript = []
-            for line in transcript:
-                # Remove timeline by splitting at the first space
-                _, text = line.split(' ', 1)
-                processed_transcript.append(text.strip())
+        preprocess_files(jobs, pool)
+        manifest['files'].update(updates)
+    finally:
+        _write_atomic(manifest_path, json.dumps(manifest, indent=1, ensure_ascii=False))
 
-            # Combine all lines into a single line (removing newlines)
-            combined_transcript = ' '.join(processed_transcript)
+    return len(jobs), n_skipped
+
+
+def preprocess_youtube_dataset(unprocessed_path, processed_path, playlists=None, light=False, workers=1):
+    """
+    모든 (또는 주어진) 플레이리스트를 증분 전처리
+
+    Args:
+        unprocessed_path (str): raw dataset 폴더 (<playlist>/<video>.txt)
+        processed_path (str): 출력 폴더
+        playlists (list[str]): 처리할 플레이리스트 폴더 이름 (default: 전체)
+        light (bool): preprocess_transcript_light 사용
+        workers (int): 프로세스 수
+    """
+    if not os.path.exists(processed_path):
+        os.makedirs(processed_path)
 
-            # Write the processed file with the normalized name
-            with open(os.path.join(processed_path, playlist_name, normalized_file_name), 'w') as f:
-                f.write(combined_transcript)
-        
-        print("Done.")
+    if playlists is None:
+        playlists = sorted(
+            name for name in os.listdir(unprocessed_path) if os.path.isdir(os.path.join(unprocessed_path, name))
+        )
+
+    pool = Pool(processes=workers) if workers > 1 else None
+    try:
+        for playlist_name in playlists:
+            print(f"Processing {playlist_name}... ", end='', flush=True)
+            n_processed, n_skipped = preprocess_playlist(
+                os.path.join(unprocessed_path, playlist_name), os.path.join(processed_path, playlist_name), light, pool
+            )
+            print(f"Done. ({n_processed} processed, {n_skipped} unchanged)")
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+def preprocess_youtube_dataset_light(unprocessed_path, processed_path, playlists=None, workers=1):
+    preprocess_youtube_dataset(unprocessed_path, processed_path, playlists, light=True, workers=workers)
 
 if __name__ == '__main__':
     unprocessed_path = '../raw_dataset/youtube_dataset'
     processed_path = '../preprocessed_dataset/youtube_dataset'
 
-    #preprocess_youtube_dataset(unprocessed_path, processed_path)
-    preprocess_youtube_dataset_light(unprocessed_path, processed_path)
\ No newline at end of file
+    #preprocess_youtube_dataset(unprocessed_path, processed_path, workers=os.cpu_count())
+    preprocess_youtube_dataset_light(unprocessed_path, processed_path, workers=os.cpu_count())
@@ -1,57 +1,30 @@
 # built-in modules
+import atexit
 import os
-import time
 
-# third-party modules
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
-from youtube_transcript_api import YouTubeTranscriptApi, TranscriptsDisabled
-
-
-import re
-
-def sanitize_filename(filename, txt=True):
-    """
-    파일명에 사용할 수 없는 문자들을 제거하고 파일명을 안전하게 만듭니다.
-    """
-    # 특수 문자 제거 및 공백 제거
-    filename = re.sub(r'[\\/*?:"<>|]', "", filename).strip()
-    # 한글 또는 ASCII 외 문자 제거 (원한다면 제거하지 않아도 됨)
-    filename = re.sub(r'[^\w\s]', "", filename)
-    # 길이 제한 및 공백을 언더스코어로 변환
-    filename = "_".join(filename.split())[:100]
-    # 확장자 `.txt` 보장
-    if not filename.endswith(".txt") and txt:
-        filename += ".txt"
-    return filename
+from playlist_enumerator import SeleniumPlaylistBackend
+from transcript_fetcher import sanitize_filename, fetch_transcripts  # sanitize_filename: used by data_preparation.py
 
 # *********************** Get each video's url from the playlist ***********************
-def init_selenium():
-    """
-    Selenium 드라이버 초기화
+_default_backend = None
 
-    Returns:
-        driver (webdriver.Chrome): 초기화된 드라이버
+def get_playlist_backend():
     """
-    chrome_path = '/usr/bin/google-chrome-stable'
-
-    options = webdriver.ChromeOptions()
-    options.binary_location = chrome_path
-    options.add_argument("--headless")  # background without opening browser
-    options.add_argument('--no-sandbox')  # Sandbox 옵션 비활성화
-    options.add_argument('--disable-dev-shm-usage')  # 메모리 공유 비활성화
-
-    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
-    return driver
+    프로세스에서 공유하는 Selenium 드라이버 pool (종료 시 드라이버 정리)
+    """
+    global _default_backend
+    if _default_backend is None:
+        _default_backend = SeleniumPlaylistBackend()
+        atexit.register(_default_backend.close)
+    return _default_backend
 
-def get_videos_from_playlist(playlist_url):
+def get_videos_from_playlist(playlist_url, backend=None):
     """
-    플레이리스트 url로부터 비디오 정보 추출
+    플레이리스트 url로부터 비디오 정보 추출 (스크롤하여 전체 비디오)
 
     Args:
         playlist_url (str): 플레이리스트 url
+        backend: playlist backend (default: 공유 Selenium pool, 오프라인: HtmlPlaylistBackend(저장된 페이지 폴더))
 
     Returns:
         playlist_name (str): 플레이리스트 이름
@@ -60,31 +33,9 @@ def get_videos_from_playlist(playlist_url):
     """
     print("Extracting video urls from the playlist... ", end='', flush=True)
 
-    driver = init_selenium()
-    driver.get(playlist_url)
-    time.sleep(1)  # wait for page to load
-
-    try:
-        video_elements = driver.find_elements(By.XPATH, '//a[@id="video-title"]')
-        video_urls = [video.get_attribute('href') for video in video_elements]
-        video_names = [video.get_attribute('title') for video in video_elements]
-        
-        # Try first XPath for playlist name
-        try:
-            playlist_name = driver.find_element(By.XPATH, '//span[@class="yt-core-attributed-string yt-core-attributed-string--white-space-pre-wrap"]').text
-        except:
-            # If first XPath fails, try the alternative XPath - used for youtube learning playlists
-            try:
-                playlist_name = driver.find_element(By.XPATH, '//yt-formatted-string[@id="text" and @disable-attributed-string]').text
-            except:
-                playlist_name = "Unknown_Playlist"
-                
-    except Exception as e:
-        print(f"Error occurred while getting video elements: {e}")
-
-    driver.quit()
-
-    print("Done.")
+    playlist_name, video_names, video_urls = (backend or get_playlist_backend()).get_videos(playlist_url)
+
+    print(f"Done. ({len(video_urls)} videos)")
     return playlist_name, video_names, video_urls
 
 # ************************* parsing video id from url *************************
@@ -102,66 +53,27 @@ def get_video_id_from_url(video_urls):
 
 
 # ************************* Extracting subtitles *************************
-def convert_transcript_format(transcript):
-    """
-    딕셔너리 형태의 객체를 텍스트로 변환
-    [{'text': 'Hello world.', 'start': 1.0, 'duration': 2.0}, ...] -> "hh:mm:ss Hello world.\nhh:mm:ss Hello world. ..."
-
-    Args:
-        transcript (list[dict]): 비디오 자막 정보
-
-    Returns:
-        converted_transcript (list[str]): 변환된 텍스트 리스트
-    """
-    converted_transcript = []
-    for line in transcript:
-        start = int(line['start'])
-        start = time.strftime('%H:%M:%S', time.gmtime(start))
-        
-        text = line['text'].replace('\n', ' ') # new line to space
-        converted_transcript.append(f"{start} {text}")
-    return converted_transcript
-
-def get_playlist_transcript(playlist_name, video_names, video_ids, output_dir=os.getcwd()):
+def get_playlist_transcript(playlist_name, video_names, video_ids, output_dir=os.getcwd(), provider=None,
+                            workers=8, rate=5.0, max_retries=4):
     """
-    플레이리스트의 각 비디오로부터 자막 추출
-    플레이리스트 이름으로 폴더 생성 후 각 비디오의 자막을 텍스트 파일로 저장, 각 파일의 이름은 <비디오 이름>.txt
+    플레이리스트의 각 비디오로부터 자막 추출 (병렬, rate limit + 재시도, 이미 저장된 비디오는 건너뜀)
+    플레이리스트 이름으로 폴더 생성 후 각 비디오의 자막을 텍스트 파일로 저장, 각 파일의 이름은 <비디오 이름>_<비디오 id>.txt.txt
 
     Args:
         playlist_name (str): 플레이리스트 이름
         video_names (list[str]): 비디오 이름 리스트
         video_ids (list[str]): 비디오 id 리스트
+        provider: 자막 provider (default: youtube-transcript-api, 테스트: transcript_fetcher.StubTranscriptProvider)
+        workers (int): 동시 요청 수
+        rate (float): 초당 요청 수
+        max_retries (int): 일시적 오류 재시도 횟수
 
     Returns:
-        None
+        report (dict): fetched / cached / unavailable / failed 비디오 (playlist 폴더의 _fetch_report.json)
     """
     playlist_path = os.path.join(output_dir, sanitize_filename(playlist_name, False))
-    if not os.path.exists(playlist_path):
-        os.makedirs(playlist_path)
-
-    for video_name, video_id in zip(video_names, video_ids):
-        print(f"Extracting subtitles from video: {video_name}... ", end='', flush=True)
-        try:
-            # 우선 수동으로 작성된 자막을 시도
-            transcript = YouTubeTranscriptApi.list_transcripts(video_id).find_manually_created_transcript(['en', 'en-US']).fetch()
-        except (TranscriptsDisabled, Exception):
-            # 수동 자막이 없을 경우 자동 생성 자막으로 대체
-            try:
-                transcript = YouTubeTranscriptApi.get_transcript(video_id, languages=['en'])
-            except Exception as e:
-                print(f"Error occurred: {e}")
-                continue  # 자막이 없을 경우 해당 비디오를 건너뜁니다.
-
-        
-        # 파일 이름을 안전하게 처리
-        safe_video_name = sanitize_filename(video_name)
-        # 자막을 변환하고 저장
-        converted_transcript = convert_transcript_format(transcript)
-        with open(os.path.join(playlist_path, f"{safe_video_name}.txt"), 'w') as f:
-            f.write('\n'.join(converted_transcript))
-        print("Done.")
-    
-    return None
+    return fetch_transcripts(playlist_path, video_names, video_ids, provider=provider,
+                             workers=workers, rate=rate, max_retries=max_retries)
 
 if __name__ == '__main__':
     playlist_urls = [
@@ -0,0 +1,298 @@
+# built-in modules
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+"""
+    concurrent transcript fetching used by transcript_extractor.get_playlist_transcript
+
+    - bounded thread pool, shared token-bucket rate limit (requests / sec)
+    - exponential backoff with jitter for transient errors, no retry when a video has no transcript
+    - one list_transcripts round-trip per video (manual captions, else auto-generated)
+    - already saved transcripts are skipped (files are written atomically, so a file means done)
+    - files are keyed by video id (<title>_<video id>.txt.txt), videos with similar titles never collide
+    - _fetch_report.json per playlist: fetched / cached / unavailable / failed videos
+
+    stub benchmark (no network): python transcript_fetcher.py --videos 1000 --workers 32
+"""
+
+REPORT_NAME = '_fetch_report.json'
+
+
+class TranscriptUnavailable(Exception):
+    """
+    permanent failure: captions disabled, no english transcript, video removed
+    """
+
+
+def sanitize_filename(filename, txt=True):
+    """
+    파일명에 사용할 수 없는 문자들을 제거하고 파일명을 안전하게 만듭니다.
+    """
+    # 특수 문자 제거 및 공백 제거
+    filename = re.sub(r'[\\/*?:"<>|]', "", filename).strip()
+    # 한글 또는 ASCII 외 문자 제거 (원한다면 제거하지 않아도 됨)
+    filename = re.sub(r'[^\w\s]', "", filename)
+    # 길이 제한 및 공백을 언더스코어로 변환
+    filename = "_".join(filename.split())[:100]
+    # 확장자 `.txt` 보장
+    if not filename.endswith(".txt") and txt:
+        filename += ".txt"
+    return filename
+
+
+def transcript_path(playlist_path, video_name, video_id):
+    """
+    저장 경로 <sanitized title>_<video id>.txt.txt (제목이 잘리거나 같아도 비디오마다 다른 파일)
+    """
+    return os.path.join(playlist_path, f"{sanitize_filename(video_name, False)}_{video_id}.txt.txt")
+
+
+def legacy_transcript_path(playlist_path, video_name):
+    """
+    이전 버전의 제목만 사용한 저장 경로 <sanitized>.txt.txt
+    """
+    return os.path.join(playlist_path, f"{sanitize_filename(video_name)}.txt")
+
+
+def convert_transcript_format(transcript):
+    """
+    딕셔너리 형태의 객체를 텍스트로 변환
+    [{'text': 'Hello world.', 'start': 1.0, 'duration': 2.0}, ...] -> "hh:mm:ss Hello world.\nhh:mm:ss Hello world. ..."
+
+    Args:
+        transcript (list[dict]): 비디오 자막 정보
+
+    Returns:
+        converted_transcript (list[str]): 변환된 텍스트 리스트
+    """
+    converted_transcript = []
+    for line in transcript:
+        start = int(line['start'])
+        start = time.strftime('%H:%M:%S', time.gmtime(start))
+
+        text = line['text'].replace('\n', ' ') # new line to space
+        converted_transcript.append(f"{start} {text}")
+    return converted_transcript
+
+
+# ************************* Providers *************************
+class YouTubeTranscriptProvider:
+    """
+    youtube-transcript-api, 비디오당 list_transcripts 1회 + fetch 1회
+    """
+
+    def __init__(self, languages=('en', 'en-US')):
+        self.languages = list(languages)
+
+    def fetch(self, video_id):
+        from youtube_transcript_api import YouTubeTranscriptApi, TranscriptsDisabled, NoTranscriptFound
+        try:
+            from youtube_transcript_api import VideoUnavailable
+        except ImportError:
+            VideoUnavailable = TranscriptsDisabled
+
+        try:
+            transcripts = YouTubeTranscriptApi.list_transcripts(video_id)
+        except (TranscriptsDisabled, VideoUnavailable) as e:
+            raise TranscriptUnavailable(type(e).__name__) from e
+
+        # 우선 수동으로 작성된 자막, 없으면 자동 생성 자막
+        for find in (transcripts.find_manually_created_transcript, transcripts.find_generated_transcript):
+            try:
+                return find(self.languages).fetch()
+            except NoTranscriptFound:
+                continue
+        raise TranscriptUnavailable(f"no transcript in {self.languages}")
+
+
+class StubTranscriptProvider:
+    """
+    로컬 테스트용 provider: 고정 지연, 일정 비율의 일시적 오류와 자막 없는 비디오 (video id로 결정)
+    """
+
+    def __init__(self, latency=0.2, transient_rate=0.1, unavailable_rate=0.05, n_lines=200):
+        self.latency = latency
+        self.transient_rate = transient_rate
+        self.unavailable_rate = unavailable_rate
+        self.n_lines = n_lines
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def fetch(self, video_id):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency)
+        draw = int(hashlib.md5(video_id.encode()).hexdigest()[:8], 16) / 0xFFFFFFFF
+        if draw < self.unavailable_rate:
+            raise TranscriptUnavailable("TranscriptsDisabled")
+        if random.random() < self.transient_rate:
+            raise ConnectionError("stub: too many requests")
+        return [{'text': f"line {i} of {video_id}", 'start': 2.0 * i, 'duration': 2.0} for i in range(self.n_lines)]
+
+
+# ************************* Rate limit / retry *************************
+class TokenBucket:
+    """
+    thread-safe token bucket: rate tokens / sec, up to capacity tokens of burst
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1.0):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def fetch_with_retry(provider, video_id, bucket, max_retries=4, backoff=1.0, max_backoff=30.0):
+    """
+    provider.fetch with rate limit and exponential backoff (TranscriptUnavailable is not retried)
+    """
+    for attempt in range(max_retries + 1):
+        if bucket is not None:
+            bucket.acquire()
+        try:
+            return provider.fetch(video_id)
+        except TranscriptUnavailable:
+            raise
+        except Exception:
+            if attempt == max_retries:
+                raise
+            delay = min(max_backoff, backoff * 2 ** attempt)
+            time.sleep(delay * (0.5 + random.random() / 2))  # jitter
+
+
+# ************************* Fetch a playlist *************************
+def _write_atomic(path, text):
+    # unique temporary file in the same directory (same file system for os.replace)
+    fd, tmp_path = tempfile.mkstemp(prefix='_', suffix='.tmp', dir=os.path.dirname(path) or '.')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def fetch_transcripts(playlist_path, video_names, video_ids, provider=None, workers=8, rate=5.0, burst=None,
+                      max_retries=4, backoff=1.0, retry_unavailable=False, verbose=True):
+    """
+    플레이리스트 비디오 자막을 병렬로 추출하여 playlist_path/<비디오 이름>_<비디오 id>.txt.txt로 저장
+
+    Args:
+        playlist_path (str): 저장 폴더
+        video_names (list[str]): 비디오 이름 리스트
+        video_ids (list[str]): 비디오 id 리스트
+        provider: fetch(video_id) -> list[dict] (default: YouTubeTranscriptProvider)
+        workers (int): 동시 요청 수
+        rate (float): 초당 요청 수 (모든 worker 공유)
+        burst (float): 한 번에 허용하는 요청 수 (default: rate)
+        max_retries (int): 일시적 오류 재시도 횟수
+        backoff (float): 첫 재시도 대기 시간 (초), 매 재시도마다 2배
+        retry_unavailable (bool): 이전 실행에서 자막 없음으로 기록된 비디오도 다시 시도
+
+    Returns:
+        report (dict): {'fetched': [...], 'cached': [...], 'unavailable': {id: reason}, 'failed': {id: reason}}
+    """
+    provider = provider or YouTubeTranscriptProvider()
+    bucket = TokenBucket(rate, burst) if rate else None
+    os.makedirs(playlist_path, exist_ok=True)
+
+    report_path = os.path.join(playlist_path, REPORT_NAME)
+    previous = {}
+    if os.path.exists(report_path):
+        with open(report_path) as f:
+            previous = json.load(f)
+    known_unavailable = {} if retry_unavailable else previous.get('unavailable', {})
+
+    # a title-only file of an earlier run is adopted only when a single video of the playlist maps to it
+    legacy_owners = Counter(legacy_transcript_path(playlist_path, video_name) for video_name in video_names)
+
+    report = {'fetched': [], 'cached': [], 'unavailable': {}, 'failed': {}}
+    todo = []
+    for video_name, video_id in zip(video_names, video_ids):
+        path = transcript_path(playlist_path, video_name, video_id)
+        legacy_path = legacy_transcript_path(playlist_path, video_name)
+        if not os.path.exists(path) and legacy_owners[legacy_path] == 1 and os.path.exists(legacy_path):
+            os.replace(legacy_path, path)
+        if os.path.exists(path):
+            report['cached'].append(video_id)
+        elif video_id in known_unavailable:
+            report['unavailable'][video_id] = known_unavailable[video_id]
+        else:
+            todo.append((video_name, video_id, path))
+
+    def fetch_one(video_name, video_id, path):
+        transcript = fetch_with_retry(provider, video_id, bucket, max_retries, backoff)
+        _write_atomic(path, '\n'.join(convert_transcript_format(transcript)))
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(fetch_one, *video): video for video in todo}
+        for done, future in enumerate(as_completed(futures), 1):
+            video_name, video_id, _ = futures[future]
+            try:
+                future.result()
+                report['fetched'].append(video_id)
+                status = "Done."
+            except TranscriptUnavailable as e:
+                report['unavailable'][video_id] = str(e)
+                status = f"No transcript ({e})"
+            except Exception as e:
+                report['failed'][video_id] = f"{type(e).__name__}: {e}"
+                status = f"Error occurred: {e}"
+            if verbose:
+                print(f"[{done}/{len(todo)}] {video_name}: {status}")
+
+    _write_atomic(report_path, json.dumps(report, indent=2, ensure_ascii=False))
+    if verbose:
+        print(f"fetched {len(report['fetched'])}, cached {len(report['cached'])}, "
+              f"unavailable {len(report['unavailable'])}, failed {len(report['failed'])}")
+    return report
+
+
+# Stub benchmark: sequential vs concurrent fetching of a synthetic playlist
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--videos", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--rate", type=float, default=200.0)
+    parser.add_argument("--latency", type=float, default=0.2)
+    args = parser.parse_args()
+
+    provider = StubTranscriptProvider(latency=args.latency)
+    names = [f"video {i}" for i in range(args.videos)]
+    ids = [f"vid{i:06d}" for i in range(args.videos)]
+    with tempfile.TemporaryDirectory() as output_dir:
+        s = time.time()
+        report = fetch_transcripts(output_dir, names, ids, provider, workers=args.workers, rate=args.rate,
+                                   backoff=0.05, verbose=False)
+        elapsed = time.time() - s
+        print(f"{args.videos} videos, {provider.calls} requests: {elapsed:.2f} sec "
+              f"(sequential, two round-trips per video: ~{2 * args.videos * args.latency:.0f} sec)")
+        print({key: len(value) for key, value in report.items()})
+
+        s = time.time()
+        report = fetch_transcripts(output_dir, names, ids, provider, workers=args.workers, verbose=False)
+        print(f"rerun: {time.time() - s:.2f} sec", {key: len(value) for key, value in report.items()})
@@ -3,41 +3,34 @@ import os
 import time
 
 # ====================== [third-party modules] =====================
-import yaml
-from box import Box
 import numpy as np
-from datasets import load_dataset
-from bert_score import score as bert_score
-from rouge_score import rouge_scorer
-import matplotlib.pyplot as plt
 
 # ======================= [custom modules] =========================
-from utils.eval_similarity import *
-from utils.utils import *
-from utils.segment_embedding import *
-from utils.concat_functions import *
-from utils.summarizer import *
+# heavy dependencies (torch, transformers, sklearn, bert_score, ...) are imported
+# on first use through utils.registry
+from utils.config import load_config
+from utils.registry import get_metric
+from utils.pipeline import Pipeline
+from utils.dataset_cache import load_documents
+from utils.instrumentation import RunRecorder
+from utils.profiling import StageProfiler
 
 
 # ========================= [Load config] ===========================
-with open("config.yaml", "r") as f:
-    config = yaml.load(f, Loader=yaml.FullLoader)
-    config = Box(config)
+config = load_config("config.yaml")
+
+# segmentation -> concat -> summarization steps (utils/pipeline.py)
+pipeline = Pipeline(config)
+calculate_rouge_scores = get_metric('rouge')
+calculate_semantic_similarity = get_metric('semantic_similarity')
 
 print('Experiment name:', config.experiment_name)
 print('===============================================')
 
 # ========================== [Load data] ============================
 print("Loading data... ", end="", flush=True)
-if config.data.source == 'opensource':
-    datasets = load_dataset(config.data.opensource)
-    indices = np.load(f'data/gov_indices{config.data.index_set}.npy')
-    datasets = datasets['train'].select(indices)['report']
-
-elif config.data.source == 'youtube':
-    datasets = load_dataset(config.data.youtube)
-    indices = np.load(f'data/ytb_indices{config.data.index_set}.npy')
-    datasets = datasets['train'].select(indices)['content']
+# lazily read from data/cache (materialized from the HF dataset on first use)
+datasets = load_documents(config.data)
 print("Done")
 print('===============================================')
 
@@ -45,6 +38,11 @@ save_dir_path = os.path.join('experiments', f'{config.experiment_name}')
 if not os.path.exists(save_dir_path):
     os.makedirs(save_dir_path)
 
+# per-document stage timings / counters -> timings.jsonl, timing_summary.txt
+recorder = RunRecorder(save_dir_path)
+# opt-in cProfile / torch.profiler of selected stages and documents -> profile/
+profiler = StageProfiler(config.get('profile'), save_dir_path)
+
 # ========================== [Run experiments] ==========================
 max_score = 0
 best_summary = ""
@@ -53,61 +51,56 @@ evaluation_results = []
 for di, text in enumerate(datasets):
     print(f" ----------------- [{di+1}/{len(datasets)}] ----------------- ")
     init_s = time.time()
+    recorder.start_document(di)
 
     # ========================== [Segmentation] ========================
     print("Segmentating... ", end="", flush=True)
-    s = time.time()
-    segments = segmentate_sentence(text, **config.segment.args)
-    e = time.time()
-    print("Done", f"{e-s:.2f} sec")
+    with recorder.stage('segmentation') as timing, profiler('segmentation', di):
+        segments = pipeline.segment(text)
+    print("Done", f"{timing.wall:.2f} sec")
+
+    # ========================== [Deduplication] =======================
+    if pipeline.dedup:
+        print("Deduplicating... ", end="", flush=True)
+        with recorder.stage('dedup') as timing, profiler('dedup', di):
+            unique_segments, unique_indices, inverse = pipeline.deduplicate(segments)
+        print("Done", f"{timing.wall:.2f} sec", f"({len(unique_indices)}/{len(segments)} unique)")
+        recorder.count(n_unique_segments=len(unique_indices))
+    else:
+        unique_segments, unique_indices, inverse = segments, None, None
 
     # ========================== [Clustering] ==========================
     print("Clustering...   ", end="", flush=True)
-    s = time.time()
-    concat_indices = globals()[config.concat.method](segments, **config.concat.args)
-    e = time.time()
-    print("Done", f"{e-s:.2f} sec")
+    with recorder.stage('clustering') as timing, profiler('clustering', di):
+        concat_indices = pipeline.cluster(segments, unique_segments, unique_indices, inverse, text=text)
+    print("Done", f"{timing.wall:.2f} sec")
 
     max_group_size = max([len(group) for group in concat_indices])
     avg_group_size = np.mean([len(group) for group in concat_indices])
     print(f"Num. of Cluster: {len(concat_indices)}, Max group size: {max_group_size}, Avg. group size: {avg_group_size:.2f}")
+    recorder.count(n_segments=len(segments), n_clusters=len(concat_indices),
+                   max_group_size=max_group_size, avg_group_size=float(avg_group_size))
 
     # ========================== [Ready to summarize] ==================
-    batch_clusters = [
-        " ".join([segments[gi] for gi in group]) for group in concat_indices
-    ]
+    batch_clusters = pipeline.cluster_texts(segments, concat_indices)
 
     # ========================== [Summarize] ===========================
     print("Summarizing...  ", end="", flush=True)
-    s = time.time()
-    if config.mini_batch.size > 0:
-        mini_batch_size = (len(batch_clusters)
-                           if len(batch_clusters) < config.mini_batch.size else
-                           config.mini_batch.size)
-
-        batch_summaries = []
-        for i in range(0, len(batch_clusters), mini_batch_size):
-            mini_batch_summaries = summarizer(batch_clusters[i:i+mini_batch_size], **config.summary.args)
-            batch_summaries.append(mini_batch_summaries)
-        batch_summaries = " ".join(batch_summaries)
-    else:
-        batch_summaries = summarizer(batch_clusters, **config.summary.args)
-    e = time.time()
-    print("Done", f"{e-s:.2f} sec")
+    with recorder.stage('summarization') as timing, profiler('summarization', di):
+        batch_summaries = pipeline.summarize(batch_clusters)
+    print("Done", f"{timing.wall:.2f} sec")
 
     # ========================== [Evaluate] ============================
     print("Evaluating...   ", end="", flush=True)
-    s = time.time()
-    
-    rouge1, rouge2, rougeL = calculate_rouge_scores(text, batch_summaries)
-    s_score = calculate_sementic_similarity(text, batch_summaries)
+    with recorder.stage('evaluation') as timing, profiler('evaluation', di):
+        rouge1, rouge2, rougeL = calculate_rouge_scores(text, batch_summaries)
+        s_score = calculate_semantic_similarity(text, batch_summaries)
 
     # scale score * 100
     rouge1, rouge2, rougeL = rouge1*100, rouge2*100, rougeL*100
     s_score = s_score * 100
 
-    e = time.time()
-    print("Done", f"{e-s:.2f} sec")
+    print("Done", f"{timing.wall:.2f} sec")
     
     print(f"=> ROUGE-1: {rouge1:.2f}, ROUGE-2: {rouge2:.2f}, ROUGE-L: {rougeL:.2f}")
     print(f"=> BERTScore: {s_score:.2f}")
@@ -126,6 +119,7 @@ for di, text in enumerate(datasets):
         'bert_score': s_score
     })
     print(f"Total: {time.time()-init_s:.2f} sec")
+    recorder.end_document()
 
     # append summary and scores to text file (cummulative)
     # Ensure directories exist
@@ -152,7 +146,11 @@ print("===============================================")
 
 # ====================== [Save experiment result] ======================
 print("Saving evaluation results... ")
+import matplotlib.pyplot as plt
+
 
+# Stage timing percentiles
+print(recorder.write_summary())
 
 # Copy config file
 os.system(f'cp config.yaml {save_dir_path}')
@@ -5,10 +5,10 @@ import time
 import yaml
 import numpy as np
 import matplotlib.pyplot as plt
-from datasets import load_dataset
 # ======================= [custom modules] =========================
 from utils.eval_similarity import calculate_semantic_similarity, calculate_bert_score
 from utils.segment_embedding import *
+from utils.dataset_cache import load_documents
 
 
 
@@ -64,18 +64,7 @@ def plot_similarity_distribution(similarity_scores, save_path, target_name):
 
 def load_original_text(config):
     print("Loading data... ", end="", flush=True)
-    if config["data"]["source"] == "opensource":
-
-        datasets = load_dataset(config["data"]["opensource"])
-        indices = np.load(f"./data/gov_indices{config['data']['index_set']}.npy")
-        original_texts = datasets["train"].select(indices)["report"]
-
-    elif config["data"]["source"] == "youtube":
-
-        datasets = load_dataset(config["data"]["youtube"])
-        indices = np.load(f"./data/ytb_indices{config['data']['index_set']}.npy")
-        original_texts = datasets["train"].select(indices)["content"]
-
+    original_texts = load_documents(config["data"], cache_dir="./data/cache", indices_dir="./data")
     print("Done.")
     return original_texts
 
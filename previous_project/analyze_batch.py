@@ -2,12 +2,15 @@
 
 import os
 import re
+import sys
 import json
 import collections
+import warnings
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
-from typing import List, Dict, Tuple, Set
+from functools import lru_cache
+from typing import List, Dict, Tuple, Set, Iterator, Iterable, Optional, Union
 
 def get_all_txt_files(base_path: str = 'preprocessed_dataset/youtube_dataset') -> List[str]:
     """
@@ -46,6 +49,76 @@ def load_transcripts(file_paths: List[str]) -> Tuple[List[str], List[str]]:
             
     return transcripts, transcript_names
 
+def iter_transcripts(file_paths: Iterable[str]) -> Iterator[Tuple[str, str]]:
+    """
+    Read transcripts lazily from txt files, one file in memory at a time.
+    
+    Args:
+        file_paths (Iterable[str]): File paths to read
+        
+    Returns:
+        Iterator[Tuple[str, str]]: (transcript, name) pairs
+    """
+    for file in file_paths:
+        with open(file, 'r') as f:
+            yield f.read(), file.split('/')[-1].split('.')[0]
+
+def count_words(file_paths: Iterable[str]) -> List[int]:
+    """
+    Word count of every txt file without keeping the transcripts.
+    
+    Args:
+        file_paths (Iterable[str]): File paths to read
+        
+    Returns:
+        List[int]: Word counts in file order
+    """
+    return [len(transcript.split()) for transcript, _ in iter_transcripts(file_paths)]
+
+def _corpus_reader(corpus_dir: str):
+    # corpus.py lives with the collect scripts, which are run from their own directory
+    collect_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'collect_script')
+    if collect_script not in sys.path:
+        sys.path.insert(0, collect_script)
+    from corpus import CorpusReader
+    return CorpusReader(corpus_dir)
+
+def iter_corpus_transcripts(corpus_dir: str) -> Iterator[Tuple[str, str]]:
+    """
+    Stream transcripts from a sharded corpus built by data/collect_script/corpus.py.
+    
+    Args:
+        corpus_dir (str): Corpus directory (shards + index.jsonl + corpus.json)
+        
+    Returns:
+        Iterator[Tuple[str, str]]: (transcript, name) pairs, one record in memory at a time
+    """
+    for record in _corpus_reader(corpus_dir):
+        yield record['content'], record['file_name'].split('.')[0]
+
+def load_corpus_transcripts(corpus_dir: str, keys: List[Tuple[str, str]] = None) -> Tuple[List[str], List[str]]:
+    """
+    Load transcripts from a sharded corpus, like load_transcripts for txt files.
+    
+    Args:
+        corpus_dir (str): Corpus directory
+        keys (List[Tuple[str, str]]): (playlist, file_name) pairs to read through the offset index (default: all)
+        
+    Returns:
+        Tuple[List[str], List[str]]: Tuple containing lists of transcripts and their names
+    """
+    if keys is None:
+        pairs = list(iter_corpus_transcripts(corpus_dir))
+        return [t for t, _ in pairs], [n for _, n in pairs]
+
+    transcripts = []
+    transcript_names = []
+    with _corpus_reader(corpus_dir) as reader:
+        for playlist, file_name in keys:
+            transcripts.append(reader.get(playlist, file_name)['content'])
+            transcript_names.append(file_name.split('.')[0])
+    return transcripts, transcript_names
+
 def analyze_word_counts(transcripts: List[str]) -> Dict:
     """
     Analyze word counts of transcripts.
@@ -139,6 +212,173 @@ def create_batch_file(transcripts: List[str], transcript_names: List[str],
         for item in batch_data:
             f.write(json.dumps(item) + "\n")
 
+@lru_cache(maxsize=None)
+def get_tokenizer(model: str = 'gpt-4o-mini'):
+    """
+    Load the tiktoken encoding of the model once per process.
+    
+    Args:
+        model (str): OpenAI model name
+        
+    Returns:
+        tiktoken.Encoding: Encoding, or None (with a RuntimeWarning) when tiktoken is not installed
+    """
+    try:
+        import tiktoken
+    except ImportError:
+        warnings.warn("tiktoken is not installed (pip install tiktoken): token estimates fall back to "
+                      "characters / 4 and max_file_tokens limits may be off by a large factor", RuntimeWarning)
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding('o200k_base')
+
+def estimate_tokens(text: str, model: str = 'gpt-4o-mini') -> int:
+    """
+    Count the tokens of a text with the cached tokenizer (characters / 4 without tiktoken).
+    
+    Args:
+        text (str): Text
+        model (str): OpenAI model name
+        
+    Returns:
+        int: Token count
+    """
+    tokenizer = get_tokenizer(model)
+    if tokenizer is None:
+        return len(text) // 4 + 1
+    return len(tokenizer.encode(text, disallowed_special=()))
+
+@lru_cache(maxsize=16)
+def _prompt_tokens(system_prompt: str, model: str) -> int:
+    return estimate_tokens(system_prompt, model)
+
+class BatchFileWriter:
+    """
+    Write batch requests to numbered JSONL files that respect per-file limits.
+    
+    A new file is started when the next request would exceed the number of requests,
+    the bytes or the (enqueued) tokens of the current file. Every request is recorded
+    in an offset index, <prefix>.index.jsonl, so responses can be joined back to their
+    input without loading the batch files. When everything fits in one file it is
+    renamed to <prefix>.jsonl on close, the default input of custom_batch_api.py.
+    
+    Attributes:
+        prefix (str): Output path prefix, files are <prefix>_000.jsonl, <prefix>_001.jsonl, ...
+            (<prefix>.jsonl for a single file)
+        files (List[str]): Paths of the files written so far
+    """
+    
+    def __init__(self, prefix: str, max_requests: int = 50000, max_bytes: int = 200 * 2**20,
+                 max_tokens: Optional[int] = None):
+        """
+        Initialize the BatchFileWriter.
+        
+        Args:
+            prefix (str): Output path prefix
+            max_requests (int): Requests per file (Batch API limit: 50,000)
+            max_bytes (int): Bytes per file (Batch API limit: 200 MB)
+            max_tokens (int): Estimated tokens per file (enqueued token limit of the model), None for no limit
+        """
+        self.prefix = prefix
+        self.max_requests = max_requests
+        self.max_bytes = max_bytes
+        self.max_tokens = max_tokens
+        self.files: List[str] = []
+        self._file = None
+        self._requests = self._bytes = self._tokens = 0
+        self._index = open(f"{prefix}.index.jsonl", 'w', encoding='utf-8')
+    
+    def _next_file(self) -> None:
+        if self._file is not None:
+            self._file.close()
+        self.files.append(f"{self.prefix}_{len(self.files):03d}.jsonl")
+        self._file = open(self.files[-1], 'wb')
+        self._requests = self._bytes = self._tokens = 0
+    
+    def add(self, custom_id: str, request: Dict, tokens: int = 0) -> None:
+        """
+        Append one request.
+        
+        Args:
+            custom_id (str): Request id
+            request (Dict): Batch request line
+            tokens (int): Estimated tokens of the request
+        """
+        line = (json.dumps(request) + "\n").encode('utf-8')
+        if (self._file is None or self._requests >= self.max_requests
+                or (self._requests and self._bytes + len(line) > self.max_bytes)
+                or (self._requests and self.max_tokens and self._tokens + tokens > self.max_tokens)):
+            self._next_file()
+        self._index.write(json.dumps({"custom_id": custom_id, "file": len(self.files) - 1, "offset": self._bytes,
+                                      "length": len(line), "tokens": tokens}) + "\n")
+        self._file.write(line)
+        self._requests += 1
+        self._bytes += len(line)
+        self._tokens += tokens
+    
+    def close(self) -> List[str]:
+        """
+        Close the files.
+        
+        Returns:
+            List[str]: Paths of the batch files
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._index.close()
+        if len(self.files) == 1:
+            os.replace(self.files[0], f"{self.prefix}.jsonl")
+            self.files[0] = f"{self.prefix}.jsonl"
+        return self.files
+
+def write_batch_files(transcripts: Iterable[Tuple[str, str]], system_prompt: str, prefix: str = 'batch_input',
+                      model: str = 'gpt-4o-mini', max_tokens: int = 1000, max_requests: int = 50000,
+                      max_bytes: int = 200 * 2**20, max_file_tokens: Optional[int] = None) -> List[str]:
+    """
+    Stream (transcript, name) pairs into size-bounded batch files for API requests.
+    
+    Args:
+        transcripts (Iterable[Tuple[str, str]]): (transcript, name) pairs, consumed lazily
+        system_prompt (str): System prompt for the API
+        prefix (str): Output path prefix
+        model (str): Model of the requests (and of the token estimate)
+        max_tokens (int): max_tokens of every request
+        max_requests (int): Requests per file
+        max_bytes (int): Bytes per file
+        max_file_tokens (int): Estimated tokens per file, None for no limit
+        
+    Returns:
+        List[str]: Paths of the batch files (offset index: <prefix>.index.jsonl)
+    """
+    seen_custom_ids: Set[str] = set()
+    writer = BatchFileWriter(prefix, max_requests, max_bytes, max_file_tokens)
+    try:
+        for transcript, name in transcripts:
+            if name in seen_custom_ids:
+                continue
+            seen_custom_ids.add(name)
+            # the system prompt is sent twice: as the system message and after the transcript
+            tokens = estimate_tokens(transcript, model) + 2 * _prompt_tokens(system_prompt, model) + max_tokens
+            writer.add(name, {
+                "custom_id": name,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": model,
+                    "messages": [
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": transcript + "\n" + system_prompt}
+                    ],
+                    "max_tokens": max_tokens
+                }
+            }, tokens)
+    finally:
+        files = writer.close()
+    return files
+
 def validate_jsonl(file_path: str) -> bool:
     """
     Validate JSONL file format.
@@ -158,41 +398,89 @@ def validate_jsonl(file_path: str) -> bool:
         print(f"Validation failed at line {line_number}: {e}")
         return False
 
-def process_api_responses(input_file: str, output_file: str, response_file: str):
+def build_offset_index(input_files: List[str]) -> Dict[str, Tuple[int, int, int]]:
+    """
+    Map every custom_id of the batch files to the position of its line.
+    
+    Args:
+        input_files (List[str]): Batch input files
+        
+    Returns:
+        Dict[str, Tuple[int, int, int]]: custom_id -> (file number, byte offset, length)
+    """
+    index = {}
+    for file_number, input_file in enumerate(input_files):
+        offset = 0
+        with open(input_file, 'rb') as f:
+            for line in f:
+                index[json.loads(line)['custom_id']] = (file_number, offset, len(line))
+                offset += len(line)
+    return index
+
+def load_offset_index(index_file: str) -> Dict[str, Tuple[int, int, int]]:
+    """
+    Load the offset index written by BatchFileWriter.
+    
+    Args:
+        index_file (str): <prefix>.index.jsonl
+        
+    Returns:
+        Dict[str, Tuple[int, int, int]]: custom_id -> (file number, byte offset, length)
+    """
+    index = {}
+    with open(index_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            entry = json.loads(line)
+            index[entry['custom_id']] = (entry['file'], entry['offset'], entry['length'])
+    return index
+
+def process_api_responses(input_file: Union[str, List[str]], output_file: str, response_file: str,
+                          index_file: Optional[str] = None):
     """
     Process API responses and create paired data file.
     
+    Inputs are looked up through an offset index and read one line at a time, so memory
+    does not grow with the transcripts.
+    
     Args:
-        input_file (str): Path to input JSONL file
+        input_file (Union[str, List[str]]): Path(s) to the input JSONL batch file(s)
         output_file (str): Path to output JSONL file
         response_file (str): Path to response JSONL file
+        index_file (str): Offset index of the input files (built by scanning them when not given)
     """
-    # Create input lookup dictionary
-    input_lookup = {}
-    with open(input_file, 'r', encoding='utf-8') as f:
-        for line in f:
-            input_data = json.loads(line)
-            custom_id = input_data['custom_id']
-            user_content = input_data['body']['messages'][1]['content']
-            input_lookup[custom_id] = user_content
-
-    # Process output and create response file
-    with open(output_file, 'r', encoding='utf-8') as f, \
-         open(response_file, 'w', encoding='utf-8') as out_file:
-        for line in f:
-            output_data = json.loads(line)
-            custom_id = output_data['custom_id']
-            response = output_data['response']
-            
-            user_content = input_lookup.get(custom_id)
-            if user_content:
-                json.dump({
-                    'custom_id': custom_id,
-                    'role': 'user',
-                    'content': user_content,
-                    'response': response
-                }, out_file)
-                out_file.write('\n')
+    input_files = [input_file] if isinstance(input_file, str) else list(input_file)
+    if index_file is not None and os.path.exists(index_file):
+        index = load_offset_index(index_file)
+    else:
+        index = build_offset_index(input_files)
+    
+    handles = [open(path, 'rb') for path in input_files]
+    try:
+        with open(output_file, 'r', encoding='utf-8') as f, \
+             open(response_file, 'w', encoding='utf-8') as out_file:
+            for line in f:
+                output_data = json.loads(line)
+                custom_id = output_data['custom_id']
+                response = output_data['response']
+                
+                position = index.get(custom_id)
+                if position is None:
+                    continue
+                file_number, offset, length = position
+                handles[file_number].seek(offset)
+                input_data = json.loads(handles[file_number].read(length))
+                user_content = input_data['body']['messages'][1]['content']
+                if user_content:
+                    json.dump({
+                        'custom_id': custom_id,
+                        'role': 'user',
+                        'content': user_content,
+                        'response': response
+                    }, out_file)
+                    out_file.write('\n')
+    finally:
+        for handle in handles:
+            handle.close()
 
 def main():
     # Load system prompt
@@ -200,31 +488,30 @@ def main():
     
     # Get transcript files
     txt_files = get_all_txt_files()
-    transcripts, transcript_names = load_transcripts(txt_files)
-    
-    # Analyze word counts
-    stats = analyze_word_counts(transcripts)
-    plot_word_count_distribution(stats['word_counts'])
     
-    # Filter transcripts
-    filtered_transcripts, filtered_word_counts = filter_transcripts(
-        transcripts, stats['word_counts']
-    )
+    # Analyze word counts (first pass keeps only the counts)
+    word_counts = count_words(txt_files)
+    print(f"Word counts: mean {np.mean(word_counts):.0f}, max {np.max(word_counts)}, min {np.min(word_counts)}")
+    plot_word_count_distribution(word_counts)
     
-    # Create batch file
-    create_batch_file(filtered_transcripts, transcript_names, system_prompt_default)
+    # Filter transcripts (same thresholds as filter_transcripts) and stream them into batch files
+    bottom_threshold = np.percentile(word_counts, 0.5)
+    top_threshold = np.percentile(word_counts, 99.5)
+    kept_files = [path for path, count in zip(txt_files, word_counts) if bottom_threshold <= count <= top_threshold]
+    batch_files = write_batch_files(iter_transcripts(kept_files), system_prompt_default, 'batch_input')
     
-    # Validate batch file
-    if validate_jsonl('batch_input.jsonl'):
-        print("Batch file created and validated successfully!")
+    # Validate batch files
+    if all(validate_jsonl(path) for path in batch_files):
+        print(f"{len(batch_files)} batch file(s) created and validated successfully: {', '.join(batch_files)}")
         
     # Process API responses if output file exists
     if os.path.exists('batch_output.jsonl'):
         process_api_responses(
-            'batch_input.jsonl',
+            batch_files,
             'batch_output.jsonl',
-            'responses.jsonl'
+            'responses.jsonl',
+            index_file='batch_input.index.jsonl'
         )
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,75 +1,217 @@
+import argparse
 import asyncio
 import json
+import random
 import time
-from typing import List, Dict
+from typing import Awaitable, Callable, List, Dict, Optional, Set, Tuple
 import os
 from datetime import datetime
 from openai import AsyncOpenAI
 
 OPENAI_API = ""
-client = AsyncOpenAI(api_key=OPENAI_API)
+# retries are done by rate_limited_queries, under the rate limiter and the concurrency limit
+client = AsyncOpenAI(api_key=OPENAI_API, max_retries=0)
 
-class ProgressTracker:
+def _reversed_lines(f, block_size: int = 1 << 16):
     """
-    A class to track and persist progress of batch processing operations.
+    Lines of a binary file from the last to the first, without their newlines
+    (the first one yielded is the text after the last newline, empty if none).
+    """
+    f.seek(0, os.SEEK_END)
+    position, rest = f.tell(), b''
+    while position > 0:
+        step = min(block_size, position)
+        position -= step
+        f.seek(position)
+        lines = (f.read(step) + rest).split(b'\n')
+        rest = lines.pop(0)
+        yield from reversed(lines)
+    yield rest
+
+class ProgressJournal:
+    """
+    Append-only journal of completed and failed custom_ids, used to resume batch processing.
     
-    This class maintains a record of processed items and their indices, allowing for
-    resumption of batch processing operations in case of interruption.
+    Every finished item appends one JSON line; lines are buffered and fsynced in batches
+    (every `sync_every` records or `sync_interval` seconds), so checkpointing costs a
+    fraction of a write per item instead of rewriting a file. Replaying the journal gives
+    the latest state of every custom_id; the journal is compacted to one line per
+    custom_id when it grows past `compact_ratio` times the number of items.
     
     Attributes:
-        tracker_file (str): Path to the JSON file used to store progress information
-        processed_count (int): Number of items processed so far
-        last_processed_index (int): Index of the last successfully processed item
+        journal_file (str): Path to the JSONL journal
+        completed (Set[str]): custom_ids with a written response
+        failed (Dict[str, str]): custom_id -> last error, for items not completed since
+        last_processed_index (int): Highest input index completed
     """
     
-    def __init__(self, tracker_file: str = 'progress_tracker.json'):
+    def __init__(self, journal_file: str = 'progress_journal.jsonl', sync_every: int = 256,
+                 sync_interval: float = 1.0, compact_ratio: float = 2.0):
         """
-        Initialize the ProgressTracker.
+        Initialize the ProgressJournal and replay the existing journal.
         
         Args:
-            tracker_file (str): Path to the JSON file used to store progress information.
-                              Defaults to 'progress_tracker.json'
+            journal_file (str): Path to the JSONL journal. Defaults to 'progress_journal.jsonl'
+            sync_every (int): Records appended between fsyncs
+            sync_interval (float): Seconds between fsyncs while records are pending
+            compact_ratio (float): Compact when journal lines exceed this times the custom_ids
         """
-        self.tracker_file = tracker_file
-        self.processed_count = 0
+        self.journal_file = journal_file
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.compact_ratio = compact_ratio
+        self.completed: Set[str] = set()
+        self.failed: Dict[str, str] = {}
         self.last_processed_index = -1
+        self._indices: Dict[str, int] = {}
+        self._lines = 0
+        self._pending = 0
+        self._last_sync = time.monotonic()
         self.load_progress()
+        if self._lines > self.compact_ratio * max(1, len(self.completed) + len(self.failed)):
+            self.compact()
+        self._file = open(self.journal_file, 'a', encoding='utf-8')
+    
+    @property
+    def processed_count(self) -> int:
+        return len(self.completed)
+    
+    def _apply(self, entry: Dict) -> None:
+        custom_id = entry['custom_id']
+        self._indices[custom_id] = entry.get('index', -1)
+        if entry['status'] == 'completed':
+            self.completed.add(custom_id)
+            self.failed.pop(custom_id, None)
+            self.last_processed_index = max(self.last_processed_index, entry.get('index', -1))
+        elif custom_id not in self.completed:
+            self.failed[custom_id] = entry.get('error', '')
     
     def load_progress(self) -> None:
         """
-        Load previously saved progress from the tracker file.
-        
-        Reads the tracker file if it exists and updates the processed_count and
-        last_processed_index attributes. If the file doesn't exist or there's an error,
-        the default values are maintained.
+        Replay the journal (a line cut by an interruption is dropped from the file,
+        so the next append starts on a fresh line).
         """
-        if os.path.exists(self.tracker_file):
-            try:
-                with open(self.tracker_file, 'r') as f:
-                    data = json.load(f)
-                    self.processed_count = data.get('processed_count', 0)
-                    self.last_processed_index = data.get('last_processed_index', -1)
-                print(f"Loaded progress: processed {self.processed_count} items, last index: {self.last_processed_index}")
-            except Exception as e:
-                print(f"Error loading progress tracker: {e}")
-    
-    def save_progress(self) -> None:
+        if not os.path.exists(self.journal_file):
+            return
+        complete_end = 0
+        with open(self.journal_file, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                complete_end += len(line)
+                try:
+                    self._apply(json.loads(line))
+                except (json.JSONDecodeError, KeyError):
+                    continue
+                self._lines += 1
+        if complete_end < os.path.getsize(self.journal_file):
+            with open(self.journal_file, 'r+b') as f:
+                f.truncate(complete_end)
+        print(f"Loaded progress: {len(self.completed)} completed, {len(self.failed)} failed, "
+              f"last index: {self.last_processed_index}")
+    
+    def reconcile(self, output_file: str) -> int:
         """
-        Save current progress to the tracker file.
+        Journal the responses written after the last journal sync.
+        
+        Responses reach the output file before the journal, so a hard kill can leave
+        responses the journal does not know about. They are the tail of the output file
+        after the last journaled response, read backwards. A line cut by the interruption
+        is dropped from the output file.
         
-        Writes the current processed_count, last_processed_index, and timestamp
-        to the tracker file in JSON format. Any errors during saving are logged
-        but do not interrupt the program flow.
+        Args:
+            output_file (str): Path to the output JSONL file
+            
+        Returns:
+            int: Responses added to the journal
+        """
+        if not os.path.exists(output_file):
+            return 0
+        missing = []
+        with open(output_file, 'rb') as f:
+            lines = _reversed_lines(f)
+            torn = next(lines)
+            for line in lines:
+                try:
+                    record = json.loads(line)
+                    custom_id = record['custom_id']
+                except (json.JSONDecodeError, KeyError):
+                    continue
+                if custom_id in self.completed:
+                    break
+                missing.append((custom_id, record.get('index', -1)))
+        if torn:
+            with open(output_file, 'r+b') as f:
+                f.truncate(os.path.getsize(output_file) - len(torn))
+        for custom_id, index in reversed(missing):
+            self.record_completed(custom_id, index)
+        self.sync()
+        if missing:
+            print(f"Recovered {len(missing)} responses written after the last journal sync")
+        return len(missing)
+    
+    def _append(self, entry: Dict) -> None:
+        self._apply(entry)
+        self._file.write(json.dumps(entry) + '\n')
+        self._lines += 1
+        self._pending += 1
+    
+    def record_completed(self, custom_id: str, index: int) -> None:
+        self._append({'custom_id': custom_id, 'status': 'completed', 'index': index})
+    
+    def record_failed(self, custom_id: str, index: int, error: str) -> None:
+        self._append({'custom_id': custom_id, 'status': 'failed', 'index': index, 'error': error})
+    
+    def sync_due(self) -> bool:
+        """
+        Whether pending records should be synced now.
+        """
+        return self._pending > 0 and (self._pending >= self.sync_every
+                                      or time.monotonic() - self._last_sync >= self.sync_interval)
+    
+    def sync(self) -> None:
+        """
+        Flush and fsync the pending records.
+        """
+        if self._pending:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._pending = 0
+        self._last_sync = time.monotonic()
+    
+    def compact(self) -> None:
+        """
+        Rewrite the journal as one line per custom_id (atomically).
         """
-        try:
-            with open(self.tracker_file, 'w') as f:
-                json.dump({
-                    'processed_count': self.processed_count,
-                    'last_processed_index': self.last_processed_index,
-                    'last_update': datetime.now().isoformat()
-                }, f, indent=2)
-        except Exception as e:
-            print(f"Error saving progress tracker: {e}")
+        reopen = getattr(self, '_file', None) is not None and not self._file.closed
+        if reopen:
+            self.sync()
+            self._file.close()
+        tmp_file = self.journal_file + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            for custom_id in self.completed:
+                f.write(json.dumps({'custom_id': custom_id, 'status': 'completed',
+                                    'index': self._indices.get(custom_id, -1)}) + '\n')
+            for custom_id, error in self.failed.items():
+                f.write(json.dumps({'custom_id': custom_id, 'status': 'failed',
+                                    'index': self._indices.get(custom_id, -1), 'error': error}) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.journal_file)
+        self._lines = len(self.completed) + len(self.failed)
+        if reopen:
+            self._file = open(self.journal_file, 'a', encoding='utf-8')
+    
+    def close(self) -> None:
+        """
+        Sync the pending records, compact if needed and close the journal.
+        """
+        if self._file.closed:
+            return
+        self.sync()
+        self._file.close()
+        if self._lines > self.compact_ratio * max(1, len(self.completed) + len(self.failed)):
+            self.compact()
 
 async def query_openai(model: str, system_prompt: str, user_prompt: str, max_tokens: int = 1000, temperature: float = 0.0) -> str:
     """
@@ -103,160 +245,391 @@ async def query_openai(model: str, system_prompt: str, user_prompt: str, max_tok
         print(f"OpenAI API error: {str(e)}")
         raise
 
-async def process_single_query(data: Dict, index: int, output_file: str, progress_tracker: ProgressTracker) -> None:
+def estimate_tokens(body: Dict) -> int:
     """
-    Process a single query and save its results.
+    Estimate the tokens a request counts against the tokens-per-minute limit.
     
     Args:
-        data (Dict): The query data containing model information and messages
-        index (int): The current processing index
-        output_file (str): Path to the file where results will be saved
-        progress_tracker (ProgressTracker): Instance of ProgressTracker to monitor progress
-    
-    The function handles the entire lifecycle of a single query:
-    - Sending the query to OpenAI
-    - Recording the response
-    - Updating progress
-    - Error handling and logging
-    """
-    try:
-        custom_id = data['custom_id']
-        start_time = datetime.now()
-        
-        print(f"Processing index {index} (ID: {custom_id})")
+        body (Dict): Chat completions request body
         
-        response = await query_openai(
-            data['body']['model'], 
-            data['body']['messages'][0]['content'], 
-            data['body']['messages'][1]['content']
-        )
+    Returns:
+        int: Prompt characters / 4 plus max_tokens
+    """
+    prompt_chars = sum(len(message.get('content') or '') for message in body.get('messages', []))
+    return prompt_chars // 4 + body.get('max_tokens', 1000)
+
+class TokenBucketLimiter:
+    """
+    Token-bucket limiter for requests per minute and tokens per minute.
+    
+    Both buckets start full and refill continuously, so at most one minute of budget is
+    spent in a burst. A request waits until both buckets can cover it; waiters are served
+    in arrival order. After a 429 every request is paused for the server's Retry-After.
+    
+    Attributes:
+        requests_per_minute (float): Request limit
+        tokens_per_minute (float): Token limit (None for no token limit)
+    """
+    
+    def __init__(self, requests_per_minute: float, tokens_per_minute: Optional[float] = None):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._requests = float(requests_per_minute)
+        self._tokens = float(tokens_per_minute or 0)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+    
+    def _refill(self, now: float) -> None:
+        elapsed, self._updated = now - self._updated, now
+        self._requests = min(self.requests_per_minute, self._requests + elapsed * self.requests_per_minute / 60)
+        if self.tokens_per_minute:
+            self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60)
+    
+    async def acquire(self, tokens: int = 0) -> None:
+        """
+        Wait until one request and `tokens` tokens are available, then take them.
         
-        processing_time = (datetime.now() - start_time).total_seconds()
+        Args:
+            tokens (int): Estimated tokens of the request (capped at the per-minute limit)
+        """
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                needed = min(tokens, self.tokens_per_minute) if self.tokens_per_minute else 0
+                waits = [self._paused_until - now]
+                if self._requests < 1:
+                    waits.append((1 - self._requests) * 60 / self.requests_per_minute)
+                if self._tokens < needed:
+                    waits.append((needed - self._tokens) * 60 / self.tokens_per_minute)
+                wait = max(waits)
+                if wait <= 0:
+                    self._requests -= 1
+                    self._tokens -= needed
+                    return
+                await asyncio.sleep(wait)
+    
+    def adjust(self, tokens: int) -> None:
+        """
+        Correct the token bucket once the real usage is known.
         
-        async with asyncio.Lock():
-            with open(output_file, 'a', encoding='utf-8') as f:
-                f.write(json.dumps({
-                    "custom_id": custom_id, 
-                    "response": response,
-                    "index": index,
-                    "processing_time": processing_time,
-                    "processed_at": datetime.now().isoformat()
-                }) + '\n')
-            
-            progress_tracker.processed_count += 1
-            if index > progress_tracker.last_processed_index:
-                progress_tracker.last_processed_index = index
-            progress_tracker.save_progress()
+        Args:
+            tokens (int): Actual minus estimated tokens (negative gives tokens back)
+        """
+        if self.tokens_per_minute:
+            self._tokens = min(self.tokens_per_minute, self._tokens - tokens)
+    
+    def pause(self, seconds: float) -> None:
+        """
+        Hold every request for `seconds` (the server reported the limit as exceeded).
+        """
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+class AdaptiveConcurrency:
+    """
+    Limit on requests in flight, adjusted by AIMD.
+    
+    The limit grows by one after `limit` successes in a row and is halved on a 429
+    (once per cooldown, since a burst of 429s reports the same overload).
+    
+    Attributes:
+        limit (int): Current number of requests allowed in flight
+        minimum (int): Lower bound of the limit
+        maximum (int): Upper bound of the limit
+        active (int): Requests in flight
+    """
+    
+    def __init__(self, initial: int = 4, minimum: int = 1, maximum: int = 32, cooldown: float = 5.0):
+        self.limit = max(minimum, min(initial, maximum))
+        self.minimum = minimum
+        self.maximum = maximum
+        self.cooldown = cooldown
+        self.active = 0
+        self._successes = 0
+        self._last_decrease = float('-inf')
+        self._condition = asyncio.Condition()
+    
+    async def __aenter__(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.active < self.limit)
+            self.active += 1
+        return self
+    
+    async def __aexit__(self, *exc):
+        async with self._condition:
+            self.active -= 1
+            self._condition.notify_all()
+    
+    def on_success(self) -> None:
+        self._successes += 1
+        if self._successes >= self.limit and self.limit < self.maximum:
+            self.limit += 1
+            self._successes = 0
+    
+    def on_rate_limited(self) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease >= self.cooldown:
+            self.limit = max(self.minimum, self.limit // 2)
+            self._last_decrease = now
+        self._successes = 0
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+def _error_status(error: Exception) -> Optional[int]:
+    status = getattr(error, 'status_code', None)
+    if status is None:
+        status = getattr(getattr(error, 'response', None), 'status_code', None)
+    return status
+
+def _retry_after(error: Exception) -> Optional[float]:
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+    try:
+        return float(headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+def _is_retryable(error: Exception, status: Optional[int]) -> bool:
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    # connection errors / timeouts carry no status (openai.APIConnectionError, APITimeoutError)
+    return (isinstance(error, (ConnectionError, TimeoutError, asyncio.TimeoutError))
+            or type(error).__name__ in ('APIConnectionError', 'APITimeoutError'))
+
+def openai_sender(client: AsyncOpenAI) -> Callable[[Dict], Awaitable[Tuple[str, Optional[int]]]]:
+    """
+    Send function of rate_limited_queries backed by an AsyncOpenAI client.
+    
+    Args:
+        client (AsyncOpenAI): Client (base_url may point to a mock server), created with max_retries=0
+            so the SDK does not retry behind the rate limiter
         
-        print(f"Completed index {index} (ID: {custom_id}). Processing time: {processing_time:.2f}s. Total processed: {progress_tracker.processed_count}")
-    except Exception as e:
-        print(f"Error processing index {index}, custom_id {data.get('custom_id', 'unknown')}: {str(e)}")
-        with open('error_log.jsonl', 'a', encoding='utf-8') as f:
-            f.write(json.dumps({
-                "custom_id": data.get('custom_id', 'unknown'),
-                "index": index,
-                "error": str(e),
-                "timestamp": datetime.now().isoformat()
-            }) + '\n')
+    Returns:
+        Callable: async send(body) -> (response text, total tokens used or None)
+    """
+    async def send(body: Dict) -> Tuple[str, Optional[int]]:
+        completion = await client.chat.completions.create(**body)
+        usage = completion.usage.total_tokens if completion.usage is not None else None
+        return completion.choices[0].message.content, usage
+    return send
 
 async def rate_limited_queries(
-    data_batch: List[Dict], 
-    output_file: str, 
-    progress_tracker: ProgressTracker,
-    requests_per_minute: int = 14
-) -> None:
+    items: List[Tuple[int, Dict]],
+    output_file: str,
+    journal: ProgressJournal = None,
+    send: Callable[[Dict], Awaitable[Tuple[str, Optional[int]]]] = None,
+    requests_per_minute: float = 14,
+    tokens_per_minute: Optional[float] = None,
+    concurrency: int = 4,
+    max_concurrency: int = 32,
+    max_retries: int = 6,
+    backoff: float = 1.0,
+    error_file: str = 'error_log.jsonl'
+) -> Dict:
     """
-    Process multiple queries with rate limiting.
+    Process queries concurrently under request / token rate limits.
     
     Args:
-        data_batch (List[Dict]): List of query data to process
-        output_file (str): Path to the file where results will be saved
-        progress_tracker (ProgressTracker): Instance of ProgressTracker to monitor progress
-        requests_per_minute (int): Maximum number of requests allowed per minute. Defaults to 14
-    
-    The function implements rate limiting using semaphores and ensures that the
-    specified rate limit is not exceeded. It processes queries concurrently while
-    maintaining the rate limit and handles any errors that occur during processing.
+        items (List[Tuple[int, Dict]]): (index in the input file, batch input item) pairs to process
+        output_file (str): Path to the file where results are appended
+        journal (ProgressJournal): Records every completed / failed custom_id (optional)
+        send (Callable): async send(body) -> (text, tokens used); defaults to the module OpenAI client
+        requests_per_minute (float): Request limit
+        tokens_per_minute (float): Token limit (None for no token limit)
+        concurrency (int): Initial requests in flight, adapted between 1 and max_concurrency
+        max_concurrency (int): Upper bound of requests in flight
+        max_retries (int): Retries of a request on 429, 5xx and connection errors
+        backoff (float): First retry delay in seconds, doubled on every retry (429s use Retry-After when given)
+        error_file (str): Path to the file where failed items are appended
+        
+    Returns:
+        Dict: completed, failed, retries, rate_limited counts, elapsed seconds and the final concurrency
+    
+    Results are written by a single writer task, so lines never interleave. Every
+    item is independent: a failure does not affect resumption of the others, which
+    is keyed by custom_id (see ProgressJournal).
     """
-    total_items = len(data_batch)
-    initial_index = progress_tracker.last_processed_index
-    semaphore = asyncio.Semaphore(requests_per_minute)
-    
-    async def process_with_semaphore(data: Dict, base_index: int):
-        async with semaphore:
-            start_time = datetime.now()
-            await process_single_query(data, base_index, output_file, progress_tracker)
-            processing_time = (datetime.now() - start_time).total_seconds()
+    send = send or openai_sender(client)
+    limiter = TokenBucketLimiter(requests_per_minute, tokens_per_minute)
+    gate = AdaptiveConcurrency(concurrency, maximum=max_concurrency)
+    results: asyncio.Queue = asyncio.Queue()
+    stats = {'completed': 0, 'failed': 0, 'retries': 0, 'rate_limited': 0}
+    started = time.monotonic()
+    
+    async def writer():
+        with open(output_file, 'a', encoding='utf-8') as out, open(error_file, 'a', encoding='utf-8') as err:
+            def sync():
+                # responses reach the disk before the journal marks them completed
+                out.flush()
+                err.flush()
+                os.fsync(out.fileno())
+                journal.sync()
+            
+            while True:
+                record = await results.get()
+                if record is None:
+                    break
+                succeeded = 'response' in record
+                (out if succeeded else err).write(json.dumps(record) + '\n')
+                if journal is None:
+                    if results.empty():
+                        out.flush()
+                        err.flush()
+                    continue
+                if succeeded:
+                    journal.record_completed(record['custom_id'], record['index'])
+                else:
+                    journal.record_failed(record['custom_id'], record['index'], record['error'])
+                if journal.sync_due():
+                    sync()
+            if journal is not None:
+                sync()
+    
+    async def process(index: int, data: Dict):
+        custom_id, body = data['custom_id'], data['body']
+        estimate = estimate_tokens(body)
+        error, status = None, None
+        for attempt in range(max_retries + 1):
+            # wait for the rate limit before taking a slot, so waiting requests do not hold the gate
+            await limiter.acquire(estimate)
+            async with gate:
+                start = time.monotonic()
+                try:
+                    response, used = await send(body)
+                except Exception as e:
+                    error, status = e, _error_status(e)
+                else:
+                    if used is not None:
+                        limiter.adjust(used - estimate)
+                    gate.on_success()
+                    stats['completed'] += 1
+                    await results.put({
+                        "custom_id": custom_id,
+                        "response": response,
+                        "index": index,
+                        "processing_time": time.monotonic() - start,
+                        "attempts": attempt + 1,
+                        "processed_at": datetime.now().isoformat()
+                    })
+                    return
             
-            wait_time = max(0, 60 - processing_time)
-            if wait_time > 0:
-                print(f"\nWaiting {wait_time:.2f}s to maintain rate limit (7 requests/minute)")
-                await asyncio.sleep(wait_time)
+            if not _is_retryable(error, status) or attempt == max_retries:
+                break
+            delay = backoff * 2 ** attempt
+            if status == 429:
+                stats['rate_limited'] += 1
+                gate.on_rate_limited()
+                limiter.adjust(-estimate)  # rejected requests do not count against the token limit
+                delay = _retry_after(error) or delay
+                limiter.pause(delay)
+            stats['retries'] += 1
+            await asyncio.sleep(min(60.0, delay) * (0.5 + random.random() / 2))  # jitter
+        
+        stats['failed'] += 1
+        print(f"Error processing index {index}, custom_id {custom_id}: {error}")
+        await results.put({
+            "custom_id": custom_id,
+            "index": index,
+            "status": status,
+            "error": str(error),
+            "timestamp": datetime.now().isoformat()
+        })
+    
+    pending = iter(items)
     
-    tasks = []
-    for i, data in enumerate(data_batch):
-        base_index = initial_index + i + 1
-        task = asyncio.create_task(process_with_semaphore(data, base_index))
-        tasks.append(task)
+    async def worker():
+        # a shared iterator: each worker takes the next item when it is free
+        for index, data in pending:
+            await process(index, data)
     
+    writer_task = asyncio.create_task(writer())
     try:
-        await asyncio.gather(*tasks)
-        print(f"\nAll tasks completed. Total processed: {progress_tracker.processed_count}")
-    except Exception as e:
-        print(f"\nError during batch processing: {e}")
-        for task in tasks:
-            if not task.done():
-                task.cancel()
+        await asyncio.gather(*(worker() for _ in range(max_concurrency)))
+    finally:
+        await results.put(None)
+        await writer_task
+    
+    stats['elapsed'] = time.monotonic() - started
+    stats['concurrency'] = gate.limit
+    return stats
 
 async def main():
     """
     Main entry point for the batch processing script.
     
     This function:
-    1. Initializes the progress tracker
-    2. Reads the input file
-    3. Processes remaining items from the last checkpoint
+    1. Replays the progress journal and journals the responses written after its last sync
+    2. Reads the input file(s) and skips the completed custom_ids
+    3. Processes the remaining items (or only the failed ones with --failed-only)
     4. Handles interruptions and errors gracefully
     
-    The process can be interrupted with Ctrl+C, and progress will be saved
-    automatically. The script can be restarted and will continue from the
-    last successful processing point.
+    The process can be interrupted with Ctrl+C and restarted; every journaled response
+    is kept and nothing else is skipped.
     """
-    input_file = 'batch_input.jsonl'
-    output_file = 'batch_output.jsonl'
-    progress_tracker = ProgressTracker()
+    parser = argparse.ArgumentParser(description="Run a chat completions batch file with rate limits.")
+    parser.add_argument("--input", nargs='+', default=['batch_input.jsonl'],
+                        help="batch input file(s), e.g. batch_input_*.jsonl from analyze_batch.py")
+    parser.add_argument("--output", default='batch_output.jsonl')
+    parser.add_argument("--rpm", type=float, default=14, help="requests per minute")
+    parser.add_argument("--tpm", type=float, default=None, help="tokens per minute")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--max-concurrency", type=int, default=32)
+    parser.add_argument("--base-url", default=None, help="e.g. http://127.0.0.1:8001/v1 (mock_chat_server.py)")
+    parser.add_argument("--journal", default='progress_journal.jsonl')
+    parser.add_argument("--failed-only", action="store_true", help="retry only the items that failed before")
+    args = parser.parse_args()
     
-    print("Reading input file...")
-    with open(input_file, 'r', encoding='utf-8') as f:
-        batch_input = [json.loads(line) for line in f.readlines()]
+    send = None
+    if args.base_url is not None:
+        api_key = OPENAI_API or os.environ.get('OPENAI_API_KEY') or 'mock'
+        send = openai_sender(AsyncOpenAI(api_key=api_key, base_url=args.base_url, max_retries=0))
     
-    start_index = progress_tracker.last_processed_index + 1
-    remaining_batch = batch_input[start_index:]
+    journal = ProgressJournal(args.journal)
+    # responses written after the last journal sync (or before the journal existed)
+    journal.reconcile(args.output)
+    
+    print("Reading input file...")
+    remaining = []
+    index = 0  # position across the input files
+    for input_file in args.input:
+        with open(input_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                data = json.loads(line)
+                custom_id = data['custom_id']
+                if custom_id not in journal.completed and (not args.failed_only or custom_id in journal.failed):
+                    remaining.append((index, data))
+                index += 1
     
-    if not remaining_batch:
+    if not remaining:
         print("All items have been processed!")
+        journal.close()
         return
     
-    print(f"\nResuming from index {start_index}")
-    print(f"Starting to process {len(remaining_batch)} remaining items...")
-    print(f"Rate limit: 8 requests per minute (one request every 7.5 seconds)")
+    print(f"\n{len(journal.completed)} items already completed, {len(journal.failed)} failed before")
+    print(f"Starting to process {len(remaining)} remaining items...")
+    print(f"Rate limit: {args.rpm:g} requests per minute" + (f", {args.tpm:g} tokens per minute" if args.tpm else ""))
     print("Press Ctrl+C to interrupt processing (progress will be saved)\n")
     
     try:
-        await rate_limited_queries(
-            remaining_batch, 
-            output_file, 
-            progress_tracker,
-            requests_per_minute=14
+        stats = await rate_limited_queries(
+            remaining,
+            args.output,
+            journal,
+            send=send,
+            requests_per_minute=args.rpm,
+            tokens_per_minute=args.tpm,
+            concurrency=args.concurrency,
+            max_concurrency=args.max_concurrency
         )
-        print("\nProcessing completed successfully!")
-    except KeyboardInterrupt:
-        print("\nProcessing interrupted. Progress has been saved.")
-        print(f"Processed {progress_tracker.processed_count} items total.")
-        print(f"Last processed index: {progress_tracker.last_processed_index}")
+        print(f"\nProcessing completed: {stats['completed']} completed, {stats['failed']} failed "
+              f"({stats['retries']} retries, {stats['rate_limited']} rate limited) in {stats['elapsed']:.1f}s")
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        print("\nProcessing interrupted. Written responses are kept and will be skipped on restart.")
     except Exception as e:
         print(f"\nAn error occurred: {e}")
-        print(f"Progress has been saved. Last processed index: {progress_tracker.last_processed_index}")
+        print("Written responses are kept and will be skipped on restart.")
+    finally:
+        journal.close()
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Local mock of the OpenAI chat completions endpoint for testing custom_batch_api.py.
+
+Enforces requests / tokens per minute over a sliding 60 s window and answers 429 with
+Retry-After like the real API, with configurable latency and a rate of random 500s.
+GET /stats reports the counters and the highest concurrency seen.
+
+usage: python mock_chat_server.py --port 8001 --rpm 120 --tpm 200000 --latency 0.5
+       python custom_batch_api.py --base-url http://127.0.0.1:8001/v1 --rpm 120 --tpm 200000
+"""
+
+import argparse
+import collections
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+
+class SlidingWindowLimit:
+    """
+    Requests / tokens admitted over the last 60 seconds.
+
+    Attributes:
+        requests_per_minute (int): Request limit (None for no limit)
+        tokens_per_minute (int): Token limit (None for no limit)
+    """
+
+    def __init__(self, requests_per_minute: Optional[int], tokens_per_minute: Optional[int]):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._window = collections.deque()  # (time, tokens)
+        self._tokens = 0
+        self._lock = threading.Lock()
+
+    def admit(self, tokens: int) -> Optional[float]:
+        """
+        Admit a request of `tokens` tokens.
+
+        Returns:
+            Optional[float]: None if admitted, otherwise seconds until it would fit
+        """
+        with self._lock:
+            now = time.monotonic()
+            while self._window and self._window[0][0] <= now - 60:
+                self._tokens -= self._window.popleft()[1]
+            waits = []
+            if self.requests_per_minute and len(self._window) >= self.requests_per_minute:
+                waits.append(self._window[len(self._window) - self.requests_per_minute][0] + 60 - now)
+            if self.tokens_per_minute and self._window and self._tokens + tokens > self.tokens_per_minute:
+                # time until enough of the oldest requests leave the window
+                freed = 0
+                for admitted_at, used in self._window:
+                    freed += used
+                    if self._tokens - freed + tokens <= self.tokens_per_minute:
+                        waits.append(admitted_at + 60 - now)
+                        break
+            if waits:
+                return max(0.0, max(waits))
+            self._window.append((now, tokens))
+            self._tokens += tokens
+            return None
+
+
+class MockChatHandler(BaseHTTPRequestHandler):
+    # set by serve()
+    limit: SlidingWindowLimit = None
+    latency: float = 0.5
+    error_rate: float = 0.0
+    stats: Dict = None
+    stats_lock = threading.Lock()
+
+    def _send_json(self, status: int, payload: dict, headers: Dict[str, str] = None) -> None:
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _count(self, key: str, delta: int = 1) -> None:
+        with self.stats_lock:
+            self.stats[key] += delta
+            self.stats['max_in_flight'] = max(self.stats['max_in_flight'], self.stats['in_flight'])
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/stats':
+            with self.stats_lock:
+                self._send_json(200, dict(self.stats))
+        else:
+            self._send_json(404, {'error': {'message': f'unknown path {self.path}'}})
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._send_json(404, {'error': {'message': f'unknown path {self.path}'}})
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        prompt_tokens = sum(len(m.get('content') or '') for m in body.get('messages', [])) // 4
+        completion_tokens = min(body.get('max_tokens') or 1000, 50)
+
+        retry_after = self.limit.admit(prompt_tokens + completion_tokens)
+        if retry_after is not None:
+            self._count('rate_limited')
+            self._send_json(429, {'error': {'message': 'Rate limit reached', 'type': 'requests'}},
+                            {'retry-after': f'{retry_after:.3f}'})
+            return
+
+        self._count('in_flight')
+        try:
+            time.sleep(self.latency * random.uniform(0.5, 1.5))
+        finally:
+            self._count('in_flight', -1)
+        if random.random() < self.error_rate:
+            self._count('server_errors')
+            self._send_json(500, {'error': {'message': 'mock server error', 'type': 'server_error'}})
+            return
+
+        self._count('completed')
+        user = next((m['content'] for m in reversed(body.get('messages', [])) if m.get('role') == 'user'), '')
+        self._send_json(200, {
+            'id': f"chatcmpl-mock-{self.stats['completed']}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': body.get('model', 'mock'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': f"outline of: {user[:40]}"},
+                'finish_reason': 'stop'
+            }],
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'total_tokens': prompt_tokens + completion_tokens
+            }
+        })
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(host: str = '127.0.0.1', port: int = 8001, rpm: Optional[int] = 120, tpm: Optional[int] = None,
+          latency: float = 0.5, error_rate: float = 0.0) -> ThreadingHTTPServer:
+    """
+    Create the mock server (call serve_forever() on the result).
+
+    Args:
+        host (str): Bind address
+        port (int): Port (0 for a free port)
+        rpm (int): Requests per minute before 429s
+        tpm (int): Tokens per minute before 429s
+        latency (float): Mean response time in seconds
+        error_rate (float): Fraction of admitted requests answered with 500
+
+    Returns:
+        ThreadingHTTPServer: Server
+    """
+    MockChatHandler.limit = SlidingWindowLimit(rpm, tpm)
+    MockChatHandler.latency = latency
+    MockChatHandler.error_rate = error_rate
+    MockChatHandler.stats = collections.Counter(completed=0, rate_limited=0, server_errors=0,
+                                                in_flight=0, max_in_flight=0)
+    server = ThreadingHTTPServer((host, port), MockChatHandler)
+    server.daemon_threads = True
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default='127.0.0.1')
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--rpm", type=int, default=120)
+    parser.add_argument("--tpm", type=int, default=None)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = serve(args.host, args.port, args.rpm, args.tpm, args.latency, args.error_rate)
+    print(f"Mock chat completions on http://{args.host}:{server.server_address[1]}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
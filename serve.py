@@ -0,0 +1,138 @@
+"""
+    Local summarization service: keeps the encoder and the summarizer loaded and runs
+    segmentation -> concate_* -> summarizer with the methods of config.yaml.
+
+    Request threads take turns on the encoder (Pipeline.cluster_document); cluster texts of
+    concurrent requests are summarized together in shared generation batches
+    (--window-ms after the first request, at most --max-texts texts per batch).
+
+    endpoints:
+        POST /summarize  {"text": "...", "id": optional}
+                         -> {"id", "summary", "summaries", "n_segments", "n_clusters", "latency_sec"}
+        GET  /metrics    queue depth, counters, latency / batch size percentiles
+        GET  /health
+
+    usage: python serve.py [--config config.yaml] [--host 127.0.0.1] [--port 8000] [--window-ms 20]
+
+    offline test with tiny models: python benchmarks/tiny_models.py, then
+        WHITEBOARD_ENCODER=benchmarks/.models/encoder python serve.py
+    with summary.args.model: "benchmarks/.models/seq2seq" in the config
+    (concurrent smoke test: python benchmarks/smoke_serve.py)
+"""
+# ======================= [built-in modules] =======================
+import argparse
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ======================= [custom modules] =========================
+from utils.config import load_config, validate_config
+from utils.pipeline import Pipeline
+from utils.serving import CoalescingSummarizer, ServiceMetrics
+
+MAX_BODY_BYTES = 64 * 2**20
+
+
+class SummarizationHandler(BaseHTTPRequestHandler):
+    # set by serve()
+    pipeline: Pipeline = None
+    batcher: CoalescingSummarizer = None
+    metrics: ServiceMetrics = None
+
+    def _send_json(self, status: int, payload: dict) -> None:
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send_json(200, {'status': 'ok'})
+        elif self.path == '/metrics':
+            self._send_json(200, self.metrics.snapshot(self.batcher.queue_depth))
+        else:
+            self._send_json(404, {'error': f'unknown path {self.path}'})
+
+    def do_POST(self):
+        if self.path != '/summarize':
+            self._send_json(404, {'error': f'unknown path {self.path}'})
+            return
+
+        length = int(self.headers.get('Content-Length', 0))
+        if length > MAX_BODY_BYTES:
+            self._send_json(413, {'error': 'request too large'})
+            return
+        try:
+            request = json.loads(self.rfile.read(length))
+            text = request['text']
+        except (ValueError, KeyError, TypeError):
+            self._send_json(400, {'error': 'expected a JSON object with a "text" field'})
+            return
+
+        start = time.perf_counter()
+        self.metrics.incr('requests_total')
+        self.metrics.incr('in_flight')
+        try:
+            segments, concat_indices = self.pipeline.cluster_document(text)
+            summaries = self.batcher.submit(self.pipeline.cluster_texts(segments, concat_indices)).result()
+        except Exception as e:
+            self.metrics.incr('requests_failed')
+            self._send_json(500, {'error': f'{type(e).__name__}: {e}'})
+            return
+        finally:
+            self.metrics.incr('in_flight', -1)
+
+        latency = time.perf_counter() - start
+        self.metrics.observe('request', latency)
+        self._send_json(200, {
+            'id': request.get('id'),
+            'summary': " ".join(summaries),
+            'summaries': summaries,
+            'n_segments': len(segments),
+            'n_clusters': len(concat_indices),
+            'latency_sec': latency,
+        })
+
+    def log_message(self, format, *args):
+        # access log per request is too noisy for a batch client
+        pass
+
+
+def serve(config_path: str = 'config.yaml', host: str = '127.0.0.1', port: int = 8000,
+          window_ms: float = 20, max_texts: int = 32) -> ThreadingHTTPServer:
+    """
+    build the pipeline, load the models and return the (not yet started) server
+    """
+    config = load_config(config_path)
+    errors = [e for e in validate_config(config) if not e.startswith(('index set', 'data.'))]  # no dataset needed
+    if errors:
+        raise ValueError(f"invalid config {config_path}: {errors}")
+
+    pipeline = Pipeline(config)
+    pipeline.warmup()
+
+    metrics = ServiceMetrics()
+    SummarizationHandler.pipeline = pipeline
+    SummarizationHandler.metrics = metrics
+    SummarizationHandler.batcher = CoalescingSummarizer(pipeline.summarize_each, window=window_ms / 1000,
+                                                        max_texts=max_texts, metrics=metrics)
+    return ThreadingHTTPServer((host, port), SummarizationHandler)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", default="config.yaml")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--window-ms", type=float, default=20, help="coalescing window after the first request")
+    parser.add_argument("--max-texts", type=int, default=32, help="maximum cluster texts per generation batch")
+    args = parser.parse_args()
+
+    server = serve(args.config, args.host, args.port, args.window_ms, args.max_texts)
+    print(f"Serving on http://{args.host}:{args.port} (POST /summarize, GET /metrics)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
@@ -0,0 +1,162 @@
+"""
+    Streaming summarization of JSONL documents with the pipeline of config.yaml.
+
+    Reads one JSON object per line from a file or stdin (e.g. the output of
+    data/collect_script/combine_jsonl.py) and writes one JSON result per line as soon as
+    it is done. At most --max-in-flight documents are held in memory. Output follows the
+    input order unless --unordered is given.
+
+    result: input fields except text / reference + {"index", "summary", "n_segments", "n_clusters", "latency_sec"}
+            (+ "scores" with --score and a reference field, "error" if the document failed)
+
+    usage: python summarize.py [input.jsonl | -] [--output out.jsonl] [--workers 2] [--unordered]
+                               [--score --reference-field summary]
+"""
+# ======================= [built-in modules] =======================
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Iterable, Iterator, Tuple
+
+# ======================= [custom modules] =========================
+from utils.config import load_config
+from utils.pipeline import Pipeline
+from utils.registry import get_metric
+
+TEXT_FIELDS = ('content', 'text', 'report')
+
+
+def iter_records(stream) -> Iterator[Tuple[int, dict]]:
+    """
+    (line index, record) of every non-empty line (record is None for invalid JSON)
+    """
+    for index, line in enumerate(stream):
+        line = line.strip()
+        if line:
+            try:
+                yield index, json.loads(line)
+            except json.JSONDecodeError:
+                yield index, None
+
+
+def summarize_record(pipeline: Pipeline, index: int, record: dict, text_field: str = None,
+                     reference_field: str = None, metrics: Tuple[str, ...] = ()) -> dict:
+    """
+    run the pipeline on one record
+
+    Returns:
+    - dict: result line (never raises, failures are reported in 'error')
+    """
+    if not isinstance(record, dict):
+        return {'index': index, 'error': 'invalid JSON object', 'latency_sec': 0.0}
+    field = text_field or next((f for f in TEXT_FIELDS if f in record), None)
+    # the text and the reference (default field name 'summary') are not copied to the result
+    result = {key: value for key, value in record.items() if key not in (field, reference_field)}
+    result['index'] = index
+
+    start = time.perf_counter()
+    try:
+        if field is None or field not in record:
+            raise KeyError(f"no text field ({text_field or ' / '.join(TEXT_FIELDS)})")
+        result.update(pipeline.process(record[field]))
+
+        if metrics and reference_field and record.get(reference_field):
+            result['scores'] = {}
+            for metric in metrics:
+                score = get_metric(metric)(record[reference_field], result['summary'])
+                # rouge returns (rouge1, rouge2, rougeL), scaled * 100 like experiment.py
+                result['scores'][metric] = [s * 100 for s in score] if isinstance(score, tuple) else score * 100
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+    result['latency_sec'] = time.perf_counter() - start
+    return result
+
+
+def stream_results(records: Iterable[Tuple[int, dict]], process, workers: int = 1, max_in_flight: int = 4,
+                   ordered: bool = True) -> Iterator[dict]:
+    """
+    process records on a thread pool with bounded memory
+
+    Args:
+    - records: (index, record) iterable, consumed lazily
+    - process: process(index, record) -> result
+    - workers: concurrent documents
+    - max_in_flight: records read but not yet yielded (running + waiting for their turn)
+    - ordered: yield in input order (otherwise as completed)
+
+    Returns:
+    - Iterator[dict]: results
+    """
+    max_in_flight = max(max_in_flight, workers)
+    with ThreadPoolExecutor(workers) as pool:
+        running, finished = {}, {}  # future -> position, position -> result
+        next_position = 0
+
+        def drain(block: bool):
+            nonlocal next_position
+            if running:
+                done, _ = wait(list(running), timeout=None if block else 0, return_when=FIRST_COMPLETED)
+                for future in done:
+                    finished[running.pop(future)] = future.result()
+            if ordered:
+                while next_position in finished:
+                    yield finished.pop(next_position)
+                    next_position += 1
+            else:
+                for position in list(finished):
+                    yield finished.pop(position)
+
+        for position, (index, record) in enumerate(records):
+            while len(running) + len(finished) >= max_in_flight:
+                yield from drain(block=True)
+            running[pool.submit(process, index, record)] = position
+            yield from drain(block=False)
+
+        while running or finished:
+            yield from drain(block=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", nargs="?", default="-", help="JSONL file, '-' for stdin")
+    parser.add_argument("--output", default="-", help="JSONL file, '-' for stdout")
+    parser.add_argument("--config", default="config.yaml")
+    parser.add_argument("--text-field", default=None, help=f"default: first of {TEXT_FIELDS} in the record")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="concurrent documents (clustering of one overlaps summarization of another)")
+    parser.add_argument("--max-in-flight", type=int, default=None, help="default: 2 x workers")
+    parser.add_argument("--unordered", action="store_true", help="write results as they complete")
+    parser.add_argument("--score", action="store_true", help="score records that have the reference field")
+    parser.add_argument("--reference-field", default="summary")
+    parser.add_argument("--metrics", nargs="+", default=["rouge"], help="names in utils.registry.METRICS")
+    args = parser.parse_args()
+
+    pipeline = Pipeline(load_config(args.config))
+    # load the models before the workers start: concurrent first loads fail (meta tensors)
+    pipeline.warmup()
+    metrics = tuple(args.metrics) if args.score else ()
+    process = lambda index, record: summarize_record(pipeline, index, record, args.text_field,
+                                                     args.reference_field, metrics)
+
+    source = sys.stdin if args.input == '-' else open(args.input, 'r')
+    sink = sys.stdout if args.output == '-' else open(args.output, 'w')
+    n_done = n_failed = 0
+    try:
+        for result in stream_results(iter_records(source), process, args.workers,
+                                     args.max_in_flight or 2 * args.workers, ordered=not args.unordered):
+            sink.write(json.dumps(result, ensure_ascii=False) + '\n')
+            sink.flush()
+            n_done += 1
+            n_failed += 'error' in result
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if sink is not sys.stdout:
+            sink.close()
+    print(f"Done: {n_done} documents ({n_failed} failed)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+import gc
+import json
+import os
+import platform
+import sys
+import threading
+from functools import lru_cache
+from typing import Callable, List, Sequence
+
+"""
+    this file is for adaptive batch sizing of model forward passes (encode_segments, summarizer)
+
+    - batches are packed by a token budget: rows x padded length (x num_beams for generation)
+    - an out-of-memory error (CUDA or host) splits the failing batch in half and retries,
+      the budget shrinks and then grows back toward the largest size that succeeded
+    - learned budgets are persisted per machine and model, later runs start at the right size
+
+    enable with configure(...) (experiment.py: adaptive_batch section of config.yaml);
+    without it every caller keeps its fixed batch size
+
+"""
+
+DEFAULT_BUDGET_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'whiteboard_llm', 'batch_budgets.json')
+DEFAULT_INITIAL_TOKENS = 8192
+
+_settings = None
+_budgets_lock = threading.Lock()
+
+
+def configure(initial_tokens: int = DEFAULT_INITIAL_TOKENS, path: str = DEFAULT_BUDGET_PATH,
+              grow: float = 1.25, shrink: float = 0.5) -> None:
+    """
+    enable adaptive batching for the process
+    """
+    global _settings
+    path = os.path.expanduser(path) if path else None
+    _settings = dict(initial_tokens=initial_tokens, path=path, grow=grow, shrink=shrink)
+    _budget.cache_clear()
+
+
+def budget_for(model_name: str) -> "TokenBudget":
+    """
+    learned token budget of a model, None when adaptive batching is not configured
+    """
+    if _settings is None:
+        return None
+    with _budgets_lock:  # one TokenBudget per model even when request threads ask at once
+        return _budget(model_name)
+
+
+@lru_cache(maxsize=None)
+def _budget(model_name: str) -> "TokenBudget":
+    return TokenBudget(model_name, **_settings)
+
+
+def is_oom_error(error: BaseException) -> bool:
+    """
+    CUDA out of memory or a failed host allocation
+    """
+    if isinstance(error, MemoryError):
+        return True
+    torch = sys.modules.get('torch')
+    if torch is not None and isinstance(error, getattr(torch.cuda, 'OutOfMemoryError', ())):
+        return True
+    message = str(error)
+    return isinstance(error, RuntimeError) and ('out of memory' in message or "can't allocate memory" in message)
+
+
+def _free_memory() -> None:
+    gc.collect()
+    torch = sys.modules.get('torch')
+    if torch is not None and torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+
+def machine_key() -> str:
+    """
+    host name + accelerator (budgets are only valid on the same hardware)
+    """
+    torch = sys.modules.get('torch')
+    if torch is not None and torch.cuda.is_available():
+        props = torch.cuda.get_device_properties(0)
+        device = f"{props.name}-{props.total_memory // 2**30}GB"
+    else:
+        device = f"cpu-{os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // 2**30}GB" \
+            if hasattr(os, 'sysconf') else 'cpu'
+    return f"{platform.node()}/{device}"
+
+
+class TokenBudget:
+    """
+    Learned maximum tokens per forward pass of one model on this machine.
+    Updates are locked, the budget is shared by every thread using the model.
+
+    Attributes:
+        budget (int): current batch budget in tokens
+        limit (int): smallest cost that ran out of memory (None if never)
+        max_safe (int): largest cost that succeeded
+    """
+
+    def __init__(self, model_name: str, initial_tokens: int = DEFAULT_INITIAL_TOKENS, path: str = DEFAULT_BUDGET_PATH,
+                 grow: float = 1.25, shrink: float = 0.5):
+        self.model_name = model_name
+        self.path = path
+        self.grow = grow
+        self.shrink = shrink
+        self.key = machine_key()
+
+        saved = self._load().get(self.key, {}).get(model_name, {})
+        self.budget = saved.get('budget', initial_tokens)
+        self.limit = saved.get('limit')
+        self.max_safe = saved.get('max_safe', 0)
+        self._lock = threading.RLock()
+
+    def _load(self) -> dict:
+        if self.path is None or not os.path.exists(self.path):
+            return {}
+        with open(self.path) as f:
+            return json.load(f)
+
+    def save(self) -> None:
+        """
+        merge this budget into the budgets file (atomic replace)
+        """
+        if self.path is None:
+            return
+        with self._lock:
+            self._save()
+
+    def _save(self) -> None:
+        budgets = self._load()
+        budgets.setdefault(self.key, {})[self.model_name] = {
+            'budget': self.budget, 'limit': self.limit, 'max_safe': self.max_safe
+        }
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(budgets, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def ceiling(self) -> int:
+        return int(self.limit * 0.9) if self.limit else None
+
+    def on_success(self, cost: int) -> None:
+        """
+        grow the budget after a batch that used most of it (never above 90% of the OOM limit)
+        """
+        with self._lock:
+            changed = cost > self.max_safe
+            self.max_safe = max(self.max_safe, cost)
+            if cost >= self.budget // 2:
+                grown = int(self.budget * self.grow)
+                if self.ceiling() is not None:
+                    grown = min(grown, max(self.ceiling(), self.max_safe))
+                if grown > self.budget:
+                    self.budget, changed = grown, True
+            if changed:
+                self.save()
+
+    def on_oom(self, cost: int) -> None:
+        """
+        remember the failing cost and shrink the budget below it
+        """
+        with self._lock:
+            self.limit = cost if self.limit is None else min(self.limit, cost)
+            if self.limit <= self.max_safe:  # the safe size was not safe after all (fragmentation, other processes)
+                self.max_safe = int(self.limit * self.shrink)
+            self.budget = max(1, int(min(self.budget, cost) * self.shrink))
+            self.save()
+
+
+def run_adaptive_batches(lengths: Sequence[int], fn: Callable[[List[int]], list], budget: TokenBudget,
+                         multiplier: int = 1) -> list:
+    """
+    run fn over index batches packed by the token budget, splitting and retrying on OOM
+
+    items are processed longest first (least padding, and an OOM shows up on the first batch)
+
+    Args:
+    - lengths: token length of every item
+    - fn: fn(indices) -> list of len(indices) outputs (or None)
+    - budget: TokenBudget of the model
+    - multiplier: cost per padded token (num_beams for beam search generation)
+
+    Returns:
+    - list: outputs in the original item order (None if fn returns None)
+    """
+    order = sorted(range(len(lengths)), key=lambda i: -lengths[i])
+    outputs = [None] * len(lengths)
+
+    position, max_rows = 0, len(order)
+    while position < len(order):
+        # pack rows while rows x padded length (the first, longest row) fits the budget
+        padded = max(1, lengths[order[position]]) * multiplier
+        rows = max(1, min(budget.budget // padded, max_rows, len(order) - position))
+        batch = order[position:position + rows]
+        cost = padded * rows
+
+        error = None
+        try:
+            result = fn(batch)
+        except Exception as e:
+            if not is_oom_error(e):
+                raise
+            error = e
+        if error is not None:
+            # outside the except block the traceback no longer holds the batch tensors
+            _free_memory()
+            budget.on_oom(cost)
+            if rows == 1:
+                # a single row does not fit: the budget remembers it, the caller gets the error
+                raise error
+            del error
+            max_rows = rows // 2  # retry the failing batch in halves
+            continue
+
+        if result is not None:
+            for index, output in zip(batch, result):
+                outputs[index] = output
+        budget.on_success(cost)
+        position += rows
+        max_rows = len(order)
+
+    return outputs
@@ -1,9 +1,7 @@
 import numpy as np
-from .utils import cosine_similarity
+from .similarity import cosine_similarity, adjacent_cosine_similarity, condensed_distances, to_dense
 from .segment_embedding import *
-from sklearn.neighbors import NearestNeighbors
-from sklearn.cluster import DBSCAN
-from scipy.cluster.hierarchy import linkage, fcluster
+from .neighbors import knn_search, radius_search
 
 """
     this file is for concatenate functions
@@ -17,29 +15,51 @@ from scipy.cluster.hierarchy import linkage, fcluster
 
 """
 
+def _segment_embeddings(segments: list, embeddings: np.ndarray = None) -> np.ndarray:
+    """
+    Embeddings of the segments, encoded unless precomputed ones are given.
+
+    Args:
+    - segments: segment list
+    - embeddings: precomputed (e.g. projected) embeddings aligned with segments, a numpy array
+                  or QuantizedEmbeddings (dequantized block by block by the kernels); they need not
+                  be L2-normalized, only encode_segments output is passed to kernels as normalized
+
+    Returns:
+    - np.ndarray or QuantizedEmbeddings: embeddings
+    """
+    if embeddings is None:
+        embeddings = encode_segments(segments)
+    if not isinstance(embeddings, np.ndarray) and not hasattr(embeddings, 'dequantize'):
+        raise ValueError("Input embeddings must be a numpy array or QuantizedEmbeddings.")
+    if len(embeddings) != len(segments):
+        raise ValueError("Embeddings must be aligned with segments.")
+    return embeddings
+
 # concatenate based on time line
-def concate_time_based(segments:list, threshold=0.6)->list:
+def concate_time_based(segments:list, threshold=0.6, embeddings: np.ndarray = None)->list:
     """
     concatinate based on time line
 
     Args:
     - segments: segment list
     - threshold: similarity threshold
+    - embeddings: precomputed segment embeddings (default: encode_segments(segments))
 
     Returns:
     - list: concatenated indexes
     """
      
-    embeddings = encode_segments(segments)
-    if not isinstance(embeddings, np.ndarray):
-        raise ValueError("Input embeddings must be a numpy array.")
+    normalized = embeddings is None  # encode_segments L2-normalizes, precomputed embeddings may not be
+    embeddings = _segment_embeddings(segments, embeddings)
     if len(embeddings) == 0:
         return []
 
     concatenated_indexes = [[0]]
+    adjacent_similarities = adjacent_cosine_similarity(embeddings, normalized=normalized)
 
     for i in range(1, len(embeddings)):
-        if cosine_similarity(embeddings[i-1], embeddings[i]) > threshold:
+        if adjacent_similarities[i-1] > threshold:
             concatenated_indexes[-1].append(i)
         else:
             concatenated_indexes.append([i])        
@@ -47,7 +67,9 @@ def concate_time_based(segments:list, threshold=0.6)->list:
     return concatenated_indexes
 
 # concatenate based on clustering
-def concate_clustering(segments: list, eps: float = 0.15, min_samples: int = 3) -> list:
+def concate_clustering(segments: list, eps: float = 0.15, min_samples: int = 3,
+                       backend: str = 'sklearn', backend_args: dict = None, report_recall: bool = False,
+                       embeddings: np.ndarray = None) -> list:
     """
     Concatenate based on DBSCAN clustering.
 
@@ -55,21 +77,36 @@ def concate_clustering(segments: list, eps: float = 0.15, min_samples: int = 3)
     - segments: segment list
     - eps: Maximum distance between two samples for them to be considered as in the same cluster.
     - min_samples: Minimum number of samples in a neighborhood for a point to be considered a core point.
+    - backend: neighbor search backend ('sklearn', 'brute', 'ivf'), see utils/neighbors.py
+    - backend_args: backend options (e.g. n_lists, n_probe for 'ivf')
+    - report_recall: print recall of the backend against exact search
+    - embeddings: precomputed segment embeddings (default: encode_segments(segments))
 
     Returns:
     - list: Concatenated indexes as groups.
     """
-    embeddings = encode_segments(segments)
-    if not isinstance(embeddings, np.ndarray):
-        raise ValueError("Input embeddings must be a numpy array.")
+    from sklearn.cluster import DBSCAN
+
+    embeddings = _segment_embeddings(segments, embeddings)
     if len(embeddings) == 0:
         return []
 
     # Perform DBSCAN clustering
-    dbscan = DBSCAN(eps=eps, min_samples=min_samples, metric='cosine')
-    cluster_labels = dbscan.fit_predict(embeddings)
-
-    # Group indexes by cluster
+    if backend == 'sklearn':
+        dbscan = DBSCAN(eps=eps, min_samples=min_samples, metric='cosine')
+        cluster_labels = dbscan.fit_predict(to_dense(embeddings))
+    else:
+        # eps-neighborhoods from the selected backend, DBSCAN only expands them
+        graph = radius_search(embeddings, eps, backend=backend, report_recall=report_recall, **(backend_args or {}))
+        dbscan = DBSCAN(eps=eps, min_samples=min_samples, metric='precomputed')
+        cluster_labels = dbscan.fit_predict(graph)
+
+    return _group_dbscan_labels(cluster_labels)
+
+def _group_dbscan_labels(cluster_labels: np.ndarray) -> list:
+    """
+    Group indexes by DBSCAN cluster label (noise kept as its own group).
+    """
     concatenated_indexes = []
     unique_labels = set(cluster_labels)
 
@@ -81,8 +118,48 @@ def concate_clustering(segments: list, eps: float = 0.15, min_samples: int = 3)
 
     return concatenated_indexes
 
+# DBSCAN parameter sweep based on a single neighborhood computation
+def concate_clustering_sweep(segments: list, eps_grid: list, min_samples_grid: list,
+                             backend: str = 'brute', backend_args: dict = None, embeddings: np.ndarray = None) -> dict:
+    """
+    Run concate_clustering for every (eps, min_samples) pair of the grid.
+
+    Segments are encoded once and the cosine-distance graph is computed once at
+    max(eps_grid); every setting then only re-runs DBSCAN's expansion over that
+    precomputed graph (entries farther than the setting's eps are ignored by DBSCAN),
+    which gives the same labels as a separate concate_clustering call.
+
+    Args:
+    - segments: segment list
+    - eps_grid: eps values to evaluate
+    - min_samples_grid: min_samples values to evaluate
+    - backend: neighbor search backend for the graph ('brute' or 'ivf'), see utils/neighbors.py
+    - backend_args: backend options
+    - embeddings: precomputed segment embeddings (default: encode_segments(segments))
+
+    Returns:
+    - dict: {(eps, min_samples): concatenated indexes as groups}
+    """
+    from sklearn.cluster import DBSCAN
+
+    embeddings = _segment_embeddings(segments, embeddings)
+    if len(embeddings) == 0:
+        return {(eps, min_samples): [] for eps in eps_grid for min_samples in min_samples_grid}
+
+    graph = radius_search(embeddings, max(eps_grid), backend=backend, **(backend_args or {}))
+
+    results = {}
+    for eps in eps_grid:
+        for min_samples in min_samples_grid:
+            dbscan = DBSCAN(eps=eps, min_samples=min_samples, metric='precomputed')
+            results[(eps, min_samples)] = _group_dbscan_labels(dbscan.fit_predict(graph))
+
+    return results
+
 # concatenate based on knn
-def concate_knn(segments: list, k: int = 20, threshold: float = 0.6) -> list:
+def concate_knn(segments: list, k: int = 20, threshold: float = 0.6,
+                backend: str = 'sklearn', backend_args: dict = None, report_recall: bool = False,
+                embeddings: np.ndarray = None) -> list:
     """
     Concatenate based on k-NN similarity.
 
@@ -90,23 +167,20 @@ def concate_knn(segments: list, k: int = 20, threshold: float = 0.6) -> list:
     - segments: segment list
     - k: Number of nearest neighbors to consider.
     - threshold: Similarity threshold to group embeddings.
+    - backend: neighbor search backend ('sklearn', 'brute', 'ivf'), see utils/neighbors.py
+    - backend_args: backend options (e.g. n_lists, n_probe for 'ivf')
+    - report_recall: print recall@k of the backend against exact search
+    - embeddings: precomputed segment embeddings (default: encode_segments(segments))
 
     Returns:
     - list: Concatenated indexes as groups.
     """
-    embeddings = encode_segments(segments)
-    if not isinstance(embeddings, np.ndarray):
-        raise ValueError("Input embeddings must be a numpy array.")
+    embeddings = _segment_embeddings(segments, embeddings)
     if len(embeddings) == 0:
         return []
 
-    # Initialize Nearest Neighbors model
-    k = min(k, len(embeddings))
-    nn_model = NearestNeighbors(n_neighbors=k, metric='cosine')
-    nn_model.fit(embeddings)
-
     # Find k nearest neighbors for each embedding
-    distances, indices = nn_model.kneighbors(embeddings)
+    distances, indices = knn_search(embeddings, k, backend=backend, report_recall=report_recall, **(backend_args or {}))
 
     # Grouping based on the threshold
     concatenated_indexes = []
@@ -120,7 +194,7 @@ def concate_knn(segments: list, k: int = 20, threshold: float = 0.6) -> list:
         visited.add(idx)
 
         for neighbor_idx, distance in zip(neighbors[1:], distances[idx][1:]):  # Skip self (first neighbor)
-            if neighbor_idx not in visited and distance <= threshold:
+            if neighbor_idx >= 0 and neighbor_idx not in visited and distance <= threshold:
                 group.append(neighbor_idx)
                 visited.add(neighbor_idx)
         
@@ -130,7 +204,9 @@ def concate_knn(segments: list, k: int = 20, threshold: float = 0.6) -> list:
 
 
 # timline based + clustering
-def concate_time_clustering(segments: list, threshold=0.6, eps: float = 0.15, min_samples: int = 3) -> list:
+def concate_time_clustering(segments: list, threshold=0.6, eps: float = 0.15, min_samples: int = 3,
+                            backend: str = 'brute', backend_args: dict = None, report_recall: bool = False,
+                            embeddings: np.ndarray = None) -> list:
     """
     Concatenate based on time line and clustering.
 
@@ -139,20 +215,26 @@ def concate_time_clustering(segments: list, threshold=0.6, eps: float = 0.15, mi
     - threshold: similarity threshold
     - eps: Maximum distance between two samples for them to be considered as in the same cluster.
     - min_samples: Minimum number of samples in a neighborhood for a point to be considered a core point.
+    - backend: neighbor search backend of the eps graph ('brute', 'ivf'), see utils/neighbors.py
+    - backend_args: backend options (e.g. n_lists, n_probe for 'ivf')
+    - report_recall: print recall of the backend against exact search
+    - embeddings: precomputed segment embeddings (default: encode_segments(segments))
 
     Returns:
     - list: Concatenated indexes as groups.
     """
-    embeddings = encode_segments(segments)
-    if not isinstance(embeddings, np.ndarray):
-        raise ValueError("Input embeddings must be a numpy array.")
+    from sklearn.cluster import DBSCAN
+
+    normalized = embeddings is None  # encode_segments L2-normalizes, precomputed embeddings may not be
+    embeddings = _segment_embeddings(segments, embeddings)
     if len(embeddings) == 0:
         return []
 
     concatenated_indexes = [[0]]
+    adjacent_similarities = adjacent_cosine_similarity(embeddings, normalized=normalized)
 
     for i in range(1, len(embeddings)):
-        if cosine_similarity(embeddings[i-1], embeddings[i]) > threshold:
+        if adjacent_similarities[i-1] > threshold:
             concatenated_indexes[-1].append(i)
         else:
             concatenated_indexes.append([i])
@@ -163,9 +245,10 @@ def concate_time_clustering(segments: list, threshold=0.6, eps: float = 0.15, mi
         new_segments.append(" ".join([segments[gi] for gi in group]))
     new_embeddings = encode_segments(new_segments)
 
-    # Perform DBSCAN clustering
-    dbscan = DBSCAN(eps=eps, min_samples=min_samples, metric='cosine')
-    cluster_labels = dbscan.fit_predict(new_embeddings)
+    # Perform DBSCAN clustering over the eps-neighborhoods of the selected backend
+    graph = radius_search(new_embeddings, eps, backend=backend, report_recall=report_recall, **(backend_args or {}))
+    dbscan = DBSCAN(eps=eps, min_samples=min_samples, metric='precomputed')
+    cluster_labels = dbscan.fit_predict(graph)
 
     # Group indexes by cluster
     concatenated_indexes = []
@@ -213,7 +296,7 @@ def top_down_splitting(segments: list, threshold: float=0.7) -> list:
         left_embeddings = encode_segments([left_text])
         right_embeddings = encode_segments([right_text])
         
-        similarity = cosine_similarity(left_embeddings[0], right_embeddings[0])
+        similarity = cosine_similarity(left_embeddings[0], right_embeddings[0], normalized=True)
         if similarity > threshold:
             return [[i for i in range(start, end)]]
         else:
@@ -221,7 +304,8 @@ def top_down_splitting(segments: list, threshold: float=0.7) -> list:
     
     return recursively_splitting(segments, 0, len(segments))
 
-def concate_hierarchical_clustering(segments: list, threshold: float = 0.7, method: str = 'ward') -> list:
+def concate_hierarchical_clustering(segments: list, threshold: float = 0.7, method: str = 'ward',
+                                    embeddings: np.ndarray = None) -> list:
     """
     Concatenate segments based on Hierarchical Clustering.
 
@@ -229,21 +313,23 @@ def concate_hierarchical_clustering(segments: list, threshold: float = 0.7, meth
     - segments: list of text segments.
     - threshold: threshold to cut the dendrogram for forming flat clusters.
     - method: linkage method to use ('single', 'complete', 'average', 'ward', etc.)
+    - embeddings: precomputed segment embeddings (default: encode_segments(segments))
 
     Returns:
     - list: Concatenated indexes as groups.
     """
-    embeddings = encode_segments(segments)
-    if not isinstance(embeddings, np.ndarray):
-        raise ValueError("Input embeddings must be a numpy array.")
+    from scipy.cluster.hierarchy import linkage, fcluster
+
+    embeddings = _segment_embeddings(segments, embeddings)
     if len(embeddings) == 0:
         return []
 
     # Ward method requires Euclidean metric
     distance_metric = 'euclidean' if method == 'ward' else 'cosine'
 
-    # Compute the linkage matrix
-    linkage_matrix = linkage(embeddings, method=method, metric=distance_metric)
+    # Compute the linkage matrix from float32 blockwise distances
+    distances = condensed_distances(embeddings, metric=distance_metric, normalized=distance_metric == 'cosine')
+    linkage_matrix = linkage(distances, method=method)
 
     # Form flat clusters from the hierarchical clustering defined by the linkage matrix
     cluster_labels = fcluster(linkage_matrix, t=threshold, criterion='distance')
@@ -0,0 +1,122 @@
+import os
+from typing import List
+
+import yaml
+from box import Box
+
+from .registry import CONCAT_METHODS, SUMMARIZERS
+
+"""
+    this file is for loading and validating config.yaml without importing the pipeline
+
+    usage: python -m utils.config [config.yaml ...]
+
+"""
+
+
+def load_config(path: str = 'config.yaml') -> Box:
+    """
+    config.yaml을 Box로 로드
+    """
+    with open(path, "r") as f:
+        return Box(yaml.load(f, Loader=yaml.FullLoader))
+
+
+def validate_config(config: Box, data_dir: str = 'data') -> List[str]:
+    """
+    config의 오류 목록을 반환 (빈 리스트면 정상)
+
+    Args:
+    - config: load_config 결과
+    - data_dir: index set 파일이 있는 디렉토리
+
+    Returns:
+    - List[str]: error messages
+    """
+    from .dataset_cache import SOURCES
+    from .dedup import DEDUP_METHODS
+    from .embedding_store import STORAGE_DTYPES
+    from .neighbors import NEIGHBOR_BACKENDS
+    from .profiling import PIPELINE_STAGES, PROFILERS
+    from .segmentation import SEGMENT_UNITS
+
+    errors = []
+    for key in ('experiment_name', 'mini_batch', 'data', 'segment', 'concat', 'summary'):
+        if key not in config:
+            errors.append(f"missing section '{key}'")
+    if errors:
+        return errors
+
+    # data
+    source = config.data.get('source')
+    if source not in SOURCES:
+        errors.append(f"data.source must be one of {list(SOURCES)}, got '{source}'")
+    else:
+        if source not in config.data:
+            errors.append(f"data.{source} (dataset path) is missing")
+        index_path = os.path.join(data_dir, f"{SOURCES[source][0]}_indices{config.data.get('index_set')}.npy")
+        if not os.path.exists(index_path):
+            errors.append(f"index set file not found: {index_path}")
+
+    # segment
+    segment_args = config.segment.get('args', {})
+    n_word, n_overlap = segment_args.get('n_word'), segment_args.get('n_overlap', 0)
+    if not isinstance(n_word, int) or n_word <= 0:
+        errors.append("segment.args.n_word must be a positive integer")
+    elif not isinstance(n_overlap, int) or not 0 <= n_overlap < n_word:
+        errors.append("segment.args.n_overlap must be an integer in [0, n_word)")
+    if segment_args.get('unit', 'word') not in SEGMENT_UNITS:
+        errors.append(f"segment.args.unit must be one of {SEGMENT_UNITS}")
+    if config.segment.get('stream') and segment_args.get('unit', 'word') != 'word':
+        errors.append("segment.stream requires segment.args.unit 'word'")
+
+    # concat
+    if config.concat.get('method') not in CONCAT_METHODS:
+        errors.append(f"concat.method must be one of {sorted(CONCAT_METHODS)}, got '{config.concat.get('method')}'")
+    concat_args = config.concat.get('args') or {}
+    if concat_args.get('backend', 'brute') not in NEIGHBOR_BACKENDS:
+        errors.append(f"concat.args.backend must be one of {NEIGHBOR_BACKENDS}")
+
+    # summary
+    if config.summary.get('method', 'summarizer') not in SUMMARIZERS:
+        errors.append(f"summary.method must be one of {sorted(SUMMARIZERS)}")
+    if not isinstance(config.mini_batch.get('size'), int):
+        errors.append("mini_batch.size must be an integer")
+
+    # optional sections
+    if 'dedup' in config and (config.dedup.get('args') or {}).get('method') not in DEDUP_METHODS:
+        errors.append(f"dedup.args.method must be one of {DEDUP_METHODS}")
+    if 'embedding' in config:
+        if config.embedding.get('dtype', 'float32') not in STORAGE_DTYPES:
+            errors.append(f"embedding.dtype must be one of {STORAGE_DTYPES}")
+        pca_path = config.embedding.get('pca_path')
+        if pca_path is not None and not os.path.exists(pca_path):
+            errors.append(f"embedding.pca_path not found: {pca_path}")
+
+    if 'adaptive_batch' in config:
+        initial_tokens = (config.adaptive_batch.get('args') or {}).get('initial_tokens', 1)
+        if not isinstance(initial_tokens, int) or initial_tokens <= 0:
+            errors.append("adaptive_batch.args.initial_tokens must be a positive integer")
+    if 'profile' in config:
+        if config.profile.get('backend', 'cprofile') not in PROFILERS:
+            errors.append(f"profile.backend must be one of {PROFILERS}")
+        unknown = set(config.profile.get('stages') or []) - set(PIPELINE_STAGES)
+        if unknown:
+            errors.append(f"profile.stages must be a subset of {PIPELINE_STAGES}, got {sorted(unknown)}")
+
+    return errors
+
+
+# Validate config files
+if __name__ == "__main__":
+    import sys
+
+    paths = sys.argv[1:] or ['config.yaml']
+    failed = False
+    for path in paths:
+        errors = validate_config(load_config(path))
+        print(f"{path}: {'OK' if not errors else 'INVALID'}")
+        for error in errors:
+            print(f"  - {error}")
+        failed = failed or bool(errors)
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,206 @@
+import hashlib
+import json
+import mmap
+import os
+from typing import Iterator, Sequence
+
+import numpy as np
+
+"""
+    this file is for local materialization of the experiment datasets
+
+    each (source, index_set) subset is written once to data/cache as
+        <prefix>_indices<N>.jsonl        : one {"index": <dataset index>, "text": <document>} per line
+        <prefix>_indices<N>.offsets.npy  : byte offset of every line (+ end of file)
+        <prefix>_indices<N>.meta.json    : dataset name and sha256 of the index set file
+    and read back lazily through a memory map, so a run never loads the HF dataset
+    and only holds the current document in memory
+
+    the subset is rebuilt when the dataset or the index set file no longer matches the sidecar
+
+"""
+
+DEFAULT_CACHE_DIR = os.path.join('data', 'cache')
+
+# data.source -> (index file prefix, text column)
+SOURCES = {
+    'opensource': ('gov', 'report'),
+    'youtube': ('ytb', 'content'),
+}
+
+
+def subset_paths(source: str, index_set: int, cache_dir: str = DEFAULT_CACHE_DIR):
+    """
+    paths of the materialized subset
+
+    Returns:
+    - (str, str): jsonl path, offsets path
+    """
+    prefix, _ = SOURCES[source]
+    base = os.path.join(cache_dir, f'{prefix}_indices{index_set}')
+    return base + '.jsonl', base + '.offsets.npy'
+
+
+def meta_path(source: str, index_set: int, cache_dir: str = DEFAULT_CACHE_DIR) -> str:
+    """
+    path of the sidecar describing what the materialized subset was built from
+    """
+    prefix, _ = SOURCES[source]
+    return os.path.join(cache_dir, f'{prefix}_indices{index_set}.meta.json')
+
+
+def subset_meta(source: str, index_set: int, dataset_name: str, indices_dir: str = 'data') -> dict:
+    """
+    {"dataset", "indices_sha256"} of the subset as configured now
+    """
+    prefix, _ = SOURCES[source]
+    with open(os.path.join(indices_dir, f'{prefix}_indices{index_set}.npy'), 'rb') as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    return {'dataset': dataset_name, 'indices_sha256': digest}
+
+
+def is_materialized(source: str, index_set: int, dataset_name: str, cache_dir: str = DEFAULT_CACHE_DIR,
+                    indices_dir: str = 'data') -> bool:
+    """
+    the cached subset exists and was built from the same dataset and index set file
+    """
+    path, offsets_path = subset_paths(source, index_set, cache_dir)
+    sidecar = meta_path(source, index_set, cache_dir)
+    if not all(os.path.exists(p) for p in (path, offsets_path, sidecar)):
+        return False
+    with open(sidecar) as f:
+        return json.load(f) == subset_meta(source, index_set, dataset_name, indices_dir)
+
+
+class LocalDocuments(Sequence):
+    """
+    Lazy, memory-mapped sequence of the documents of one materialized subset.
+
+    Attributes:
+        path (str): jsonl path
+        offsets (np.ndarray): (n+1,) byte offsets of the lines
+    """
+
+    def __init__(self, path: str, offsets_path: str):
+        self.path = path
+        self.offsets = np.load(offsets_path)
+        self._file = open(path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.offsets[-1] > 0 else b''
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def record(self, index: int) -> dict:
+        """
+        {"index": dataset index, "text": document} of the index-th document
+        """
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return json.loads(self._mmap[self.offsets[index]:self.offsets[index + 1]])
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return self.record(index)['text']
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def close(self) -> None:
+        if isinstance(self._mmap, mmap.mmap):
+            self._mmap.close()
+        self._file.close()
+
+
+def materialize_subset(source: str, index_set: int, dataset_name: str, cache_dir: str = DEFAULT_CACHE_DIR,
+                       indices_dir: str = 'data') -> str:
+    """
+    write the (source, index_set) subset of the HF dataset to the local cache (one-time)
+
+    Args:
+    - source: 'opensource' or 'youtube'
+    - index_set: N of data/<prefix>_indices<N>.npy
+    - dataset_name: HF dataset path (config.data.opensource / config.data.youtube)
+    - cache_dir: output directory
+    - indices_dir: directory of the index set files
+
+    Returns:
+    - str: jsonl path
+    """
+    from datasets import load_dataset
+
+    prefix, column = SOURCES[source]
+    path, offsets_path = subset_paths(source, index_set, cache_dir)
+    sidecar = meta_path(source, index_set, cache_dir)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    meta = subset_meta(source, index_set, dataset_name, indices_dir)
+    indices = np.load(os.path.join(indices_dir, f'{prefix}_indices{index_set}.npy'))
+    subset = load_dataset(dataset_name)['train'].select(indices)
+
+    offsets = [0]
+    with open(path + '.tmp', 'wb') as f:
+        for index, row in zip(indices, subset):
+            f.write(json.dumps({'index': int(index), 'text': row[column]}).encode('utf-8') + b'\n')
+            offsets.append(f.tell())
+    np.save(offsets_path + '.tmp.npy', np.asarray(offsets, dtype=np.int64))
+    with open(sidecar + '.tmp', 'w') as f:
+        json.dump(meta, f)
+
+    # publish atomically, the sidecar last so a matching sidecar means a complete subset
+    if os.path.exists(sidecar):
+        os.remove(sidecar)
+    os.replace(path + '.tmp', path)
+    os.replace(offsets_path + '.tmp.npy', offsets_path)
+    os.replace(sidecar + '.tmp', sidecar)
+    return path
+
+
+def load_documents(data_config, cache_dir: str = DEFAULT_CACHE_DIR, indices_dir: str = 'data') -> LocalDocuments:
+    """
+    documents of config.data, materialized on first use
+
+    Args:
+    - data_config: config.data (source, opensource, youtube, index_set)
+    - cache_dir: local cache directory
+    - indices_dir: directory of the index set files
+
+    Returns:
+    - LocalDocuments: lazy document sequence
+    """
+    source, index_set = data_config['source'], data_config['index_set']
+    path, offsets_path = subset_paths(source, index_set, cache_dir)
+    if not is_materialized(source, index_set, data_config[source], cache_dir, indices_dir):
+        materialize_subset(source, index_set, data_config[source], cache_dir, indices_dir)
+    return LocalDocuments(path, offsets_path)
+
+
+# Materialize every index set of a source
+if __name__ == "__main__":
+    import argparse
+    import glob
+
+    parser = argparse.ArgumentParser(description="Materialize dataset index sets to the local cache.")
+    parser.add_argument("--source", choices=list(SOURCES), required=True)
+    parser.add_argument("--dataset", default=None, help="HF dataset path (default: from config.yaml)")
+    parser.add_argument("--index_set", type=int, nargs="*", default=None, help="index sets (default: all)")
+    parser.add_argument("--cache_dir", default=DEFAULT_CACHE_DIR)
+    args = parser.parse_args()
+
+    dataset_name = args.dataset
+    if dataset_name is None:
+        import yaml
+        with open("config.yaml", "r") as f:
+            dataset_name = yaml.safe_load(f)["data"][args.source]
+
+    prefix, _ = SOURCES[args.source]
+    index_sets = args.index_set or sorted(
+        int(os.path.basename(p)[len(prefix) + len('_indices'):-len('.npy')])
+        for p in glob.glob(os.path.join('data', f'{prefix}_indices*.npy'))
+    )
+    for index_set in index_sets:
+        print(f"Materializing {args.source} index set {index_set}... ", end="", flush=True)
+        print("Done", materialize_subset(args.source, index_set, dataset_name, args.cache_dir))
@@ -0,0 +1,360 @@
+import hashlib
+import zlib
+from typing import Iterator, List, Sequence, Tuple
+
+import numpy as np
+
+"""
+    this file is for deduplication of segments between segmentation and encoding
+
+    repeated transcript lines (intros, sponsor reads, caption stutters) make
+    segmentate_sentence emit identical or near-identical segments; each unique
+    segment is encoded / clustered once and the result is mapped back to the
+    original segment indexes
+
+    methods:
+        None     : exact duplicates only (whitespace / case normalized hash)
+        'minhash': + near duplicates by MinHash-LSH over word shingles (Jaccard)
+        'simhash': + near duplicates by 64-bit SimHash (Hamming distance)
+
+    near_duplicate_clusters is the collection-level counterpart (whole transcripts, see
+    data/collect_script/dedup_transcripts.py)
+
+"""
+
+DEDUP_METHODS = (None, 'minhash', 'simhash')
+
+_MERSENNE_PRIME = (1 << 31) - 1
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def _exact_key(text: str) -> bytes:
+    return hashlib.blake2b(_normalize(text).encode('utf-8'), digest_size=16).digest()
+
+
+def _shingles(text: str, shingle_size: int) -> np.ndarray:
+    """
+    crc32 hashes of the word k-grams of the text
+    """
+    words = _normalize(text).split()
+    if len(words) < shingle_size:
+        grams = [" ".join(words)]
+    else:
+        grams = [" ".join(words[i:i + shingle_size]) for i in range(len(words) - shingle_size + 1)]
+    return np.fromiter((zlib.crc32(g.encode('utf-8')) for g in grams), dtype=np.int64, count=len(grams))
+
+
+def minhash_signatures(texts: Sequence[str], num_perm: int = 64, shingle_size: int = 3, seed: int = 0) -> np.ndarray:
+    """
+    MinHash signatures of the texts
+
+    Args:
+    - texts: text list
+    - num_perm: number of hash permutations (signature length)
+    - shingle_size: words per shingle
+    - seed: seed of the permutations
+
+    Returns:
+    - np.ndarray: (n, num_perm) signatures
+    """
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, _MERSENNE_PRIME, size=num_perm, dtype=np.int64)
+    b = rng.integers(0, _MERSENNE_PRIME, size=num_perm, dtype=np.int64)
+
+    signatures = np.empty((len(texts), num_perm), dtype=np.int64)
+    for i, text in enumerate(texts):
+        shingles = _shingles(text, shingle_size) % _MERSENNE_PRIME
+        signatures[i] = ((a[:, None] * shingles[None, :] + b[:, None]) % _MERSENNE_PRIME).min(axis=1)
+    return signatures
+
+
+def lsh_buckets(signatures: np.ndarray, bands: int = 16) -> Iterator[np.ndarray]:
+    """
+    LSH banding of MinHash signatures: rows sharing a band key, without pairwise comparison
+
+    Args:
+    - signatures: (n, num_perm) MinHash signatures
+    - bands: LSH bands (num_perm must be divisible by bands)
+
+    Yields:
+    - np.ndarray: row indices of one bucket with at least 2 rows (band by band)
+    """
+    n, num_perm = signatures.shape
+    assert num_perm % bands == 0, "num_perm must be divisible by bands"
+    rows = num_perm // bands
+
+    with np.errstate(over='ignore'):
+        for band in range(bands):
+            keys = np.zeros(n, dtype=np.uint64)
+            for column in signatures[:, band * rows:(band + 1) * rows].T.astype(np.uint64):
+                keys = keys * np.uint64(1_000_003) + column  # hash collisions only add candidates
+            order = np.argsort(keys, kind='stable')
+            sorted_keys = keys[order]
+            starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+            sizes = np.diff(np.r_[starts, n])
+            for start, size in zip(starts[sizes > 1], sizes[sizes > 1]):
+                yield order[start:start + size]
+
+
+def lsh_candidate_pairs(signatures: np.ndarray, bands: int = 16,
+                        max_bucket_size: int = 256) -> Tuple[np.ndarray, List[np.ndarray]]:
+    """
+    candidate near-duplicate pairs: every pair inside each LSH bucket of at most max_bucket_size rows
+
+    larger buckets (boilerplate shared by many rows) would emit m^2 / 2 pairs, they are returned
+    as they are and verified member by member against at most max_bucket_size representatives
+
+    Args:
+    - signatures: (n, num_perm) MinHash signatures
+    - bands: LSH bands (num_perm must be divisible by bands)
+    - max_bucket_size: largest bucket expanded to all of its pairs
+
+    Returns:
+    - (np.ndarray, List[np.ndarray]): (m, 2) unique pairs (i < j), row indices of the larger buckets
+    """
+    pairs, large_buckets = [], []
+    for bucket in lsh_buckets(signatures, bands):
+        if len(bucket) > max_bucket_size:
+            large_buckets.append(bucket)
+            continue
+        first, second = np.triu_indices(len(bucket), 1)
+        pairs.append(np.stack([bucket[first], bucket[second]], axis=1))
+
+    if not pairs:
+        return np.empty((0, 2), dtype=np.int64), large_buckets
+    pairs = np.sort(np.concatenate(pairs), axis=1).astype(np.int64)
+    return np.unique(pairs, axis=0), large_buckets
+
+
+def _verified(rows: np.ndarray, reps: np.ndarray, similarity: np.ndarray, threshold: float) -> np.ndarray:
+    """
+    (i, j, similarity * 1e4) of the (row, representative) pairs at or above the threshold
+    """
+    member, rep = np.nonzero(similarity >= threshold)
+    pairs = np.sort(np.column_stack([rows[member], reps[rep]]), axis=1)
+    return np.column_stack([pairs, np.round(similarity[member, rep] * 1e4).astype(np.int64)])
+
+
+def _verify_bucket(signatures: np.ndarray, bucket: np.ndarray, threshold: float,
+                   max_representatives: int = 256, chunk_size: int = 256) -> np.ndarray:
+    """
+    verified pairs of a large bucket: each member against the bucket's representatives
+
+    a member matching no representative becomes one until there are max_representatives;
+    after that, such members are only found through their other bands. the work is bounded
+    by len(bucket) x max_representatives signature comparisons (linear in the bucket size)
+
+    Returns:
+    - np.ndarray: (m, 3) pairs as (i, j, similarity * 1e4) int64
+    """
+    representatives = [bucket[0]]
+    verified = []
+    position = 1
+    while position < len(bucket) and len(representatives) < max_representatives:
+        row = bucket[position:position + 1]
+        reps = np.asarray(representatives)
+        similarity = (signatures[reps] == signatures[row]).mean(axis=1)[None, :]
+        if (similarity >= threshold).any():
+            verified.append(_verified(row, reps, similarity, threshold))
+        else:
+            representatives.append(row[0])
+        position += 1
+
+    # the representatives are fixed now: the remaining members are compared chunk by chunk
+    reps = np.asarray(representatives)
+    for start in range(position, len(bucket), chunk_size):
+        rows = bucket[start:start + chunk_size]
+        similarity = (signatures[rows][:, None, :] == signatures[reps][None, :, :]).mean(axis=2)
+        verified.append(_verified(rows, reps, similarity, threshold))
+    return np.concatenate(verified) if verified else np.empty((0, 3), dtype=np.int64)
+
+
+def near_duplicate_clusters(signatures: np.ndarray, threshold: float = 0.8, bands: int = 16,
+                            chunk_size: int = 1 << 16, max_bucket_size: int = 256) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    clusters of near duplicates over a whole collection (sub-quadratic: LSH candidates only)
+
+    Args:
+    - signatures: (n, num_perm) MinHash signatures
+    - threshold: estimated Jaccard similarity (signature agreement) for a duplicate pair
+    - bands: LSH bands
+    - chunk_size: candidate pairs verified at once
+    - max_bucket_size: larger buckets are verified against at most this many representatives instead of
+                       all pairs, so no bucket costs more than len(bucket) x max_bucket_size comparisons
+
+    Returns:
+    - (np.ndarray, np.ndarray): (n,) cluster label of every row (singletons included),
+                                (m, 3) verified pairs as (i, j, similarity * 1e4) int64
+    """
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
+
+    n = len(signatures)
+    candidates, large_buckets = lsh_candidate_pairs(signatures, bands, max_bucket_size)
+    verified = []
+    for start in range(0, len(candidates), chunk_size):
+        chunk = candidates[start:start + chunk_size]
+        similarity = (signatures[chunk[:, 0]] == signatures[chunk[:, 1]]).mean(axis=1)
+        keep = similarity >= threshold
+        verified.append(np.column_stack([chunk[keep], np.round(similarity[keep] * 1e4).astype(np.int64)]))
+    verified.extend(_verify_bucket(signatures, bucket, threshold, max_bucket_size) for bucket in large_buckets)
+    verified = np.concatenate(verified) if verified else np.empty((0, 3), dtype=np.int64)
+    if large_buckets:
+        verified = np.unique(verified, axis=0)
+
+    graph = coo_matrix((np.ones(len(verified), dtype=np.int8), (verified[:, 0], verified[:, 1])), shape=(n, n))
+    _, labels = connected_components(graph, directed=False)
+    return labels, verified
+
+
+def simhash_fingerprints(texts: Sequence[str]) -> np.ndarray:
+    """
+    64-bit SimHash fingerprints of the texts (word tokens, term-frequency weighted)
+
+    Returns:
+    - np.ndarray: (n,) uint64 fingerprints
+    """
+    bit_values = np.uint64(1) << np.arange(64, dtype=np.uint64)
+    fingerprints = np.zeros(len(texts), dtype=np.uint64)
+    for i, text in enumerate(texts):
+        words = _normalize(text).split()
+        if not words:
+            continue
+        hashes = np.fromiter(
+            (int.from_bytes(hashlib.blake2b(w.encode('utf-8'), digest_size=8).digest(), 'little') for w in words),
+            dtype=np.uint64, count=len(words)
+        )
+        bits = (hashes[:, None] & bit_values[None, :]) != 0
+        weights = np.where(bits, 1, -1).sum(axis=0)
+        fingerprints[i] = np.bitwise_or.reduce(np.where(weights > 0, bit_values, np.uint64(0)))
+    return fingerprints
+
+
+def _popcount(x: np.ndarray) -> np.ndarray:
+    return np.unpackbits(x.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+
+
+def deduplicate_segments(segments: Sequence[str], method: str = None, threshold: float = 0.9,
+                         num_perm: int = 64, bands: int = 16, shingle_size: int = 3, seed: int = 0) -> Tuple[List[int], np.ndarray]:
+    """
+    find duplicate segments, the first occurrence of each is the representative
+
+    Args:
+    - segments: segment list
+    - method: near-duplicate method, one of DEDUP_METHODS (exact duplicates are always merged)
+    - threshold: similarity for near duplicates ('minhash': Jaccard, 'simhash': 1 - hamming / 64)
+    - num_perm: MinHash signature length
+    - bands: MinHash LSH bands (num_perm must be divisible by bands)
+    - shingle_size: words per MinHash shingle
+    - seed: MinHash seed
+
+    Returns:
+    - (List[int], np.ndarray): original indexes of the unique segments, and for every
+                               original segment the position of its representative in that list
+    """
+    if method not in DEDUP_METHODS:
+        raise ValueError(f"Unknown dedup method '{method}', expected one of {DEDUP_METHODS}")
+
+    unique_indices = []
+    inverse = np.empty(len(segments), dtype=np.int64)
+
+    # exact duplicates
+    exact_first = {}
+    exact_inverse = np.empty(len(segments), dtype=np.int64)
+    for i, segment in enumerate(segments):
+        exact_inverse[i] = exact_first.setdefault(_exact_key(segment), i)
+    candidates = [i for i in range(len(segments)) if exact_inverse[i] == i]
+
+    if method is None:
+        rep_of = {i: i for i in candidates}
+    else:
+        texts = [segments[i] for i in candidates]
+        rep_of = {}
+        if method == 'minhash':
+            assert num_perm % bands == 0, "num_perm must be divisible by bands"
+            signatures = minhash_signatures(texts, num_perm, shingle_size, seed)
+            rows = num_perm // bands
+            buckets = {}
+            for pos, i in enumerate(candidates):
+                keys = [(band, signatures[pos, band * rows:(band + 1) * rows].tobytes()) for band in range(bands)]
+                rep = i
+                for key in keys:
+                    for other_pos in buckets.get(key, ()):
+                        if np.mean(signatures[pos] == signatures[other_pos]) >= threshold:
+                            rep = candidates[other_pos]
+                            break
+                    if rep != i:
+                        break
+                rep_of[i] = rep
+                if rep == i:  # only representatives are indexed
+                    for key in keys:
+                        buckets.setdefault(key, []).append(pos)
+        else:
+            fingerprints = simhash_fingerprints(texts)
+            max_distance = int(round((1 - threshold) * 64))
+            rep_positions = []
+            for pos, i in enumerate(candidates):
+                rep = i
+                if rep_positions:
+                    distances = _popcount(fingerprints[rep_positions] ^ fingerprints[pos])
+                    nearest = int(np.argmin(distances))
+                    if distances[nearest] <= max_distance:
+                        rep = candidates[rep_positions[nearest]]
+                rep_of[i] = rep
+                if rep == i:
+                    rep_positions.append(pos)
+
+    position = {}
+    for i in range(len(segments)):
+        rep = rep_of[exact_inverse[i]]
+        if rep not in position:
+            position[rep] = len(unique_indices)
+            unique_indices.append(rep)
+        inverse[i] = position[rep]
+
+    return unique_indices, inverse
+
+
+def expand_embeddings(embeddings: np.ndarray, inverse: np.ndarray) -> np.ndarray:
+    """
+    embeddings of the unique segments -> embeddings of every original segment
+    """
+    return embeddings[inverse]
+
+
+def expand_groups(groups: List[List[int]], unique_indices: List[int], inverse: np.ndarray,
+                  drop_duplicates: bool = False) -> List[List[int]]:
+    """
+    groups over unique segment positions -> groups over original segment indexes
+
+    Args:
+    - groups: concatenated indexes returned by a concate_* function on the unique segments
+    - unique_indices: original indexes of the unique segments
+    - inverse: representative position of every original segment
+    - drop_duplicates: keep only the representative of each duplicate set,
+                       so duplicates are not summarized again
+
+    Returns:
+    - List[List[int]]: concatenated indexes over the original segments
+    """
+    members = [[] for _ in unique_indices]
+    if not drop_duplicates:
+        for i, pos in enumerate(inverse):
+            members[pos].append(i)
+
+    expanded = []
+    for group in groups:
+        new_group = []
+        for pos in group:
+            if pos < 0:  # pass through negative labels (e.g. DBSCAN noise marker)
+                new_group.append(pos)
+            elif drop_duplicates:
+                new_group.append(unique_indices[pos])
+            else:
+                new_group.extend(members[pos])
+        expanded.append(sorted(new_group))
+
+    return expanded
@@ -0,0 +1,157 @@
+from functools import lru_cache
+
+import numpy as np
+
+from .similarity import normalize_rows
+
+"""
+    this file is for compact embedding storage and transforms applied before the concate_* methods
+
+    storage dtypes:
+        'float32': as returned by encode_segments
+        'float16': half precision, upcast per block on use
+        'int8'   : per-vector symmetric quantization (int8 codes + one float32 scale per row)
+
+    QuantizedEmbeddings are passed to the concate_* methods as they are, the similarity
+    kernels (utils/similarity.py) dequantize one block of rows at a time
+
+    transform:
+        PCAProjection: learned once per dataset (fit + save), loaded and applied per document
+
+"""
+
+STORAGE_DTYPES = ('float32', 'float16', 'int8')
+
+
+class QuantizedEmbeddings:
+    """
+    Embeddings stored as float16 or per-vector int8 codes.
+
+    Attributes:
+        codes (np.ndarray): (n, d) float16 values or int8 codes
+        scales (np.ndarray): (n,) float32 per-row scales (int8 only)
+        dtype (str): storage dtype
+    """
+
+    def __init__(self, codes: np.ndarray, scales: np.ndarray = None, dtype: str = 'int8'):
+        self.codes = codes
+        self.scales = scales
+        self.dtype = dtype
+
+    @classmethod
+    def from_float(cls, embeddings: np.ndarray, dtype: str = 'int8') -> "QuantizedEmbeddings":
+        """
+        quantize float embeddings to the storage dtype
+        """
+        if dtype not in STORAGE_DTYPES:
+            raise ValueError(f"Unknown storage dtype '{dtype}', expected one of {STORAGE_DTYPES}")
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if dtype != 'int8':
+            return cls(embeddings.astype(dtype), None, dtype)
+
+        scales = np.abs(embeddings).max(axis=1) / 127.0
+        scales = np.where(scales > 0, scales, 1.0).astype(np.float32)
+        codes = np.clip(np.rint(embeddings / scales[:, None]), -127, 127).astype(np.int8)
+        return cls(codes, scales, dtype)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def dequantize(self, start: int = 0, end: int = None) -> np.ndarray:
+        """
+        float32 embeddings of rows [start, end)
+        """
+        block = self.codes[start:end].astype(np.float32)
+        if self.scales is not None:
+            block *= self.scales[start:end, None]
+        return block
+
+
+class PCAProjection:
+    """
+    Linear projection learned with PCA, applied to embeddings before clustering.
+
+    Attributes:
+        mean (np.ndarray): (d,) mean of the fitted embeddings
+        components (np.ndarray): (k, d) principal axes
+        explained_variance_ratio (np.ndarray): (k,) variance ratio of each axis
+    """
+
+    def __init__(self, mean: np.ndarray = None, components: np.ndarray = None, explained_variance_ratio: np.ndarray = None):
+        self.mean = mean
+        self.components = components
+        self.explained_variance_ratio = explained_variance_ratio
+
+    def fit(self, embeddings: np.ndarray, n_components: int = 64) -> "PCAProjection":
+        """
+        fit principal axes on a sample of the dataset's embeddings
+        """
+        x = np.asarray(embeddings, dtype=np.float32)
+        self.mean = x.mean(axis=0)
+        _, singular_values, vt = np.linalg.svd(x - self.mean, full_matrices=False)
+        variance = singular_values ** 2
+        self.components = vt[:n_components].astype(np.float32)
+        self.explained_variance_ratio = (variance[:n_components] / variance.sum()).astype(np.float32)
+        return self
+
+    def transform(self, embeddings: np.ndarray, normalize: bool = True) -> np.ndarray:
+        """
+        project embeddings (re-normalized so cosine kernels keep working)
+        """
+        projected = (np.asarray(embeddings, dtype=np.float32) - self.mean) @ self.components.T
+        return normalize_rows(projected) if normalize else projected
+
+    def save(self, path: str) -> None:
+        np.savez(path, mean=self.mean, components=self.components,
+                 explained_variance_ratio=self.explained_variance_ratio)
+
+    @classmethod
+    def load(cls, path: str) -> "PCAProjection":
+        data = np.load(path)
+        return cls(data['mean'], data['components'], data['explained_variance_ratio'])
+
+
+@lru_cache(maxsize=None)
+def load_pca(path: str) -> PCAProjection:
+    """
+    load a saved PCAProjection once per path
+    """
+    return PCAProjection.load(path)
+
+
+def transform_embeddings(embeddings: np.ndarray, dtype: str = 'float32', pca_path: str = None):
+    """
+    apply the configured projection and storage precision to document embeddings
+
+    Args:
+    - embeddings: (n, d) embeddings from encode_segments
+    - dtype: storage dtype, one of STORAGE_DTYPES
+    - pca_path: .npz saved by PCAProjection.save (None: no projection)
+
+    Returns:
+    - np.ndarray or QuantizedEmbeddings: float32 embeddings, or the stored codes for 'float16' / 'int8'
+    """
+    if pca_path is not None:
+        embeddings = load_pca(pca_path).transform(embeddings)
+    if dtype == 'float32':
+        return np.asarray(embeddings, dtype=np.float32)
+    return QuantizedEmbeddings.from_float(embeddings, dtype)
+
+
+# Fit a dataset projection from saved embeddings
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Fit a PCA projection on dataset embeddings (.npy).")
+    parser.add_argument("embeddings", help=".npy file of (n, d) segment embeddings sampled from the dataset")
+    parser.add_argument("output", help="output .npz path (config.embedding.pca_path)")
+    parser.add_argument("--n_components", type=int, default=64)
+    args = parser.parse_args()
+
+    projection = PCAProjection().fit(np.load(args.embeddings), args.n_components)
+    projection.save(args.output)
+    print(f"explained variance: {projection.explained_variance_ratio.sum():.4f}")
@@ -1,9 +1,5 @@
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-# pip install rouge_score bert_score
-from rouge_score import rouge_scorer
-from bert_score import score as bert_score
+# pip install rouge_score bert_score (imported on first use)
 from .segment_embedding import *
 from .utils import cosine_similarity
 
@@ -19,6 +15,8 @@ def calculate_rouge_scores(original_text, summary):
     Returns:
     -  'rouge1': float, 'rouge2': float, 'rougeL': float.
     """
+    from rouge_score import rouge_scorer
+
     scorer = rouge_scorer.RougeScorer(['rouge1', 'rouge2', 'rougeL'], use_stemmer=True)
     scores = scorer.score(original_text, summary)
     return (
@@ -27,7 +25,7 @@ def calculate_rouge_scores(original_text, summary):
         scores['rougeL'].fmeasure
     )
 
-def calculate_bert_score(original_text, summary, model="bert-base-uncased"):
+def calculate_bert_score(original_text, summary, model="bert-base-uncased", num_layers=None):
     """
     BERTScore를 계산.
     
@@ -35,11 +33,14 @@ def calculate_bert_score(original_text, summary, model="bert-base-uncased"):
     - original_text (str): 원본 텍스트.
     - summary (str): 요약 텍스트.
     - model (str): 사용할 BERT 모델의 이름 (default: "bert-base-uncased").
+    - num_layers (int): 사용할 layer 수 (bert_score에 등록되지 않은 로컬 모델은 필수).
     
     Returns:
     - float: BERTScore.
     """
-    P, R, F = bert_score([summary], [original_text], model_type=model, lang="en")
+    from bert_score import score as bert_score
+
+    P, R, F = bert_score([summary], [original_text], model_type=model, num_layers=num_layers, lang="en")
     return F.mean().item()
 
 
@@ -74,6 +75,8 @@ def calculate_rouge_matrices(texts):
         - rouge2_matrix: ROUGE-2 F-measure 매트릭스 (n x n).
         - rougeL_matrix: ROUGE-L F-measure 매트릭스 (n x n).
     """
+    from rouge_score import rouge_scorer
+
     n = len(texts)
     rouge1_matrix = np.zeros((n, n))
     rouge2_matrix = np.zeros((n, n))
@@ -106,6 +109,8 @@ def calculate_bert_matrix(texts, model="bert-base-uncased"):
     Returns:
     - np.ndarray: BERTScore 매트릭스 (n x n).
     """
+    from bert_score import score as bert_score
+
     n = len(texts)
     bert_matrix = np.zeros((n, n))
     for i in range(n):
@@ -126,6 +131,9 @@ def plot_heatmap(matrix, title):
     Returns:
     - None: 히트맵을 출력.
     """
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
     plt.figure(figsize=(10, 8))
     sns.heatmap(matrix, annot=True, fmt=".2f", cmap="coolwarm", xticklabels=False, yticklabels=False)
     plt.title(title)
@@ -0,0 +1,273 @@
+import json
+import math
+import os
+from typing import Dict, Optional, Set
+
+import numpy as np
+
+from .dataset_cache import DEFAULT_CACHE_DIR, SOURCES
+
+"""
+    this file is for building index sets (data/<prefix>_indices<N>.npy) with predictable cost
+
+    per-document statistics of the whole source dataset (words, characters, estimated
+    tokens, youtube playlist / file_name keys) are computed in one streaming pass and
+    cached as data/cache/<prefix>_stats.npz; index sets are then drawn from the cache:
+
+        stratified: equal (or proportional) samples from length quantile strata
+        budget    : random documents until the estimated segment count reaches a budget,
+                    optionally only documents under a per-document cap (smoke-test sets)
+
+    the estimated segment count of a document is the number of word windows of
+    segmentate_sentence (n_word, n_overlap), which drives encoding and clustering cost
+
+    usage: python -m utils.index_sampler --source youtube --mode stratified --n 100 --strata 4
+           python -m utils.index_sampler --source youtube --mode budget --segments 500 --max_segments 20
+
+"""
+
+SAMPLING_MODES = ('stratified', 'budget')
+
+CHARS_PER_TOKEN = 4.0  # token estimate without a tokenizer
+
+
+def stats_path(source: str, cache_dir: str = DEFAULT_CACHE_DIR) -> str:
+    prefix, _ = SOURCES[source]
+    return os.path.join(cache_dir, f'{prefix}_stats.npz')
+
+
+def compute_stats(source: str, dataset_name: str, cache_dir: str = DEFAULT_CACHE_DIR, tokenizer_name: str = None,
+                  batch_size: int = 256) -> Dict[str, np.ndarray]:
+    """
+    per-document statistics of the 'train' split in one streaming pass (cached)
+
+    Args:
+    - source: 'opensource' or 'youtube'
+    - dataset_name: HF dataset path
+    - cache_dir: cache directory
+    - tokenizer_name: count tokens with this (fast) tokenizer, otherwise characters / CHARS_PER_TOKEN
+    - batch_size: documents per tokenizer call
+
+    Returns:
+    - Dict[str, np.ndarray]: words, chars, tokens (n,) int64 and keys (n,) 'playlist/file_name' (empty if absent)
+    """
+    path = stats_path(source, cache_dir)
+    token_method = tokenizer_name or f'chars/{CHARS_PER_TOKEN:g}'
+    if os.path.exists(path):
+        with np.load(path) as cached:
+            meta = json.loads(str(cached['meta']))
+            if meta == {'dataset': dataset_name, 'tokens': token_method}:
+                return {key: cached[key] for key in ('words', 'chars', 'tokens', 'keys')}
+
+    from datasets import load_dataset
+
+    tokenizer = None
+    if tokenizer_name is not None:
+        from transformers import AutoTokenizer
+        tokenizer = AutoTokenizer.from_pretrained(tokenizer_name)
+
+    _, column = SOURCES[source]
+    words, chars, tokens, keys = [], [], [], []
+    batch = []
+
+    def flush():
+        if tokenizer is not None:
+            encoded = tokenizer(batch, add_special_tokens=False, return_attention_mask=False)['input_ids']
+            tokens.extend(len(ids) for ids in encoded)
+        else:
+            tokens.extend(int(math.ceil(len(text) / CHARS_PER_TOKEN)) for text in batch)
+        batch.clear()
+
+    # streaming keeps the row order of load_dataset(...)['train'], i.e. the index set indices
+    for row in load_dataset(dataset_name, split='train', streaming=True):
+        text = row[column] or ''
+        words.append(len(text.split()))
+        chars.append(len(text))
+        if 'playlist' in row and 'file_name' in row:
+            keys.append(f"{row['playlist']}/{row['file_name']}")
+        batch.append(text)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+
+    stats = {
+        'words': np.asarray(words, dtype=np.int64),
+        'chars': np.asarray(chars, dtype=np.int64),
+        'tokens': np.asarray(tokens, dtype=np.int64),
+        'keys': np.asarray(keys if len(keys) == len(words) else [], dtype=np.str_),
+    }
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = path + '.tmp.npz'
+    np.savez(tmp_path, meta=json.dumps({'dataset': dataset_name, 'tokens': token_method}), **stats)
+    os.replace(tmp_path, path)
+    return stats
+
+
+def estimate_segments(words: np.ndarray, n_word: int, n_overlap: int = 0) -> np.ndarray:
+    """
+    number of word windows fixed_windows produces for each document
+    """
+    words = np.asarray(words, dtype=np.int64)
+    stride = n_word - n_overlap
+    extra = np.ceil(np.maximum(words - n_word, 0) / stride).astype(np.int64)
+    return np.where(words > 0, 1 + extra, 0)
+
+
+def dropped_keys(dedup_manifest_path: str) -> Set[str]:
+    """
+    'playlist/file_name' of the transcripts dropped by data/collect_script/dedup_transcripts.py
+    """
+    dropped = set()
+    with open(dedup_manifest_path) as f:
+        for line in f:
+            entry = json.loads(line)
+            if not entry['keep']:
+                dropped.add(f"{entry['playlist']}/{entry['file_name']}")
+    return dropped
+
+
+def eligible_indices(stats: Dict[str, np.ndarray], min_words: int = 1, dedup_manifest_path: str = None) -> np.ndarray:
+    """
+    dataset indices that can be sampled (non-empty, not a near duplicate)
+    """
+    mask = stats['words'] >= min_words
+    if dedup_manifest_path is not None:
+        if len(stats['keys']) == 0:
+            raise ValueError("the dataset has no playlist / file_name columns to match the dedup manifest")
+        dropped = dropped_keys(dedup_manifest_path)
+        mask &= np.fromiter((key not in dropped for key in stats['keys']), dtype=bool, count=len(mask))
+    return np.flatnonzero(mask)
+
+
+def stratified_sample(lengths: np.ndarray, candidates: np.ndarray, n: int, n_strata: int = 4,
+                      proportional: bool = False, seed: int = 0) -> np.ndarray:
+    """
+    sample from length quantile strata
+
+    Args:
+    - lengths: (N,) length of every dataset document (words, tokens or segments)
+    - candidates: eligible dataset indices
+    - n: sample size
+    - n_strata: number of quantile strata
+    - proportional: sample size of a stratum proportional to its size (default: equal)
+    - seed: random seed
+
+    Returns:
+    - np.ndarray: dataset indices (shuffled, empty when nothing is eligible)
+    """
+    rng = np.random.default_rng(seed)
+    n = min(n, len(candidates))
+    if n <= 0:
+        return np.empty(0, dtype=np.int64)
+    edges = np.quantile(lengths[candidates], np.linspace(0, 1, n_strata + 1)[1:-1])
+    strata = [candidates[labels] for labels in
+              (np.searchsorted(edges, lengths[candidates], side='right') == s for s in range(n_strata))]
+    strata = [stratum for stratum in strata if len(stratum)]
+
+    if proportional:
+        quotas = np.floor(n * np.array([len(s) for s in strata]) / len(candidates)).astype(int)
+    else:
+        quotas = np.full(len(strata), n // len(strata))
+    quotas = np.minimum(quotas, [len(s) for s in strata])
+    # hand the remainder to the strata that still have documents, largest first
+    for s in np.argsort([-len(stratum) for stratum in strata]):
+        if quotas.sum() >= n:
+            break
+        quotas[s] += min(len(strata[s]) - quotas[s], n - quotas.sum())
+
+    sample = np.concatenate([rng.choice(stratum, size=q, replace=False) for stratum, q in zip(strata, quotas)])
+    return rng.permutation(sample)
+
+
+def budget_sample(costs: np.ndarray, candidates: np.ndarray, budget: int, max_cost: Optional[int] = None,
+                  max_n: Optional[int] = None, seed: int = 0) -> np.ndarray:
+    """
+    random documents until their total cost reaches the budget
+
+    Args:
+    - costs: (N,) cost of every dataset document (e.g. estimate_segments)
+    - candidates: eligible dataset indices
+    - budget: total cost of the index set
+    - max_cost: skip documents costing more (small documents for smoke tests)
+    - max_n: at most this many documents
+
+    Returns:
+    - np.ndarray: dataset indices
+    """
+    rng = np.random.default_rng(seed)
+    if max_cost is not None:
+        candidates = candidates[costs[candidates] <= max_cost]
+    order = rng.permutation(candidates)
+    total = np.cumsum(costs[order])
+    sample = order[:np.searchsorted(total, budget, side='right')]
+    return sample[:max_n] if max_n is not None else sample
+
+
+def next_index_set(source: str, indices_dir: str = 'data') -> int:
+    prefix, _ = SOURCES[source]
+    existing = [int(name[len(prefix) + len('_indices'):-len('.npy')]) for name in os.listdir(indices_dir)
+                if name.startswith(f'{prefix}_indices') and name.endswith('.npy')]
+    return max(existing, default=0) + 1
+
+
+def describe(indices: np.ndarray, stats: Dict[str, np.ndarray], segments: np.ndarray) -> str:
+    words = stats['words'][indices]
+    if len(indices) == 0:
+        return "0 documents"
+    return (f"{len(indices)} documents, words p50 {np.median(words):.0f} / p95 {np.percentile(words, 95):.0f} / "
+            f"max {words.max()}, est. tokens {stats['tokens'][indices].sum()}, est. segments {segments[indices].sum()}")
+
+
+# Build an index set from the cached statistics
+if __name__ == "__main__":
+    import argparse
+
+    import yaml
+
+    parser = argparse.ArgumentParser(description="Build length-stratified or compute-budgeted index sets.")
+    parser.add_argument("--source", choices=list(SOURCES), required=True)
+    parser.add_argument("--dataset", default=None, help="HF dataset path (default: from config.yaml)")
+    parser.add_argument("--mode", choices=SAMPLING_MODES, default='stratified')
+    parser.add_argument("--n", type=int, default=100, help="stratified: sample size, budget: max documents")
+    parser.add_argument("--strata", type=int, default=4)
+    parser.add_argument("--by", choices=['words', 'tokens', 'segments'], default='words', help="stratification length")
+    parser.add_argument("--proportional", action="store_true")
+    parser.add_argument("--segments", type=int, default=None, help="budget: total estimated segments")
+    parser.add_argument("--max_segments", type=int, default=None, help="budget: per-document cap")
+    parser.add_argument("--n_word", type=int, default=None, help="default: segment.args.n_word of config.yaml")
+    parser.add_argument("--n_overlap", type=int, default=None)
+    parser.add_argument("--tokenizer", default=None, help="count tokens with this tokenizer")
+    parser.add_argument("--dedup_manifest", default=None, help="exclude near duplicates (dedup_transcripts.py)")
+    parser.add_argument("--index_set", type=int, default=None, help="output N (default: next free)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cache_dir", default=DEFAULT_CACHE_DIR)
+    args = parser.parse_args()
+
+    with open("config.yaml", "r") as f:
+        config = yaml.safe_load(f)
+    dataset_name = args.dataset or config["data"][args.source]
+    n_word = args.n_word or config["segment"]["args"]["n_word"]
+    n_overlap = args.n_overlap if args.n_overlap is not None else config["segment"]["args"].get("n_overlap", 0)
+
+    stats = compute_stats(args.source, dataset_name, args.cache_dir, args.tokenizer)
+    segments = estimate_segments(stats['words'], n_word, n_overlap)
+    candidates = eligible_indices(stats, dedup_manifest_path=args.dedup_manifest)
+    print(f"dataset: {describe(candidates, stats, segments)}")
+
+    if args.mode == 'stratified':
+        lengths = segments if args.by == 'segments' else stats[args.by]
+        indices = stratified_sample(lengths, candidates, args.n, args.strata, args.proportional, args.seed)
+    else:
+        if args.segments is None:
+            parser.error("--mode budget requires --segments")
+        indices = budget_sample(segments, candidates, args.segments, args.max_segments, args.n, args.seed)
+
+    if len(indices) == 0:
+        parser.error("no document was selected (check --dedup_manifest, --max_segments and --segments)")
+
+    prefix, _ = SOURCES[args.source]
+    index_set = args.index_set or next_index_set(args.source)
+    path = os.path.join('data', f'{prefix}_indices{index_set}.npy')
+    np.save(path, indices.astype(np.int64))
+    print(f"index set {index_set}: {describe(indices, stats, segments)} -> {path}")
@@ -0,0 +1,232 @@
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+"""
+    this file is for per-document, per-stage instrumentation of experiment runs
+
+    RunRecorder writes one JSON line per document to experiments/<name>/timings.jsonl:
+        {"doc_index": 0,
+         "stages": {"segmentation": {"wall_sec", "cpu_sec", "peak_rss_mb"[, "peak_cuda_mb"]}, ...},
+         "counters": {"n_segments", "n_clusters", "encode_tokens", "encode_padded_tokens", ...}}
+    and a p50 / p95 / max table per stage to timing_summary.txt
+
+    peak_rss_mb is the highest resident set size seen while the stage runs (sampled by a
+    background thread from /proc/self/statm, or psutil), not the process-lifetime maximum
+
+    library code reports counters with add_counters(...), a no-op when no recorder is active
+
+"""
+
+_active_recorder = None
+
+
+def add_counters(**counters) -> None:
+    """
+    add counters (summed per document) to the active recorder, if any
+    """
+    if _active_recorder is not None and _active_recorder.current is not None:
+        current = _active_recorder.current['counters']
+        for key, value in counters.items():
+            current[key] = current.get(key, 0) + value
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _statm_rss_mb() -> float:
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+
+
+def _current_rss_reader():
+    """
+    function returning the current RSS in MB (None if the platform has neither /proc nor psutil)
+    """
+    if os.path.exists('/proc/self/statm'):
+        return _statm_rss_mb
+    try:
+        import psutil
+    except ImportError:
+        return None
+    process = psutil.Process()
+    return lambda: process.memory_info().rss / (1024 * 1024)
+
+
+class PeakRSSSampler:
+    """
+    Highest RSS while the block runs, sampled every `interval` seconds by a daemon thread.
+
+    Allocations freed faster than the interval can be missed. Without /proc and psutil
+    the process-lifetime ru_maxrss is reported instead.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.peak_mb = 0.0
+        self._read = _current_rss_reader()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.peak_mb = max(self.peak_mb, self._read())
+
+    def __enter__(self) -> "PeakRSSSampler":
+        if self._read is not None:
+            self.peak_mb = self._read()
+            self._thread = threading.Thread(target=self._sample, name='rss-sampler', daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if self._thread is None:
+            self.peak_mb = _peak_rss_mb()
+            return
+        self._stop.set()
+        self._thread.join()
+        self.peak_mb = max(self.peak_mb, self._read())
+
+
+def _cuda_peak_mb(reset: bool = False):
+    torch = sys.modules.get('torch')  # only if the pipeline already imported torch
+    if torch is None or not torch.cuda.is_available():
+        return None
+    if reset:
+        torch.cuda.reset_peak_memory_stats()
+        return None
+    return torch.cuda.max_memory_allocated() / (1024 * 1024)
+
+
+class StageTiming:
+    """
+    measurements of one stage of one document
+    """
+
+    def __init__(self):
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.peak_rss_mb = 0.0
+        self.peak_cuda_mb = None
+
+    def as_dict(self) -> dict:
+        record = {'wall_sec': self.wall, 'cpu_sec': self.cpu, 'peak_rss_mb': self.peak_rss_mb}
+        if self.peak_cuda_mb is not None:
+            record['peak_cuda_mb'] = self.peak_cuda_mb
+        return record
+
+
+class RunRecorder:
+    """
+    Records stage timings and counters of every document of an experiment run.
+
+    Attributes:
+        save_dir (str): experiment directory
+        records (list[dict]): finished document records
+        current (dict): record of the document in progress
+    """
+
+    def __init__(self, save_dir: str, file_name: str = 'timings.jsonl'):
+        global _active_recorder
+
+        self.save_dir = save_dir
+        self.path = os.path.join(save_dir, file_name)
+        self.records = []
+        self.current = None
+        os.makedirs(save_dir, exist_ok=True)
+        open(self.path, 'w').close()
+        _active_recorder = self
+
+    def start_document(self, doc_index: int) -> None:
+        self.current = {'doc_index': doc_index, 'stages': {}, 'counters': {}}
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        measure wall time, CPU time and peak memory of the wrapped stage
+
+        Yields:
+        - StageTiming: filled in when the block exits
+        """
+        timing = StageTiming()
+        _cuda_peak_mb(reset=True)
+        rss = PeakRSSSampler()
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            with rss:
+                yield timing
+        finally:
+            timing.wall = time.perf_counter() - wall
+            timing.cpu = time.process_time() - cpu
+            timing.peak_rss_mb = rss.peak_mb
+            timing.peak_cuda_mb = _cuda_peak_mb()
+            if self.current is not None:
+                self.current['stages'][name] = timing.as_dict()
+
+    def count(self, **counters) -> None:
+        """
+        set counters of the current document
+        """
+        self.current['counters'].update(counters)
+
+    def end_document(self) -> dict:
+        """
+        finish the current document and append its record to the timings file
+        """
+        record, self.current = self.current, None
+        counters = record['counters']
+        for prefix in ('encode', 'summary'):
+            padded = counters.get(f'{prefix}_padded_tokens')
+            if padded:
+                counters[f'{prefix}_padding_efficiency'] = counters.get(f'{prefix}_tokens', 0) / padded
+        record['total_wall_sec'] = sum(stage['wall_sec'] for stage in record['stages'].values())
+
+        self.records.append(record)
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+        return record
+
+    def summary(self) -> dict:
+        """
+        p50 / p95 / max of every stage measurement and counter over the documents
+
+        Returns:
+        - dict: {row name: {'p50', 'p95', 'max'}}
+        """
+        values = {}
+        for record in self.records:
+            for stage, timing in record['stages'].items():
+                for key, value in timing.items():
+                    values.setdefault(f'{stage}.{key}', []).append(value)
+            values.setdefault('total.wall_sec', []).append(record['total_wall_sec'])
+            for key, value in record['counters'].items():
+                values.setdefault(f'counters.{key}', []).append(value)
+
+        return {
+            name: {'p50': float(np.percentile(v, 50)), 'p95': float(np.percentile(v, 95)), 'max': float(np.max(v))}
+            for name, v in values.items()
+        }
+
+    def write_summary(self, file_name: str = 'timing_summary.txt') -> str:
+        """
+        write the summary table next to the timings file
+
+        Returns:
+        - str: the table
+        """
+        lines = [f"{'measure':<45}{'p50':>12}{'p95':>12}{'max':>12}"]
+        for name, stats in self.summary().items():
+            lines.append(f"{name:<45}{stats['p50']:>12.3f}{stats['p95']:>12.3f}{stats['max']:>12.3f}")
+        table = "\n".join(lines)
+        with open(os.path.join(self.save_dir, file_name), 'w') as f:
+            f.write(table + '\n')
+        return table
@@ -0,0 +1,316 @@
+import numpy as np
+
+from .similarity import normalize_rows, threshold_pairs, to_dense, topk_cosine, DEFAULT_BLOCK_SIZE
+
+"""
+    this file is for neighbor search backends used by the concatenate functions
+
+    *** every backend works on cosine distance (1 - cosine similarity) ***
+
+    'brute' works block by block on float16 / QuantizedEmbeddings storage, 'sklearn' and 'ivf'
+    need the whole float32 matrix and dequantize it first
+
+    backends:
+        'sklearn': sklearn NearestNeighbors (original behavior)
+        'brute'  : exact search with blocked matrix products (BLAS)
+        'ivf'    : approximate inverted-file index (spherical k-means lists),
+                   recall is tuned with n_lists / n_probe
+
+"""
+
+NEIGHBOR_BACKENDS = ('sklearn', 'brute', 'ivf')
+
+
+def _merge_topk(best_sims: np.ndarray, best_idx: np.ndarray, sims: np.ndarray, idx: np.ndarray, k: int):
+    """
+    merge candidate similarities into the running top-k (descending) of each row
+    """
+    all_sims = np.concatenate([best_sims, sims], axis=1)
+    all_idx = np.concatenate([best_idx, idx], axis=1)
+    if all_sims.shape[1] > k:
+        part = np.argpartition(-all_sims, k - 1, axis=1)[:, :k]
+        all_sims = np.take_along_axis(all_sims, part, axis=1)
+        all_idx = np.take_along_axis(all_idx, part, axis=1)
+    order = np.argsort(-all_sims, axis=1, kind='stable')
+    return np.take_along_axis(all_sims, order, axis=1), np.take_along_axis(all_idx, order, axis=1)
+
+
+def _sims_to_distances(sims: np.ndarray) -> np.ndarray:
+    return np.clip(1.0 - sims, 0.0, 2.0)
+
+
+# *********************** exact search (blocked BLAS) ***********************
+def exact_knn(embeddings: np.ndarray, k: int, block_size: int = DEFAULT_BLOCK_SIZE, normalized: bool = False):
+    """
+    exact cosine k-NN of every embedding against all embeddings
+
+    Args:
+    - embeddings: (n, d) embeddings
+    - k: number of neighbors (self included, always returned first)
+    - block_size: number of query rows per matrix product
+    - normalized: embeddings are already L2-normalized
+
+    Returns:
+    - (np.ndarray, np.ndarray): (n, k) cosine distances and indices, ascending by distance
+    """
+    similarities, indices = topk_cosine(embeddings, k=k, normalized=normalized, self_first=True, block_size=block_size)
+    return _sims_to_distances(similarities), indices
+
+
+def exact_radius_graph(embeddings: np.ndarray, radius: float, block_size: int = DEFAULT_BLOCK_SIZE,
+                       normalized: bool = False) -> "csr_matrix":
+    """
+    sparse graph of all pairs within cosine distance `radius` (self included)
+
+    Args:
+    - embeddings: (n, d) embeddings
+    - radius: maximum cosine distance
+    - block_size: number of query rows per matrix product
+    - normalized: embeddings are already L2-normalized
+
+    Returns:
+    - csr_matrix: (n, n) cosine distances, explicit zeros kept for DBSCAN(metric='precomputed')
+    """
+    graph = threshold_pairs(embeddings, threshold=1.0 - radius, normalized=normalized,
+                            include_self=True, block_size=block_size)
+    graph.data = _sims_to_distances(graph.data)
+    return graph
+
+
+def _to_csr(rows: list, cols: list, data: list, n: int) -> "csr_matrix":
+    from scipy.sparse import csr_matrix
+
+    if not rows:
+        return csr_matrix((n, n), dtype=np.float32)
+    return csr_matrix(
+        (np.concatenate(data), (np.concatenate(rows), np.concatenate(cols))), shape=(n, n)
+    )
+
+
+# *********************** approximate search (IVF) ***********************
+class IVFIndex:
+    """
+    Inverted-file index over L2-normalized embeddings.
+
+    Embeddings are partitioned with spherical k-means into `n_lists` lists; a query
+    only scans the `n_probe` lists whose centroids are closest to it. Larger
+    `n_probe` (or smaller `n_lists`) trades speed for recall; n_probe == n_lists
+    is exact search.
+
+    Attributes:
+        n_lists (int): number of inverted lists (default: sqrt(n))
+        n_probe (int): number of lists scanned per query
+        centroids (np.ndarray): (n_lists, d) normalized centroids
+        lists (list[np.ndarray]): member indices of each list
+    """
+
+    def __init__(self, n_lists: int = None, n_probe: int = 8, n_iter: int = 10,
+                 block_size: int = DEFAULT_BLOCK_SIZE, seed: int = 0):
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.n_iter = n_iter
+        self.block_size = block_size
+        self.seed = seed
+        self.centroids = None
+        self.lists = None
+        self.data = None
+
+    def _assign(self, x: np.ndarray, n_probe: int) -> np.ndarray:
+        """
+        indices of the n_probe closest centroids for every row of x
+        """
+        probes = np.empty((len(x), n_probe), dtype=np.int64)
+        for start in range(0, len(x), self.block_size):
+            sims = x[start:start + self.block_size] @ self.centroids.T
+            if n_probe == 1:
+                probes[start:start + self.block_size] = sims.argmax(axis=1)[:, None]
+            else:
+                probes[start:start + self.block_size] = np.argpartition(-sims, n_probe - 1, axis=1)[:, :n_probe]
+        return probes
+
+    def fit(self, embeddings: np.ndarray) -> "IVFIndex":
+        """
+        build the inverted lists with spherical k-means
+        """
+        x = normalize_rows(embeddings)
+        n = len(x)
+        n_lists = self.n_lists or max(1, int(np.sqrt(n)))
+        n_lists = min(n_lists, n)
+        rng = np.random.default_rng(self.seed)
+
+        self.centroids = x[rng.choice(n, n_lists, replace=False)].copy()
+        for _ in range(self.n_iter):
+            assign = self._assign(x, 1)[:, 0]
+            sums = np.zeros_like(self.centroids)
+            np.add.at(sums, assign, x)
+            counts = np.bincount(assign, minlength=n_lists)
+            empty = counts == 0
+            if empty.any():  # re-seed empty lists from random points
+                sums[empty] = x[rng.choice(n, int(empty.sum()), replace=False)]
+            self.centroids = normalize_rows(sums)
+
+        assign = self._assign(x, 1)[:, 0]
+        order = np.argsort(assign, kind='stable')
+        bounds = np.searchsorted(assign[order], np.arange(n_lists + 1))
+        self.lists = [order[bounds[i]:bounds[i + 1]] for i in range(n_lists)]
+        self.n_lists = n_lists
+        self.data = x
+        return self
+
+    def _probe_groups(self, queries: np.ndarray):
+        """
+        yield (list id, query rows probing it) for every non-empty list
+        """
+        n_probe = min(self.n_probe, self.n_lists)
+        probes = self._assign(queries, n_probe)
+        query_rows = np.repeat(np.arange(len(queries)), n_probe)
+        flat = probes.ravel()
+        order = np.argsort(flat, kind='stable')
+        bounds = np.searchsorted(flat[order], np.arange(self.n_lists + 1))
+        for list_id in range(self.n_lists):
+            rows = query_rows[order[bounds[list_id]:bounds[list_id + 1]]]
+            if len(rows) and len(self.lists[list_id]):
+                yield list_id, rows
+
+    def search(self, queries: np.ndarray, k: int):
+        """
+        approximate cosine k-NN
+
+        Args:
+        - queries: (m, d) query embeddings
+        - k: number of neighbors
+
+        Returns:
+        - (np.ndarray, np.ndarray): (m, k) cosine distances and indices, ascending by distance
+                                    (index -1 / distance inf when fewer than k candidates were scanned)
+        """
+        q = normalize_rows(queries)
+        k = min(k, len(self.data))
+        best_sims = np.full((len(q), k), -np.inf, dtype=np.float32)
+        best_idx = np.full((len(q), k), -1, dtype=np.int64)
+
+        for list_id, rows in self._probe_groups(q):
+            members = self.lists[list_id]
+            sims = q[rows] @ self.data[members].T
+            idx = np.broadcast_to(members, sims.shape)
+            best_sims[rows], best_idx[rows] = _merge_topk(best_sims[rows], best_idx[rows], sims, idx, k)
+
+        distances = np.where(best_idx >= 0, _sims_to_distances(best_sims), np.inf).astype(np.float32)
+        return distances, best_idx
+
+    def radius_graph(self, radius: float) -> "csr_matrix":
+        """
+        approximate sparse graph of indexed pairs within cosine distance `radius`
+
+        Returns:
+        - csr_matrix: (n, n) cosine distances, explicit zeros kept (self always included)
+        """
+        n = len(self.data)
+        rows, cols, data = [np.arange(n)], [np.arange(n)], [np.zeros(n, dtype=np.float32)]
+        for list_id, query_rows in self._probe_groups(self.data):
+            members = self.lists[list_id]
+            dist = _sims_to_distances(self.data[query_rows] @ self.data[members].T)
+            r, c = np.nonzero(dist <= radius)
+            keep = query_rows[r] != members[c]
+            rows.append(query_rows[r][keep])
+            cols.append(members[c][keep])
+            data.append(dist[r, c][keep])
+
+        return _to_csr(rows, cols, data, n)
+
+
+# *********************** backend dispatch ***********************
+def knn_recall(approx_indices: np.ndarray, exact_indices: np.ndarray) -> float:
+    """
+    recall@k of an approximate neighbor list against exact search
+
+    Returns:
+    - float: mean fraction of the exact k neighbors found by the approximate search
+    """
+    k = exact_indices.shape[1]
+    hits = [len(np.intersect1d(a, e)) for a, e in zip(approx_indices, exact_indices)]
+    return float(np.sum(hits)) / (len(exact_indices) * k)
+
+
+def radius_recall(approx_graph: "csr_matrix", exact_graph: "csr_matrix") -> float:
+    """
+    recall of an approximate radius graph against exact search
+
+    Returns:
+    - float: fraction of the exact in-radius pairs found by the approximate search
+             (self-pairs are always found and not counted)
+    """
+    def pairs(graph):
+        coo = graph.tocoo()  # stored entries, explicit zero distances included
+        off_diagonal = coo.row != coo.col
+        return coo.row[off_diagonal].astype(np.int64) * graph.shape[1] + coo.col[off_diagonal]
+
+    exact = pairs(exact_graph)
+    if len(exact) == 0:
+        return 1.0
+    return len(np.intersect1d(pairs(approx_graph), exact)) / len(exact)
+
+
+def knn_search(embeddings: np.ndarray, k: int, backend: str = 'sklearn', report_recall: bool = False, **backend_args):
+    """
+    k-NN of every embedding against all embeddings with the selected backend
+
+    Args:
+    - embeddings: (n, d) embeddings
+    - k: number of neighbors (self included)
+    - backend: one of NEIGHBOR_BACKENDS
+    - report_recall: print recall@k of the backend against exact search
+    - **backend_args: backend options (block_size, n_lists, n_probe, ...)
+
+    Returns:
+    - (np.ndarray, np.ndarray): (n, k) cosine distances and indices
+    """
+    k = min(k, len(embeddings))
+    if backend == 'sklearn':
+        from sklearn.neighbors import NearestNeighbors
+        nn_model = NearestNeighbors(n_neighbors=k, metric='cosine')
+        dense = to_dense(embeddings)
+        nn_model.fit(dense)
+        distances, indices = nn_model.kneighbors(dense)
+    elif backend == 'brute':
+        distances, indices = exact_knn(embeddings, k, **backend_args)
+    elif backend == 'ivf':
+        dense = to_dense(embeddings)
+        index = IVFIndex(**backend_args).fit(dense)
+        distances, indices = index.search(dense, k)
+    else:
+        raise ValueError(f"Unknown neighbor backend '{backend}', expected one of {NEIGHBOR_BACKENDS}")
+
+    if report_recall:
+        _, exact_indices = exact_knn(embeddings, k)
+        print(f"[{backend}] recall@{k}: {knn_recall(indices, exact_indices):.4f}")
+
+    return distances, indices
+
+
+def radius_search(embeddings: np.ndarray, radius: float, backend: str = 'brute', report_recall: bool = False, **backend_args) -> "csr_matrix":
+    """
+    sparse cosine-distance graph of all pairs within `radius` with the selected backend
+
+    Args:
+    - embeddings: (n, d) embeddings
+    - radius: maximum cosine distance
+    - backend: 'brute' or 'ivf'
+    - report_recall: print the fraction of exact in-radius pairs (self-pairs excluded) found by the backend
+    - **backend_args: backend options (block_size, n_lists, n_probe, ...)
+
+    Returns:
+    - csr_matrix: (n, n) distance graph usable as DBSCAN(metric='precomputed') input
+    """
+    if backend == 'brute':
+        graph = exact_radius_graph(embeddings, radius, **backend_args)
+    elif backend == 'ivf':
+        graph = IVFIndex(**backend_args).fit(to_dense(embeddings)).radius_graph(radius)
+    else:
+        raise ValueError(f"Unknown radius backend '{backend}', expected 'brute' or 'ivf'")
+
+    if report_recall:
+        exact = exact_radius_graph(embeddings, radius)
+        print(f"[{backend}] radius recall: {radius_recall(graph, exact):.4f}")
+
+    return graph
@@ -0,0 +1,222 @@
+import inspect
+import os
+import tempfile
+import threading
+from typing import Callable, List, Tuple
+
+from box import Box
+
+from . import adaptive_batch
+from .registry import get_concat_method, get_summarizer
+
+"""
+    this file is for the segmentation -> concatenation -> summarization pipeline of one document,
+    shared by experiment.py, serve.py and summarize.py
+
+    every step reads its arguments from config.yaml; heavy modules are imported on first use
+
+"""
+
+DEFAULT_SUMMARY_MODEL = "facebook/bart-large-cnn"
+
+
+class Pipeline:
+    """
+    Pipeline steps configured by config.yaml.
+
+    Attributes:
+        config (Box): loaded config
+        concat_method (Callable): configured concate_* function
+        summarizer (Callable): configured summarizer (texts -> str)
+        adaptive (bool): adaptive_batch is enabled (mini_batch.size is ignored)
+        stream (bool): segment.stream, encode segments while the text is segmented
+        mmap_dir (str): segment.mmap_dir, write embeddings to a .npy memory-map there
+
+    The shared fast tokenizers, the encoder and the summarizer are not thread-safe: threads should
+    go through cluster_document and process (both serialized), or summarize_each from a single
+    worker (utils/serving.py), after warmup() has loaded the models.
+    """
+
+    def __init__(self, config: Box):
+        self.config = config
+        self.concat_method = get_concat_method(config.concat.method)
+        self.summarizer = get_summarizer(config.summary.get('method', 'summarizer'))
+        self.summary_args = dict(config.summary.get('args') or {})
+        self.dedup = 'dedup' in config and config.dedup.enabled
+        self._encode_lock = threading.Lock()
+        self._summary_lock = threading.Lock()
+        self.stream = config.segment.get('stream', False)
+        self.mmap_dir = config.segment.get('mmap_dir')
+        if ('embedding' in config or self.stream or self.mmap_dir is not None) \
+                and 'embeddings' not in inspect.signature(self.concat_method).parameters:
+            raise ValueError(f"concat.method '{config.concat.method}' encodes its own texts and does not take "
+                             f"precomputed embeddings, remove the embedding section and segment.stream / mmap_dir")
+
+        # learned token budgets with OOM backoff instead of the fixed mini batch size
+        self.adaptive = 'adaptive_batch' in config and config.adaptive_batch.enabled
+        if self.adaptive:
+            adaptive_batch.configure(**config.adaptive_batch.get('args', {}))
+
+    def warmup(self) -> None:
+        """
+        load the encoder and the summarizer now instead of on the first document
+        """
+        from .segment_embedding import DEFAULT_ENCODER, load_encoder, load_tokenizer
+        from .summarizer import load_summarizer
+
+        load_tokenizer(DEFAULT_ENCODER)
+        load_encoder(DEFAULT_ENCODER)
+        load_summarizer(self.summary_args.get('model', DEFAULT_SUMMARY_MODEL))
+
+    def segment(self, text: str):
+        from .segment_embedding import segmentate_sentence
+
+        return segmentate_sentence(text, **self.config.segment.args)
+
+    def deduplicate(self, segments) -> Tuple[list, list, list]:
+        """
+        near-duplicate removal (dedup section)
+
+        Returns:
+        - (segments to cluster, unique_indices, inverse): (segments, None, None) when disabled
+        """
+        if not self.dedup:
+            return segments, None, None
+
+        from .dedup import deduplicate_segments
+        from .segmentation import TextSegments
+
+        unique_indices, inverse = deduplicate_segments(segments, **self.config.dedup.args)
+        unique_segments = (segments.subset(unique_indices) if isinstance(segments, TextSegments)
+                           else [segments[i] for i in unique_indices])
+        return unique_segments, unique_indices, inverse
+
+    def encode(self, segments, text: str = None, unique_indices=None):
+        """
+        segment embeddings for the concate_* methods
+
+        segment.stream regenerates the word windows from the text (iter_segments) and encodes
+        them micro-batch by micro-batch without building the segment strings first;
+        segment.mmap_dir keeps the embeddings in a .npy memory-map instead of RAM
+        (the file is unlinked right away, the mapping stays valid until it is released)
+
+        Args:
+        - segments: segments to encode (ignored when streaming from text)
+        - text: source document of the segments
+        - unique_indices: rows to keep when the segments were deduplicated
+
+        Returns:
+        - np.ndarray: (n, hidden) embeddings aligned with segments[unique_indices]
+        """
+        from .segment_embedding import count_segments, encode_segments, encode_segments_stream, iter_segments
+
+        mmap_path = None
+        if self.mmap_dir is not None:
+            os.makedirs(self.mmap_dir, exist_ok=True)
+            fd, mmap_path = tempfile.mkstemp(suffix='.npy', dir=self.mmap_dir)
+            os.close(fd)
+        try:
+            if self.stream and text is not None:
+                args = self.config.segment.args
+                n_segments = count_segments(text, args.n_word, args.get('n_overlap', 0))
+                embeddings = encode_segments_stream(iter_segments(text, **args), n_segments, mmap_path=mmap_path)
+                return embeddings if unique_indices is None else embeddings[unique_indices]
+            return encode_segments(segments, mmap_path=mmap_path)
+        finally:
+            if mmap_path is not None:
+                os.remove(mmap_path)
+
+    def cluster(self, segments, unique_segments=None, unique_indices=None, inverse=None,
+                text: str = None) -> List[List[int]]:
+        """
+        concatenate (cluster) segments with the configured method
+
+        Args:
+        - segments: segments of the document
+        - unique_segments, unique_indices, inverse: output of deduplicate (None: not deduplicated)
+        - text: the document, needed to stream segments into the encoder (segment.stream)
+
+        Returns:
+        - List[List[int]]: groups of indices into segments
+        """
+        if unique_segments is None:
+            unique_segments = segments
+
+        concat_args = dict(self.config.concat.args)
+        if 'embedding' in self.config or self.stream or self.mmap_dir is not None:
+            embeddings = self.encode(unique_segments, text, unique_indices)
+            if 'embedding' in self.config:
+                # projected / quantized segment embeddings (utils/embedding_store.py)
+                from .embedding_store import transform_embeddings
+
+                embeddings = transform_embeddings(embeddings, **self.config.embedding)
+            concat_args['embeddings'] = embeddings
+        concat_indices = self.concat_method(unique_segments, **concat_args)
+
+        if unique_segments is not segments:
+            from .dedup import expand_groups
+
+            concat_indices = expand_groups(concat_indices, unique_indices, inverse,
+                                           drop_duplicates=self.config.dedup.drop_duplicates)
+        return concat_indices
+
+    def cluster_document(self, text: str):
+        """
+        segment, deduplicate and cluster one document, one thread at a time
+
+        Returns:
+        - (segments, List[List[int]]): segments and groups of indices into them
+        """
+        with self._encode_lock:
+            segments = self.segment(text)
+            return segments, self.cluster(segments, *self.deduplicate(segments), text=text)
+
+    @staticmethod
+    def cluster_texts(segments, concat_indices: List[List[int]]) -> List[str]:
+        return [" ".join([segments[gi] for gi in group]) for group in concat_indices]
+
+    def summarize(self, batch_clusters: List[str]) -> str:
+        """
+        summary of a document, mini-batched by mini_batch.size (or by the adaptive token budget)
+        """
+        mini_batch = self.config.mini_batch.size
+        if mini_batch > 0 and not self.adaptive:
+            mini_batch_size = len(batch_clusters) if len(batch_clusters) < mini_batch else mini_batch
+
+            batch_summaries = []
+            for i in range(0, len(batch_clusters), mini_batch_size):
+                batch_summaries.append(self.summarizer(batch_clusters[i:i+mini_batch_size], **self.summary_args))
+            return " ".join(batch_summaries)
+        return self.summarizer(batch_clusters, **self.summary_args)
+
+    def summarize_each(self, batch_clusters: List[str], batch_size: int = None,
+                       on_batch: Callable[[List[int]], None] = None) -> List[str]:
+        """
+        one summary per cluster text, texts may come from several documents
+        (batches of batch_size texts, mini_batch.size by default, or by the adaptive token budget)
+
+        on_batch is called with the indices into batch_clusters of every generated batch
+        """
+        from .summarizer import summarize_batch
+
+        batch_size = batch_size or self.config.mini_batch.size
+        if batch_size > 0 and not self.adaptive:
+            summaries = []
+            for i in range(0, len(batch_clusters), batch_size):
+                summaries.extend(summarize_batch(batch_clusters[i:i+batch_size], **self.summary_args))
+                if on_batch is not None:
+                    on_batch(list(range(i, min(i + batch_size, len(batch_clusters)))))
+            return summaries
+        return summarize_batch(batch_clusters, on_batch=on_batch, **self.summary_args)
+
+    def process(self, text: str) -> dict:
+        """
+        run every step on one document (threads take turns on the encoder, then on the summarizer)
+
+        Returns:
+        - dict: {'summary', 'n_segments', 'n_clusters'}
+        """
+        segments, concat_indices = self.cluster_document(text)
+        with self._summary_lock:
+            summary = self.summarize(self.cluster_texts(segments, concat_indices))
+        return {'summary': summary, 'n_segments': len(segments), 'n_clusters': len(concat_indices)}
@@ -0,0 +1,100 @@
+import cProfile
+import io
+import os
+import pstats
+from contextlib import contextmanager, nullcontext
+
+"""
+    this file is for opt-in profiling of experiment.py stages
+
+    config.yaml:
+        profile:
+          stages: ["clustering", "summarization"]  # subset of PIPELINE_STAGES
+          doc_indices: [0, 1]                      # documents (enumerate index) to profile
+          backend: "cprofile"                      # "cprofile" | "torch"
+          top_n: 20                                # rows of the hotspot summary
+
+    outputs in experiments/<name>/profile/:
+        - doc{i}_{stage}.prof (cprofile, open with snakeviz / pstats) or doc{i}_{stage}.json (torch, chrome trace)
+        - hotspots.txt: top-N functions of every profiled stage
+
+    without a profile section every stage gets a nullcontext (no overhead)
+
+"""
+
+PIPELINE_STAGES = ('segmentation', 'dedup', 'clustering', 'summarization', 'evaluation')
+PROFILERS = ('cprofile', 'torch')
+
+
+class StageProfiler:
+    """
+    Returns a profiling context for the configured (stage, document) pairs.
+
+    Attributes:
+        stages (set): stages to profile
+        doc_indices (set): documents to profile
+        backend (str): 'cprofile' or 'torch'
+        top_n (int): rows of the hotspot summary
+    """
+
+    def __init__(self, profile_config: dict = None, save_dir: str = '.'):
+        profile_config = profile_config or {}
+        self.enabled = bool(profile_config)
+        self.stages = set(profile_config.get('stages') or PIPELINE_STAGES)
+        self.doc_indices = set(profile_config.get('doc_indices') or [0])
+        self.backend = profile_config.get('backend', 'cprofile')
+        self.top_n = profile_config.get('top_n', 20)
+        self.sort_by = profile_config.get('sort_by', 'cumulative')
+        self.profile_dir = os.path.join(save_dir, 'profile')
+
+        if self.backend not in PROFILERS:
+            raise ValueError(f"Unknown profiler '{self.backend}', expected one of {PROFILERS}")
+        if self.enabled:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            open(os.path.join(self.profile_dir, 'hotspots.txt'), 'w').close()
+
+    def __call__(self, stage: str, doc_index: int):
+        """
+        profiling context for one stage of one document (nullcontext if not selected)
+        """
+        if not self.enabled or stage not in self.stages or doc_index not in self.doc_indices:
+            return nullcontext()
+        if self.backend == 'torch':
+            return self._torch_profile(stage, doc_index)
+        return self._cprofile(stage, doc_index)
+
+    def _write_hotspots(self, name: str, table: str) -> None:
+        with open(os.path.join(self.profile_dir, 'hotspots.txt'), 'a') as f:
+            f.write(f"========== [{name}] ==========\n{table}\n")
+
+    @contextmanager
+    def _cprofile(self, stage: str, doc_index: int):
+        name = f"doc{doc_index}_{stage}"
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield profiler
+        finally:
+            profiler.disable()
+            profiler.dump_stats(os.path.join(self.profile_dir, f"{name}.prof"))
+
+            stream = io.StringIO()
+            pstats.Stats(profiler, stream=stream).sort_stats(self.sort_by).print_stats(self.top_n)
+            self._write_hotspots(name, stream.getvalue())
+
+    @contextmanager
+    def _torch_profile(self, stage: str, doc_index: int):
+        import torch
+        from torch.profiler import profile, ProfilerActivity
+
+        name = f"doc{doc_index}_{stage}"
+        activities = [ProfilerActivity.CPU]
+        if torch.cuda.is_available():
+            activities.append(ProfilerActivity.CUDA)
+
+        with profile(activities=activities, record_shapes=True, profile_memory=True) as profiler:
+            yield profiler
+        profiler.export_chrome_trace(os.path.join(self.profile_dir, f"{name}.json"))
+
+        sort_by = 'self_cuda_time_total' if torch.cuda.is_available() else 'self_cpu_time_total'
+        self._write_hotspots(name, profiler.key_averages().table(sort_by=sort_by, row_limit=self.top_n))
@@ -0,0 +1,74 @@
+import importlib
+from typing import Callable, Dict
+
+"""
+    this file is for the registry of pipeline components selected by name in config.yaml
+
+    entries are "module:function" strings, so a component (and its heavy dependencies:
+    torch, transformers, sklearn, scipy, bert_score, ...) is only imported the first
+    time it is requested
+
+    register your own component with register(<REGISTRY>, name, "module:function")
+
+"""
+
+CONCAT_METHODS: Dict[str, str] = {
+    'concate_time_based': 'utils.concat_functions:concate_time_based',
+    'concate_clustering': 'utils.concat_functions:concate_clustering',
+    'concate_knn': 'utils.concat_functions:concate_knn',
+    'concate_time_clustering': 'utils.concat_functions:concate_time_clustering',
+    'top_down_splitting': 'utils.concat_functions:top_down_splitting',
+    'concate_hierarchical_clustering': 'utils.concat_functions:concate_hierarchical_clustering',
+    'concate_custom': 'utils.concat_functions:concate_custom',
+}
+
+SUMMARIZERS: Dict[str, str] = {
+    'summarizer': 'utils.summarizer:summarizer',
+}
+
+METRICS: Dict[str, str] = {
+    'rouge': 'utils.eval_similarity:calculate_rouge_scores',
+    'semantic_similarity': 'utils.eval_similarity:calculate_semantic_similarity',
+    'bert_score': 'utils.eval_similarity:calculate_bert_score',
+}
+
+_resolved: Dict[str, Callable] = {}
+
+
+def register(registry: Dict[str, str], name: str, target: str) -> None:
+    """
+    add a "module:function" entry to a registry
+    """
+    registry[name] = target
+
+
+def resolve(registry: Dict[str, str], name: str) -> Callable:
+    """
+    import and return the registered function (imported once per process)
+
+    Args:
+    - registry: CONCAT_METHODS, SUMMARIZERS or METRICS
+    - name: registered name
+
+    Returns:
+    - Callable: the component
+    """
+    if name not in registry:
+        raise KeyError(f"Unknown component '{name}', expected one of {sorted(registry)}")
+    target = registry[name]
+    if target not in _resolved:
+        module_name, function_name = target.split(':')
+        _resolved[target] = getattr(importlib.import_module(module_name), function_name)
+    return _resolved[target]
+
+
+def get_concat_method(name: str) -> Callable:
+    return resolve(CONCAT_METHODS, name)
+
+
+def get_summarizer(name: str = 'summarizer') -> Callable:
+    return resolve(SUMMARIZERS, name)
+
+
+def get_metric(name: str) -> Callable:
+    return resolve(METRICS, name)
@@ -1,60 +1,124 @@
-from typing import List
+import os
+from collections import deque
+from functools import lru_cache
+from itertools import islice
+from typing import Iterable, Iterator, List
 
 import numpy as np
-import torch
-import torch.nn.functional as F
-from transformers import AutoTokenizer, AutoModel
 
-def segmentate_sentence(full_text: str, n_word: int, n_overlap: int=0, fix_size: bool=False) -> List[str]:
+from .adaptive_batch import budget_for, run_adaptive_batches
+from .instrumentation import add_counters
+from .segmentation import TextSegments, segment_spans, WORD_PATTERN
+
+# segments per encoder forward pass
+ENCODE_BATCH_SIZE = 64
+
+# default models, overridable by environment variable for offline runs (benchmarks/tiny_models.py)
+DEFAULT_ENCODER = os.environ.get('WHITEBOARD_ENCODER', 'sentence-transformers/all-MiniLM-L6-v2')
+DEFAULT_SENT2VEC = os.environ.get('WHITEBOARD_SENT2VEC', 'severinsimmler/xlm-roberta-longformer-large-16384')
+
+@lru_cache(maxsize=None)
+def load_tokenizer(model_name: str):
     """
-    전체 텍스트를 n_word 단어 개수로 나누어 리스트로 반환
+    tokenizer 로드 (프로세스 당 1회)
+    """
+    from transformers import AutoTokenizer
+    return AutoTokenizer.from_pretrained(model_name)
+
+@lru_cache(maxsize=None)
+def load_encoder(model_name: str):
+    """
+    encoder 모델 로드 (프로세스 당 1회)
+    """
+    from transformers import AutoModel
+    model = AutoModel.from_pretrained(model_name)
+    model.eval()
+    return model
+
+def segmentate_sentence(full_text: str, n_word: int, n_overlap: int=0, fix_size: bool=False,
+                        unit: str='word', tokenizer: str=None) -> TextSegments:
+    """
+    전체 텍스트를 n_word 단위 개수로 나누어 리스트로 반환
 
     Args:
     - full_text: 전체 텍스트
-    - n_word: 나누어질 단어 개수
-    - n_overlap: 나누어진 문장 간 겹칠 단어 개수
+    - n_word: 나누어질 단위(unit) 개수
+    - n_overlap: 나누어진 문장 간 겹칠 단위 개수
     - fix_size: 마지막 문장이 n_word보다 작을 때, 마지막 문장을 n_word로 맞추기
+    - unit: 'word' (공백 단어), 'token' (모델 토큰), 'sentence' (문장 단위로 n_word 단어까지 묶음)
+    - tokenizer: tokenizer 모델 이름, 주어지면 문서를 1회만 토큰화하고 encode_segments에서 재사용
+                 (unit='token'이면 기본값은 encode_segments의 모델)
 
     Returns:
-    - List[str]: 나누어진 문장 리스트
+    - TextSegments: 나누어진 문장 리스트 (원문 위의 (start, end) span, 접근 시 문자열로 변환)
     """
     assert n_word > n_overlap, "n_word must be greater than n_overlap"
 
-    words = full_text.split()
-    # assert n_word <= len(words), "n_word must be less than the number of words in full_text"
-
-    result = []
-    for i in range(0, len(words), n_word-n_overlap):
-        result.append(" ".join(words[i:i+n_word]))
+    if unit == 'token' and tokenizer is None:
+        tokenizer = DEFAULT_ENCODER
+    if isinstance(tokenizer, str):
+        tokenizer = load_tokenizer(tokenizer)
 
-        if i + n_word >= len(words):
-            break
+    return segment_spans(full_text, n_word, n_overlap, fix_size, unit=unit, tokenizer=tokenizer)
 
-    if fix_size:
-        result[-1] = " ".join(words[-n_word:])
+def iter_segments(full_text: str, n_word: int, n_overlap: int=0, fix_size: bool=False,
+                  unit: str='word', tokenizer: str=None) -> Iterator[str]:
+    """
+    segmentate_sentence의 generator 버전, segment를 하나씩 생성
 
-    return result
+    Args:
+    - segmentate_sentence와 동일 (unit='word'만 지원, 단어 offset을 윈도우 크기만큼만 유지)
 
-def encode_segments(segments: List[str], model_name: str='sentence-transformers/all-MiniLM-L6-v2', normalize: int=2) -> np.ndarray:
+    Yields:
+    - str: segment
     """
-    segment list를 입력받아 embedding을 반환
+    assert n_word > n_overlap, "n_word must be greater than n_overlap"
+    if unit != 'word':
+        # token / sentence 단위는 문서 전체를 먼저 분할해야 하므로 segmentate_sentence 사용
+        raise ValueError(f"iter_segments only supports unit='word', got '{unit}'")
 
-    Args:
-    - segments: segment list
-    - model_name: model name
+    n_segments = count_segments(full_text, n_word, n_overlap)
+    if n_segments == 0:
+        return
 
-    Returns:
-    - np.ndarray: embeddings
+    window = deque(maxlen=n_word)
+    step = n_word - n_overlap
+    n_units = 0
+    for match in WORD_PATTERN.finditer(full_text):
+        window.append(match.span())
+        n_units += 1
+        # every window but the last one is full and starts on a step boundary
+        first = n_units - n_word
+        if first >= 0 and first % step == 0 and first // step < n_segments - 1:
+            yield " ".join(full_text[window[0][0]:window[-1][1]].split())
+
+    last_start = (n_segments - 1) * step
+    tail = list(window) if fix_size else list(window)[-(n_units - last_start):]
+    yield " ".join(full_text[tail[0][0]:tail[-1][1]].split())
+
+def count_segments(full_text: str, n_word: int, n_overlap: int=0) -> int:
     """
-    tokenizer = AutoTokenizer.from_pretrained(model_name)
-    model = AutoModel.from_pretrained(model_name)
+    segmentate_sentence(unit='word')가 만드는 segment 개수 (문자열 생성 없이 계산)
+    """
+    n_units = sum(1 for _ in WORD_PATTERN.finditer(full_text))
+    if n_units == 0:
+        return 0
+    return 1 + -(-max(0, n_units - n_word) // (n_word - n_overlap))
+
+def _encode_batch(model, segment_tokens, normalize: int=2) -> "torch.Tensor":
+    """
+    tokenized batch 1개를 mean pooling embedding으로 변환
+    """
+    import torch
+    import torch.nn.functional as F
 
-    segment_tokens = tokenizer(segments, padding=True, truncation=True, return_tensors="pt")
     with torch.no_grad():
         outputs = model(**segment_tokens)
 
     embeddings = outputs[0]
     if 'attention_mask' in segment_tokens:
+        add_counters(encode_tokens=int(segment_tokens['attention_mask'].sum()),
+                     encode_padded_tokens=int(segment_tokens['attention_mask'].numel()))
         # sentence-transformers dependent code, please ref https://huggingface.co/sentence-transformers
         mask = segment_tokens['attention_mask'].unsqueeze(-1).expand(embeddings.size()).float()
         embeddings = torch.sum(embeddings * mask, dim=1) / torch.clamp(mask.sum(1), min=1e-9)
@@ -64,9 +128,108 @@ def encode_segments(segments: List[str], model_name: str='sentence-transformers/
     if normalize:
         embeddings = F.normalize(embeddings, p=normalize, dim=1)
 
-    return embeddings.numpy()
+    return embeddings
+
+def _allocate_embeddings(n: int, dim: int, mmap_path: str=None) -> np.ndarray:
+    """
+    (n, dim) float32 embedding 배열을 미리 할당 (mmap_path가 주어지면 .npy memory-map)
+    """
+    if mmap_path is not None:
+        return np.lib.format.open_memmap(mmap_path, mode='w+', dtype=np.float32, shape=(n, dim))
+    return np.empty((n, dim), dtype=np.float32)
 
-def encode_sent2vec(segments: List[str], normalize: int = 2, model_weight='severinsimmler/xlm-roberta-longformer-large-16384') -> np.ndarray:
+def encode_segments(segments: List[str], model_name: str=DEFAULT_ENCODER, normalize: int=2,
+                    batch_size: int=ENCODE_BATCH_SIZE, mmap_path: str=None) -> np.ndarray:
+    """
+    segment list를 입력받아 embedding을 반환
+
+    Args:
+    - segments: segment list (TextSegments가 같은 tokenizer의 token id를 가지면 재토큰화하지 않음)
+    - model_name: model name
+    - batch_size: 한 번의 forward에 넣을 segment 개수 (activation 메모리가 문서 길이와 무관)
+                  (adaptive_batch.configure()가 호출되었으면 학습된 token budget으로 대체)
+    - mmap_path: 주어지면 embedding을 해당 .npy memory-map에 기록
+
+    Returns:
+    - np.ndarray: embeddings
+    """
+    tokenizer = load_tokenizer(model_name)
+    model = load_encoder(model_name)
+
+    reuse_ids = isinstance(segments, TextSegments) and segments.token_ids is not None \
+        and segments.tokenizer_name == tokenizer.name_or_path
+
+    embeddings = _allocate_embeddings(len(segments), model.config.hidden_size, mmap_path)
+
+    budget = budget_for(model_name)
+    if budget is not None:
+        _encode_adaptive(segments, tokenizer, model, normalize, reuse_ids, embeddings, budget)
+        return embeddings
+
+    for start in range(0, len(segments), batch_size):
+        end = min(start + batch_size, len(segments))
+        if reuse_ids:
+            segment_tokens = segments.encoder_inputs(tokenizer, range(start, end))
+        else:
+            segment_tokens = tokenizer(list(segments[start:end]), padding=True, truncation=True, return_tensors="pt")
+        embeddings[start:end] = _encode_batch(model, segment_tokens, normalize).numpy()
+
+    return embeddings
+
+def _encode_adaptive(segments, tokenizer, model, normalize, reuse_ids, embeddings, budget) -> None:
+    """
+    token budget 단위 batch로 embedding 계산 (OOM이면 batch를 나누어 재시도)
+    """
+    if reuse_ids:
+        n_special = tokenizer.num_special_tokens_to_add()
+        lengths = [min(len(segments.segment_token_ids(i)) + n_special, tokenizer.model_max_length)
+                   for i in range(len(segments))]
+        make_inputs = lambda indices: segments.encoder_inputs(tokenizer, indices)
+    else:
+        encoded = tokenizer(list(segments), truncation=True)
+        lengths = [len(ids) for ids in encoded['input_ids']]
+        make_inputs = lambda indices: tokenizer.pad(
+            [{key: encoded[key][i] for key in encoded.keys()} for i in indices], padding=True, return_tensors="pt")
+
+    def encode_batch(indices):
+        embeddings[indices] = _encode_batch(model, make_inputs(indices), normalize).numpy()
+
+    run_adaptive_batches(lengths, encode_batch, budget)
+
+def encode_segments_stream(segments: Iterable[str], n_segments: int, model_name: str=DEFAULT_ENCODER,
+                           normalize: int=2, batch_size: int=ENCODE_BATCH_SIZE, mmap_path: str=None) -> np.ndarray:
+    """
+    segment generator(iter_segments 등)를 micro-batch 단위로 소비하며 embedding 계산
+
+    Args:
+    - segments: segment iterable
+    - n_segments: segment 개수 (count_segments), 결과 배열 사전 할당에 사용
+    - model_name: model name
+    - batch_size: 한 번의 forward에 넣을 segment 개수
+    - mmap_path: 주어지면 embedding을 해당 .npy memory-map에 기록
+
+    Returns:
+    - np.ndarray: (n_segments, hidden) embeddings
+    """
+    tokenizer = load_tokenizer(model_name)
+    model = load_encoder(model_name)
+
+    embeddings = _allocate_embeddings(n_segments, model.config.hidden_size, mmap_path)
+    segments = iter(segments)
+    start = 0
+    while True:
+        batch = list(islice(segments, batch_size))
+        if not batch:
+            break
+        if start + len(batch) > n_segments:
+            raise ValueError(f"More than n_segments={n_segments} segments were produced.")
+        segment_tokens = tokenizer(batch, padding=True, truncation=True, return_tensors="pt")
+        embeddings[start:start + len(batch)] = _encode_batch(model, segment_tokens, normalize).numpy()
+        start += len(batch)
+
+    return embeddings[:start]
+
+def encode_sent2vec(segments: List[str], normalize: int = 2, model_weight=DEFAULT_SENT2VEC) -> np.ndarray:
     """
     Encode a list of text segments into embeddings using a transformer model.
 
@@ -78,12 +241,13 @@ def encode_sent2vec(segments: List[str], normalize: int = 2, model_weight='sever
     Returns:
     - np.ndarray: Array of embeddings.
     """
+    import torch
+    import torch.nn.functional as F
+    from transformers import AutoTokenizer, AutoModel
 
     tokenizer = AutoTokenizer.from_pretrained(model_weight)
-    model = AutoModel.from_pretrained(model_weight).to('cuda')
-
     device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    model = model.to(device)
+    model = AutoModel.from_pretrained(model_weight).to(device)
 
     inputs = tokenizer(segments, padding=True, truncation=True, return_tensors="pt", max_length=512).to(device)
     
@@ -96,15 +260,17 @@ def encode_sent2vec(segments: List[str], normalize: int = 2, model_weight='sever
 
     return embeddings.cpu().numpy()
 
-# Testing
+# Testing (full benchmarks: benchmarks/bench_pipeline.py)
+# usage: python -m utils.segment_embedding <text file> [n_word]
 if __name__ == "__main__":
-    with open('sample_text.txt', 'r') as f:
-        full_text = f.read()
-
+    import sys
     import time
-    from utils import cosine_similarity
+    from .similarity import cosine_similarity
+
+    with open(sys.argv[1], 'r') as f:
+        full_text = f.read()
 
-    n_word = 500
+    n_word = int(sys.argv[2]) if len(sys.argv) > 2 else 500
     n_overlap = 0
 
     s = time.time()
@@ -116,6 +282,6 @@ if __name__ == "__main__":
     print(f"encode_segments: {time.time()-s:.2f}s")
 
     s = time.time()
-    cos_sim = cosine_similarity(embeddings, embeddings)
+    cos_sim = cosine_similarity(embeddings, embeddings, normalized=True)
     print(f"cosine_similarity: {time.time()-s:.2f}s")
     print(cos_sim, cos_sim.shape)
@@ -0,0 +1,243 @@
+import re
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+"""
+    this file is for the offset-based segmentation engine used by segmentate_sentence
+
+    the document is split into units once, segments are (start, end) spans over the
+    original string and are only materialized as strings when accessed
+
+    units:
+        'word'    : whitespace separated words (original segmentate_sentence behavior)
+        'token'   : model tokens, so a segment never overflows the encoder window
+        'sentence': whole sentences packed up to n_word words per segment
+
+"""
+
+SEGMENT_UNITS = ('word', 'token', 'sentence')
+
+WORD_PATTERN = re.compile(r'\S+')
+_SENTENCE_PATTERN = re.compile(r'\S.*?(?:[.!?]+(?=\s|$)|$)', re.S)
+
+
+class TextSegments(Sequence):
+    """
+    Lazy list of text segments defined by character spans over one document.
+
+    Indexing returns the segment string (whitespace collapsed, like the original
+    " ".join(words) segments), so it can be used anywhere a segment list is expected.
+    When the document was tokenized, each segment also carries its token span so
+    encode_segments can feed the token ids to the model without re-tokenizing.
+
+    Attributes:
+        text (str): original document
+        spans (np.ndarray): (n, 2) character offsets [start, end) of each segment
+        unit (str): segmentation unit
+        token_ids (np.ndarray): token ids of the whole document (None if not tokenized)
+        token_spans (np.ndarray): (n, 2) token offsets [start, end) of each segment
+        tokenizer_name (str): name_or_path of the tokenizer that produced token_ids
+    """
+
+    def __init__(self, text: str, spans: np.ndarray, unit: str = 'word',
+                 token_ids: np.ndarray = None, token_spans: np.ndarray = None, tokenizer_name: str = None):
+        self.text = text
+        self.spans = np.asarray(spans, dtype=np.int64).reshape(-1, 2)
+        self.unit = unit
+        self.token_ids = token_ids
+        self.token_spans = token_spans
+        self.tokenizer_name = tokenizer_name
+
+    def __len__(self) -> int:
+        return len(self.spans)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        start, end = self.spans[index]
+        return " ".join(self.text[start:end].split())
+
+    def __repr__(self) -> str:
+        return f"TextSegments(n={len(self)}, unit='{self.unit}')"
+
+    def subset(self, indices: Sequence[int]) -> "TextSegments":
+        """
+        segments at the given indexes, sharing the document and its token ids
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        token_spans = self.token_spans[indices] if self.token_spans is not None else None
+        return TextSegments(self.text, self.spans[indices], unit=self.unit, token_ids=self.token_ids,
+                            token_spans=token_spans, tokenizer_name=self.tokenizer_name)
+
+    def segment_token_ids(self, index: int) -> np.ndarray:
+        """
+        token ids of one segment (without special tokens)
+        """
+        start, end = self.token_spans[index]
+        return self.token_ids[start:end]
+
+    def encoder_inputs(self, tokenizer, indices: Sequence[int] = None) -> dict:
+        """
+        padded model inputs built from the stored token ids (no re-tokenization)
+
+        Args:
+        - tokenizer: tokenizer that produced token_ids (adds special tokens and pads)
+        - indices: segments to include (default: all)
+
+        Returns:
+        - dict: BatchEncoding with input_ids / attention_mask tensors
+        """
+        max_len = tokenizer.model_max_length - tokenizer.num_special_tokens_to_add()
+        indices = range(len(self)) if indices is None else indices
+        features = [
+            {'input_ids': tokenizer.build_inputs_with_special_tokens(self.segment_token_ids(i)[:max_len].tolist())}
+            for i in indices
+        ]
+        return tokenizer.pad(features, padding=True, return_tensors="pt")
+
+
+def unit_offsets(text: str, unit: str = 'word') -> np.ndarray:
+    """
+    character offsets of every word or sentence of the text
+
+    Args:
+    - text: full text
+    - unit: 'word' or 'sentence'
+
+    Returns:
+    - np.ndarray: (n, 2) character offsets [start, end)
+    """
+    pattern = WORD_PATTERN if unit == 'word' else _SENTENCE_PATTERN
+    offsets = [m.span() for m in pattern.finditer(text)]
+    return np.asarray(offsets, dtype=np.int64).reshape(-1, 2)
+
+
+def fixed_windows(n_units: int, n_unit: int, n_overlap: int = 0, fix_size: bool = False) -> List[Tuple[int, int]]:
+    """
+    [first, last) unit windows of n_unit units with n_overlap units of overlap
+
+    Args:
+    - n_units: total number of units
+    - n_unit: units per window
+    - n_overlap: overlapping units between consecutive windows
+    - fix_size: stretch the last window back to n_unit units
+
+    Returns:
+    - List[Tuple[int, int]]: unit windows
+    """
+    windows = []
+    for i in range(0, n_units, n_unit - n_overlap):
+        windows.append((i, min(i + n_unit, n_units)))
+
+        if i + n_unit >= n_units:
+            break
+
+    if fix_size and windows:
+        windows[-1] = (max(0, n_units - n_unit), n_units)
+
+    return windows
+
+
+def packed_windows(unit_lengths: np.ndarray, max_length: int, n_overlap: int = 0) -> List[Tuple[int, int]]:
+    """
+    [first, last) windows packing whole units (e.g. sentences) up to max_length words
+
+    Args:
+    - unit_lengths: length of every unit
+    - max_length: maximum total length of a window (a longer single unit is its own window)
+    - n_overlap: units repeated at the start of the next window
+
+    Returns:
+    - List[Tuple[int, int]]: unit windows
+    """
+    windows = []
+    n_units = len(unit_lengths)
+    i = 0
+    while i < n_units:
+        j, total = i, 0
+        while j < n_units and (j == i or total + unit_lengths[j] <= max_length):
+            total += unit_lengths[j]
+            j += 1
+        windows.append((i, j))
+        if j >= n_units:
+            break
+        i = max(i + 1, j - n_overlap)
+
+    return windows
+
+
+def tokenize_with_offsets(text: str, tokenizer) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    tokenize the whole document once (no special tokens, no truncation)
+
+    Args:
+    - text: full text
+    - tokenizer: fast huggingface tokenizer (offset mapping is required)
+
+    Returns:
+    - (np.ndarray, np.ndarray): token ids (n,) and character offsets (n, 2)
+    """
+    encoded = tokenizer(text, add_special_tokens=False, truncation=False,
+                        return_offsets_mapping=True, return_attention_mask=False, verbose=False)
+    token_ids = np.asarray(encoded['input_ids'], dtype=np.int64)
+    offsets = np.asarray(encoded['offset_mapping'], dtype=np.int64).reshape(-1, 2)
+    return token_ids, offsets
+
+
+def segment_spans(full_text: str, n_word: int, n_overlap: int = 0, fix_size: bool = False,
+                  unit: str = 'word', tokenizer=None) -> TextSegments:
+    """
+    split the text into segment spans of n_word units
+
+    Args:
+    - full_text: full text
+    - n_word: units per segment ('sentence': maximum words per segment)
+    - n_overlap: overlapping units between segments ('sentence': overlapping sentences)
+    - fix_size: stretch the last segment back to n_word units (word / token units)
+    - unit: one of SEGMENT_UNITS
+    - tokenizer: huggingface tokenizer, required for unit='token'; when given, the
+                 document is tokenized once and every segment keeps its token span
+
+    Returns:
+    - TextSegments: lazy segment list
+    """
+    if unit not in SEGMENT_UNITS:
+        raise ValueError(f"Unknown segment unit '{unit}', expected one of {SEGMENT_UNITS}")
+    if unit == 'token' and tokenizer is None:
+        raise ValueError("unit='token' requires a tokenizer")
+
+    token_ids, token_offsets = (None, None)
+    if tokenizer is not None:
+        token_ids, token_offsets = tokenize_with_offsets(full_text, tokenizer)
+
+    if unit == 'token':
+        # keep room for the special tokens so a segment fits the encoder window
+        n_word = min(n_word, tokenizer.model_max_length - tokenizer.num_special_tokens_to_add())
+        n_overlap = min(n_overlap, n_word - 1)
+        offsets = token_offsets
+        windows = fixed_windows(len(offsets), n_word, n_overlap, fix_size)
+    elif unit == 'word':
+        offsets = unit_offsets(full_text, 'word')
+        windows = fixed_windows(len(offsets), n_word, n_overlap, fix_size)
+    else:
+        offsets = unit_offsets(full_text, 'sentence')
+        n_words = np.asarray([len(full_text[s:e].split()) for s, e in offsets], dtype=np.int64)
+        windows = packed_windows(n_words, n_word, n_overlap)
+
+    windows = np.asarray(windows, dtype=np.int64).reshape(-1, 2)
+    spans = np.stack([offsets[windows[:, 0], 0], offsets[windows[:, 1] - 1, 1]], axis=1) if len(windows) else windows
+
+    token_spans = None
+    if token_ids is not None:
+        if unit == 'token':
+            token_spans = windows
+        else:
+            # tokens whose start falls inside the segment's character span
+            token_spans = np.stack([
+                np.searchsorted(token_offsets[:, 0], spans[:, 0], side='left'),
+                np.searchsorted(token_offsets[:, 0], spans[:, 1], side='left'),
+            ], axis=1) if len(spans) else spans
+
+    return TextSegments(full_text, spans, unit=unit, token_ids=token_ids, token_spans=token_spans,
+                        tokenizer_name=getattr(tokenizer, 'name_or_path', None))
@@ -0,0 +1,166 @@
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, List
+
+import numpy as np
+
+"""
+    this file is for the request coalescing and metrics of the summarization service (serve.py)
+
+    request threads segment / cluster their transcript (one at a time, Pipeline.cluster_document)
+    and submit the cluster texts; one worker thread owns the summarizer and merges the texts
+    of every request that arrives within the latency window, generating them in batches of
+    at most max_texts
+
+"""
+
+
+class ServiceMetrics:
+    """
+    Thread-safe counters and latency windows exposed on /metrics.
+    """
+
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.counters = {'requests_total': 0, 'requests_failed': 0, 'in_flight': 0,
+                         'batches_total': 0, 'batched_texts_total': 0}
+        self.latencies = {'request': deque(maxlen=window), 'queue_wait': deque(maxlen=window),
+                          'generation': deque(maxlen=window)}
+        self.batch_sizes = deque(maxlen=window)
+        self.batch_requests = deque(maxlen=window)
+
+    def incr(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self.counters[name] += value
+
+    def observe(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.latencies[name].append(seconds)
+
+    def observe_batch(self, n_texts: int, n_requests: int) -> None:
+        with self._lock:
+            self.counters['batches_total'] += 1
+            self.counters['batched_texts_total'] += n_texts
+            self.batch_sizes.append(n_texts)
+            self.batch_requests.append(n_requests)
+
+    def snapshot(self, queue_depth: int = 0) -> dict:
+        """
+        JSON-serializable metrics
+        """
+        def percentiles(values):
+            if not values:
+                return {'count': 0}
+            values = np.asarray(values)
+            return {'count': len(values), 'p50': float(np.percentile(values, 50)),
+                    'p95': float(np.percentile(values, 95)), 'max': float(values.max())}
+
+        with self._lock:
+            return {
+                'uptime_sec': time.time() - self.started,
+                'queue_depth': queue_depth,
+                **self.counters,
+                'latency_sec': {name: percentiles(list(v)) for name, v in self.latencies.items()},
+                'batch_texts': percentiles(list(self.batch_sizes)),
+                'batch_requests': percentiles(list(self.batch_requests)),
+            }
+
+
+class CoalescingSummarizer:
+    """
+    Merges concurrent summarization requests into shared batches.
+
+    Attributes:
+        summarize_each (Callable): (texts, batch_size, on_batch) -> one summary per text (Pipeline.summarize_each)
+        window (float): seconds to wait for more requests after the first one
+        max_texts (int): maximum texts per generation batch (larger requests are split)
+    """
+
+    def __init__(self, summarize_each: Callable[..., List[str]], window: float = 0.02,
+                 max_texts: int = 32, metrics: ServiceMetrics = None):
+        self.summarize_each = summarize_each
+        self.window = window
+        self.max_texts = max_texts
+        self.metrics = metrics or ServiceMetrics()
+        self._queue = queue.Queue()
+        self._pending_texts = 0
+        self._lock = threading.Lock()
+        self._worker = threading.Thread(target=self._run, name='summarizer', daemon=True)
+        self._worker.start()
+
+    @property
+    def queue_depth(self) -> int:
+        """
+        texts waiting for a generation batch
+        """
+        return self._pending_texts
+
+    def submit(self, texts: List[str]) -> Future:
+        """
+        queue the cluster texts of one request
+
+        Returns:
+        - Future: resolves to the list of summaries (same order as texts)
+        """
+        future = Future()
+        if not texts:
+            future.set_result([])
+            return future
+        with self._lock:
+            self._pending_texts += len(texts)
+        self._queue.put((texts, future, time.perf_counter()))
+        return future
+
+    def _collect(self) -> list:
+        # block for the first request, then take whatever arrives within the window
+        requests = [self._queue.get()]
+        n_texts = len(requests[0][0])
+        deadline = time.perf_counter() + self.window
+        while n_texts < self.max_texts:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            requests.append(request)
+            n_texts += len(request[0])
+        return requests
+
+    def _run(self) -> None:
+        while True:
+            requests = self._collect()
+            texts = [text for request_texts, _, _ in requests for text in request_texts]
+            now = time.perf_counter()
+            for _, _, submitted in requests:
+                self.metrics.observe('queue_wait', now - submitted)
+
+            # request boundaries in texts, to count the requests sharing each generation batch
+            ends = np.cumsum([len(request_texts) for request_texts, _, _ in requests])
+            try:
+                summaries = []
+                for start in range(0, len(texts), self.max_texts):
+                    # the batches actually generated (the adaptive token budget may split the slice further)
+                    def on_batch(indices, start=start):
+                        requests_in_batch = np.unique(np.searchsorted(ends, np.asarray(indices) + start, side='right'))
+                        self.metrics.observe_batch(len(indices), len(requests_in_batch))
+
+                    summaries.extend(self.summarize_each(texts[start:start + self.max_texts],
+                                                         batch_size=self.max_texts, on_batch=on_batch))
+            except Exception as e:
+                for _, future, _ in requests:
+                    future.set_exception(e)
+            else:
+                self.metrics.observe('generation', time.perf_counter() - now)
+                start = 0
+                for request_texts, future, _ in requests:
+                    future.set_result(summaries[start:start + len(request_texts)])
+                    start += len(request_texts)
+            finally:
+                with self._lock:
+                    self._pending_texts -= len(texts)
@@ -0,0 +1,226 @@
+import numpy as np
+
+"""
+    this file is for cosine similarity kernels used by the concatenate functions
+
+    *** encode_segments already L2-normalizes, pass normalized=True to skip norms ***
+
+    - inputs may be stored as float16 (to_storage) or as QuantizedEmbeddings (utils/embedding_store.py),
+      blocks are upcast / dequantized to float32 on use
+    - top-k / threshold queries work block by block and never allocate the full n x m matrix
+
+"""
+
+DEFAULT_BLOCK_SIZE = 1024
+
+
+def to_storage(embeddings: np.ndarray, dtype: str = 'float32') -> np.ndarray:
+    """
+    cast embeddings to the storage dtype ('float32' or 'float16')
+    """
+    return np.ascontiguousarray(embeddings, dtype=np.dtype(dtype))
+
+
+def normalize_rows(embeddings: np.ndarray) -> np.ndarray:
+    """
+    L2-normalize rows as float32 so that a dot product is the cosine similarity
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    if embeddings.ndim == 1:
+        return embeddings / max(float(np.linalg.norm(embeddings)), 1e-12)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings / np.maximum(norms, 1e-12)
+
+
+def _prepare(embeddings: np.ndarray, normalized: bool) -> np.ndarray:
+    if normalized:
+        return np.asarray(embeddings, dtype=np.float32)
+    return normalize_rows(embeddings)
+
+
+def to_dense(embeddings) -> np.ndarray:
+    """
+    float32 array of stored embeddings, for consumers that need the whole matrix (sklearn, IVF index)
+    """
+    if hasattr(embeddings, 'dequantize'):
+        return normalize_rows(embeddings.dequantize())
+    return np.asarray(embeddings, dtype=np.float32)
+
+
+def _block(embeddings: np.ndarray, start: int, end: int, normalized: bool) -> np.ndarray:
+    """
+    rows [start, end) upcast to float32 (and normalized), the stored array is never converted as a whole
+    """
+    if hasattr(embeddings, 'dequantize'):
+        # QuantizedEmbeddings: rounded codes are re-normalized
+        return normalize_rows(embeddings.dequantize(start, end))
+    block = np.asarray(embeddings[start:end], dtype=np.float32)
+    return block if normalized else normalize_rows(block)
+
+
+def _products(x_block: np.ndarray, y: np.ndarray, normalized: bool, block_size: int) -> np.ndarray:
+    """
+    x_block @ y.T with y upcast one block of rows at a time
+    """
+    products = np.empty((len(x_block), len(y)), dtype=np.float32)
+    for start in range(0, len(y), block_size):
+        end = min(start + block_size, len(y))
+        products[:, start:end] = x_block @ _block(y, start, end, normalized).T
+    return products
+
+
+def cosine_similarity(a: np.ndarray, b: np.ndarray, normalized: bool = False):
+    """
+    Calculate cosine similarity
+
+    Args:
+    - a: matrix or vector a
+    - b: matrix or vector b
+    - normalized: inputs are already L2-normalized (plain dot product)
+
+    Returns:
+    - float or np.ndarray: cosine similarity (float32 matrix for matrix inputs)
+    """
+    a = _prepare(a, normalized)
+    b = _prepare(b, normalized)
+    if a.ndim == 1 and b.ndim == 1:
+        return float(np.dot(a, b))
+    return a @ b.T
+
+
+def adjacent_cosine_similarity(embeddings: np.ndarray, normalized: bool = False) -> np.ndarray:
+    """
+    cosine similarity of every consecutive pair (i-1, i), the diagonal of the timeline
+
+    Args:
+    - embeddings: (n, d) embeddings in time order
+    - normalized: inputs are already L2-normalized
+
+    Returns:
+    - np.ndarray: (n-1,) similarities, [i-1] is sim(embeddings[i-1], embeddings[i])
+    """
+    n = len(embeddings)
+    similarities = np.empty(max(n - 1, 0), dtype=np.float32)
+    for start in range(0, n - 1, DEFAULT_BLOCK_SIZE):
+        end = min(start + DEFAULT_BLOCK_SIZE, n - 1)
+        x = _block(embeddings, start, end + 1, normalized)
+        similarities[start:end] = np.einsum('ij,ij->i', x[:-1], x[1:])
+    return similarities
+
+
+def topk_cosine(a: np.ndarray, b: np.ndarray = None, k: int = 10, normalized: bool = False,
+                self_first: bool = False, block_size: int = DEFAULT_BLOCK_SIZE):
+    """
+    k most similar rows of b for every row of a, computed block by block
+
+    Args:
+    - a: (n, d) queries
+    - b: (m, d) database (default: a itself)
+    - k: number of neighbors
+    - normalized: inputs are already L2-normalized
+    - self_first: (b is None) always return the query itself as the first neighbor
+    - block_size: query rows per matrix product
+
+    Returns:
+    - (np.ndarray, np.ndarray): (n, k) similarities and indices, descending by similarity
+    """
+    y = a if b is None else b
+    k = min(k, len(y))
+
+    similarities = np.empty((len(a), k), dtype=np.float32)
+    indices = np.empty((len(a), k), dtype=np.int64)
+    for start in range(0, len(a), block_size):
+        end = min(start + block_size, len(a))
+        sims = _products(_block(a, start, end, normalized), y, normalized, block_size)
+        if self_first and b is None:
+            sims[np.arange(end - start), np.arange(start, end)] = np.inf
+
+        part = np.argpartition(-sims, k - 1, axis=1)[:, :k] if k < sims.shape[1] else \
+            np.broadcast_to(np.arange(sims.shape[1]), sims.shape)
+        part_sims = np.take_along_axis(sims, part, axis=1)
+        order = np.argsort(-part_sims, axis=1, kind='stable')
+        indices[start:end] = np.take_along_axis(part, order, axis=1)
+        similarities[start:end] = np.take_along_axis(part_sims, order, axis=1)
+
+    if self_first and b is None:
+        similarities[:, 0] = 1.0
+    return similarities, indices
+
+
+def threshold_pairs(a: np.ndarray, b: np.ndarray = None, threshold: float = 0.5, normalized: bool = False,
+                    include_self: bool = True, block_size: int = DEFAULT_BLOCK_SIZE) -> "csr_matrix":
+    """
+    sparse matrix of all pairs with cosine similarity >= threshold, computed block by block
+
+    Args:
+    - a: (n, d) queries
+    - b: (m, d) database (default: a itself)
+    - threshold: minimum cosine similarity
+    - normalized: inputs are already L2-normalized
+    - include_self: (b is None) always keep the diagonal with similarity 1.0
+    - block_size: query rows per matrix product
+
+    Returns:
+    - csr_matrix: (n, m) similarities of the kept pairs
+    """
+    from scipy.sparse import csr_matrix
+
+    y = a if b is None else b
+
+    rows, cols, data = [], [], []
+    for start in range(0, len(a), block_size):
+        end = min(start + block_size, len(a))
+        sims = _products(_block(a, start, end, normalized), y, normalized, block_size)
+        if b is None:
+            sims[np.arange(end - start), np.arange(start, end)] = 1.0 if include_self else -np.inf
+        r, c = np.nonzero(sims >= threshold)
+        rows.append(r + start)
+        cols.append(c)
+        data.append(sims[r, c])
+
+    if not rows:
+        return csr_matrix((len(a), len(y)), dtype=np.float32)
+    return csr_matrix(
+        (np.concatenate(data), (np.concatenate(rows), np.concatenate(cols))), shape=(len(a), len(y))
+    )
+
+
+def condensed_distances(embeddings: np.ndarray, metric: str = 'cosine', normalized: bool = False,
+                        block_size: int = DEFAULT_BLOCK_SIZE) -> np.ndarray:
+    """
+    condensed pairwise distance vector (scipy.spatial.distance.pdist layout) from float32 matrix products
+
+    Args:
+    - embeddings: (n, d) embeddings
+    - metric: 'cosine' or 'euclidean'
+    - normalized: inputs are already L2-normalized ('euclidean' needs raw vectors, set False if they are not)
+    - block_size: query rows per matrix product
+
+    Returns:
+    - np.ndarray: (n*(n-1)/2,) float64 distances for scipy.cluster.hierarchy.linkage
+    """
+    if metric not in ('cosine', 'euclidean'):
+        raise ValueError(f"Unsupported metric '{metric}', expected 'cosine' or 'euclidean'")
+
+    raw = normalized or metric == 'euclidean'  # euclidean distances use the raw vectors
+    n = len(embeddings)
+    sq_norms = np.empty(n, dtype=np.float32)
+    for start in range(0, n, block_size):
+        x = _block(embeddings, start, min(start + block_size, n), raw)
+        sq_norms[start:start + len(x)] = np.einsum('ij,ij->i', x, x)
+
+    condensed = np.empty(n * (n - 1) // 2, dtype=np.float64)
+    offset = 0
+    for start in range(0, n, block_size):
+        end = min(start + block_size, n)
+        products = _products(_block(embeddings, start, end, raw), embeddings, raw, block_size)
+        for i in range(start, end):
+            row = products[i - start, i + 1:]
+            if metric == 'cosine':
+                row = np.clip(1.0 - row, 0.0, 2.0)
+            else:
+                row = np.sqrt(np.maximum(sq_norms[i] + sq_norms[i + 1:] - 2.0 * row, 0.0))
+            condensed[offset:offset + len(row)] = row
+            offset += len(row)
+
+    return condensed
@@ -1,53 +1,115 @@
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
-import torch
-
 """
 This file is for summarizer functions
 Based on the model it could be different pipeline
 
-*** parallel processing is recommended for summarization *** 
+*** parallel processing is recommended for summarization ***
 
 function signature:
     args: texts (list), any other arguments if needed
     returns: summary (str)
 
 """
+from functools import lru_cache
+from typing import Callable, List
 
+from .adaptive_batch import budget_for, run_adaptive_batches
+from .instrumentation import add_counters
 
-def summarizer(texts: list, model="facebook/bart-large-cnn", max_length=1024, min_length=0, num_beams=4)->str:
+
+@lru_cache(maxsize=None)
+def load_summarizer(model: str):
     """
-    summarizer based on language model
+    tokenizer와 seq2seq 모델 로드 (프로세스 당 1회)
+    """
+    import torch
+    from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
+    tokenizer = AutoTokenizer.from_pretrained(model)
+    seq2seq = AutoModelForSeq2SeqLM.from_pretrained(model).to(device)
+    seq2seq.eval()
+    return tokenizer, seq2seq
+
+
+def _generate(tokenizer, model, inputs: dict, max_length, min_length, num_beams) -> List[str]:
+    """
+    summaries of one padded batch
+    """
+    import torch
+
+    with torch.no_grad():
+        inputs = {key: value.to(model.device) for key, value in inputs.items()}
+        summary_ids = model.generate(inputs['input_ids'], attention_mask=inputs.get('attention_mask'),
+                                     num_beams=num_beams, min_length=min_length, max_length=max_length)
+
+    add_counters(summary_tokens=int(inputs['attention_mask'].sum()),
+                 summary_padded_tokens=int(inputs['attention_mask'].numel()),
+                 summary_tokens_out=int((summary_ids != tokenizer.pad_token_id).sum()))
+
+    summaries = tokenizer.batch_decode(summary_ids, skip_special_tokens=True, clean_up_tokenization_spaces=False)
+
+    # free unusable memory
+    del inputs, summary_ids
+    return summaries
+
+
+def summarize_batch(texts: list, model="facebook/bart-large-cnn", max_length=1024, min_length=0, num_beams=4,
+                    on_batch: Callable[[List[int]], None] = None) -> List[str]:
+    """
+    summary of every text, in order
+
+    with adaptive_batch.configure() the texts are batched by the learned token budget of the
+    model (and split / retried on out-of-memory), otherwise they run as one batch
 
     Args:
     - texts: list of texts
     - model: model name
     - max_length: maximum length of the summary
     - min_length: minimum length of the summary
+    - num_beams: beam size
+    - on_batch: called with the indices into texts of every generated batch
 
     Returns:
-    - str: summary
+    - List[str]: summaries
     """
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    tokenizer, seq2seq = load_summarizer(model)
 
-    tokenizer = AutoTokenizer.from_pretrained(model)
-    model = AutoModelForSeq2SeqLM.from_pretrained(model).to(device)
-
-    inputs = tokenizer(texts, 
-                       max_length=max_length,
-                       truncation=True,
-                       padding='longest', 
-                       return_tensors='pt'
-    )
-    with torch.no_grad():
-        inputs = {key: value.to(model.device) for key, value in inputs.items()}
-        summary_ids = model.generate(inputs['input_ids'], num_beams=num_beams, min_length=min_length, max_length=max_length)
+    budget = budget_for(model)
+    if budget is None:
+        inputs = tokenizer(texts, max_length=max_length, truncation=True, padding='longest', return_tensors='pt')
+        summaries = _generate(tokenizer, seq2seq, inputs, max_length, min_length, num_beams)
+        if on_batch is not None:
+            on_batch(list(range(len(texts))))
+        return summaries
 
-    summaries = tokenizer.batch_decode(summary_ids, skip_special_tokens=True, clean_up_tokenization_spaces=False)
-    
-    # concatenate summaries TODO: if needed add /n between summaries
-    summary = " ".join(summaries)
+    encoded = tokenizer(texts, max_length=max_length, truncation=True)
+    lengths = [len(ids) for ids in encoded['input_ids']]
 
-    # free unusable memory
-    del inputs, summary_ids, summaries
+    def summarize(indices):
+        inputs = tokenizer.pad([{key: encoded[key][i] for key in encoded.keys()} for i in indices],
+                               padding='longest', return_tensors='pt')
+        summaries = _generate(tokenizer, seq2seq, inputs, max_length, min_length, num_beams)
+        if on_batch is not None:
+            on_batch(list(indices))
+        return summaries
+
+    # beam search keeps num_beams copies of every row
+    return run_adaptive_batches(lengths, summarize, budget, multiplier=num_beams)
+
+
+def summarizer(texts: list, model="facebook/bart-large-cnn", max_length=1024, min_length=0, num_beams=4)->str:
+    """
+    summarizer based on language model
+
+    Args:
+    - texts: list of texts
+    - model: model name
+    - max_length: maximum length of the summary
+    - min_length: minimum length of the summary
 
-    return summary
\ No newline at end of file
+    Returns:
+    - str: summary
+    """
+    # concatenate summaries TODO: if needed add /n between summaries
+    return " ".join(summarize_batch(texts, model, max_length, min_length, num_beams))
@@ -1,8 +1,10 @@
 import numpy as np
 
+from .similarity import cosine_similarity as _cosine_similarity
+
 def cosine_similarity(a: np.ndarray, b: np.ndarray) -> float:
     """
-    Calculate cosine similarity
+    Calculate cosine similarity (see utils/similarity.py for the normalized / blockwise kernels)
 
     Args:
     - a: matrix or vector a
@@ -11,6 +13,4 @@ def cosine_similarity(a: np.ndarray, b: np.ndarray) -> float:
     Returns:
     - float: cosine similarity
     """
-    if a.ndim == 1 and b.ndim == 1:
-        return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
-    return np.dot(a, b.T) / (np.linalg.norm(a, axis=1, keepdims=True) * np.linalg.norm(b, axis=1, keepdims=True))
\ No newline at end of file
+    return _cosine_similarity(a, b)